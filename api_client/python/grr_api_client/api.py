@@ -63,7 +63,9 @@ def InitHttp(api_endpoint=None,
              proxies=None,
              verify=None,
              cert=None,
-             trust_env=True):
+             trust_env=True,
+             protobuf_wire_format=True,
+             pool_size=None):
   """Inits an GRR API object with a HTTP connector."""
 
   connector = http_connector.HttpConnector(
@@ -73,6 +75,8 @@ def InitHttp(api_endpoint=None,
       proxies=proxies,
       verify=verify,
       cert=cert,
-      trust_env=trust_env)
+      trust_env=trust_env,
+      protobuf_wire_format=protobuf_wire_format,
+      pool_size=pool_size)
 
   return GrrApi(connector=connector)
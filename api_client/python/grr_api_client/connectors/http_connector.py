@@ -7,12 +7,14 @@ from __future__ import unicode_literals
 import collections
 import json
 import logging
+import threading
 
 
 from future.moves.urllib import parse as urlparse
 from future.utils import iterkeys
 
 import requests
+from requests import adapters
 
 from werkzeug import routing
 
@@ -35,8 +37,10 @@ class HttpConnector(connector.Connector):
   """API connector implementation that works through HTTP API."""
 
   JSON_PREFIX = ")]}\'\n"
+  PROTOBUF_CONTENT_TYPE = "application/x-protobuf"
   DEFAULT_PAGE_SIZE = 50
   DEFAULT_BINARY_CHUNK_SIZE = 66560
+  DEFAULT_POOL_SIZE = 10
 
   def __init__(self,
                api_endpoint=None,
@@ -45,7 +49,9 @@ class HttpConnector(connector.Connector):
                verify=True,
                cert=None,
                trust_env=True,
-               page_size=None):
+               page_size=None,
+               protobuf_wire_format=True,
+               pool_size=None):
     super(HttpConnector, self).__init__()
 
     self.api_endpoint = api_endpoint
@@ -55,21 +61,48 @@ class HttpConnector(connector.Connector):
     self.cert = cert
     self.trust_env = trust_env
     self._page_size = page_size or self.DEFAULT_PAGE_SIZE
+    # If set, results are requested as binary protos instead of JSON, which
+    # saves JSON encoding and decoding on both ends.
+    self.protobuf_wire_format = protobuf_wire_format
+    self.pool_size = pool_size or self.DEFAULT_POOL_SIZE
 
     self.csrf_token = None
     self.api_methods = {}
 
+    # All requests go through a single adapter, so that connections to the
+    # server are kept alive and reused instead of being opened for every call.
+    # Connection pools of the adapter are thread-safe. pool_maxsize limits the
+    # number of connections kept alive per host.
+    self._adapter = adapters.HTTPAdapter(pool_maxsize=self.pool_size)
+    # Sessions are not thread-safe (e.g. their cookie jars are shared mutable
+    # state), so every thread gets its own session using the shared adapter.
+    self._local = threading.local()
+    self._initialization_lock = threading.RLock()
+
+  @property
+  def _session(self):
+    session = getattr(self._local, "session", None)
+    if session is None:
+      session = requests.Session()
+      session.trust_env = self.trust_env
+      session.mount("http://", self._adapter)
+      session.mount("https://", self._adapter)
+      self._local.session = session
+    return session
+
+  def Close(self):
+    """Closes all the connections kept alive by the connector."""
+    self._adapter.close()
+
   def _GetCSRFToken(self):
     logger.debug("Fetching CSRF token from %s...", self.api_endpoint)
 
-    with requests.Session() as session:
-      session.trust_env = self.trust_env
-      index_response = session.get(
-          self.api_endpoint,
-          auth=self.auth,
-          proxies=self.proxies,
-          verify=self.verify,
-          cert=self.cert)
+    index_response = self._session.get(
+        self.api_endpoint,
+        auth=self.auth,
+        proxies=self.proxies,
+        verify=self.verify,
+        cert=self.cert)
 
     self._CheckResponseStatus(index_response)
 
@@ -92,16 +125,14 @@ class HttpConnector(connector.Connector):
     url = "%s/%s" % (self.api_endpoint.strip("/"),
                      "api/v2/reflection/api-methods")
 
-    with requests.Session() as session:
-      session.trust_env = self.trust_env
-      response = session.get(
-          url,
-          headers=headers,
-          cookies=cookies,
-          auth=self.auth,
-          proxies=self.proxies,
-          verify=self.verify,
-          cert=self.cert)
+    response = self._session.get(
+        url,
+        headers=headers,
+        cookies=cookies,
+        auth=self.auth,
+        proxies=self.proxies,
+        verify=self.verify,
+        cert=self.cert)
     self._CheckResponseStatus(response)
 
     json_str = response.content[len(self.JSON_PREFIX):]
@@ -115,12 +146,12 @@ class HttpConnector(connector.Connector):
 
     routing_rules = []
 
-    self.api_methods = {}
+    api_methods = {}
     for method in proto.items:
       if not method.http_route.startswith("/api/v2/"):
         method.http_route = method.http_route.replace("/api/", "/api/v2/", 1)
 
-      self.api_methods[method.name] = method
+      api_methods[method.name] = method
       routing_rules.append(
           routing.Rule(
               method.http_route,
@@ -133,11 +164,20 @@ class HttpConnector(connector.Connector):
     self.urls = self.handlers_map.bind(
         parsed_endpoint_url.netloc, url_scheme=parsed_endpoint_url.scheme)
 
+    # Methods are set last, as they mark the routing map as fetched.
+    self.api_methods = api_methods
+
   def _InitializeIfNeeded(self):
-    if not self.csrf_token:
-      self.csrf_token = self._GetCSRFToken()
-    if not self.api_methods:
-      self._FetchRoutingMap()
+    # The CSRF token and the routing map are fetched once and then shared by
+    # all the threads using the connector.
+    if self.csrf_token and self.api_methods:
+      return
+
+    with self._initialization_lock:
+      if not self.csrf_token:
+        self.csrf_token = self._GetCSRFToken()
+      if not self.api_methods:
+        self._FetchRoutingMap()
 
   def _CoerceValueToQueryStringType(self, field, value):
     if isinstance(value, bool):
@@ -248,23 +288,28 @@ class HttpConnector(connector.Connector):
     method_descriptor = self.api_methods[handler_name]
 
     request = self.BuildRequest(method_descriptor.name, args)
+    if self.protobuf_wire_format:
+      # Servers that do not support binary protobuf responses ignore this
+      # header and respond with JSON.
+      request.headers["Accept"] = self.PROTOBUF_CONTENT_TYPE
     prepped_request = request.prepare()
 
-    with requests.Session() as session:
-      session.trust_env = self.trust_env
-      options = session.merge_environment_settings(
-          prepped_request.url, self.proxies or {}, None, self.verify, self.cert)
-      response = session.send(prepped_request, **options)
+    options = self._session.merge_environment_settings(
+        prepped_request.url, self.proxies or {}, None, self.verify, self.cert)
+    response = self._session.send(prepped_request, **options)
 
     self._CheckResponseStatus(response)
 
-    content = response.content
-    json_str = content[len(self.JSON_PREFIX):]
-
     if method_descriptor.result_type_descriptor.name:
       default_value = method_descriptor.result_type_descriptor.default
       result = utils.TypeUrlToMessage(default_value.type_url)
-      json_format.Parse(json_str, result, ignore_unknown_fields=True)
+
+      content_type = response.headers.get("Content-Type", "")
+      if content_type.startswith(self.PROTOBUF_CONTENT_TYPE):
+        result.ParseFromString(response.content)
+      else:
+        json_str = response.content[len(self.JSON_PREFIX):]
+        json_format.Parse(json_str, result, ignore_unknown_fields=True)
       return result
 
   def SendStreamingRequest(self, handler_name, args):
@@ -274,20 +319,16 @@ class HttpConnector(connector.Connector):
     request = self.BuildRequest(method_descriptor.name, args)
     prepped_request = request.prepare()
 
-    session = requests.Session()
-    session.trust_env = self.trust_env
-    options = session.merge_environment_settings(
+    options = self._session.merge_environment_settings(
         prepped_request.url, self.proxies or {}, None, self.verify, self.cert)
     options["stream"] = True
-    response = session.send(prepped_request, **options)
+    response = self._session.send(prepped_request, **options)
     self._CheckResponseStatus(response)
 
     def GenerateChunks():
       for chunk in response.iter_content(self.DEFAULT_BINARY_CHUNK_SIZE):
         yield chunk
 
-    def Close():
-      response.close()
-      session.close()
-
-    return utils.BinaryChunkIterator(chunks=GenerateChunks(), on_close=Close)
+    # Closing the response releases its connection back to the pool.
+    return utils.BinaryChunkIterator(
+        chunks=GenerateChunks(), on_close=response.close)
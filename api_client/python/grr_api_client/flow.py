@@ -4,6 +4,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import time
+
+from future.builtins import range
+
 from grr_api_client import errors
 from grr_api_client import utils
 from grr_response_proto.api import flow_pb2
@@ -115,6 +119,55 @@ class FlowBase(object):
     return f
 
 
+def WaitUntilAllDone(flows, timeout=None, max_workers=None):
+  """Waits until all the given flows complete.
+
+  Flows are checked in rounds. Every round fetches all the flows that are
+  still running concurrently and the interval between rounds backs off the
+  same way as in WaitUntilDone.
+
+  Args:
+    flows: An iterable of flow objects or references.
+    timeout: timeout in seconds. None means default timeout (1 hour). 0 means
+      no timeout (wait forever).
+    max_workers: Maximum number of concurrent requests. None means the
+      default of utils.MapConcurrently.
+
+  Returns:
+    A list of fresh flow objects in the order of the given flows. Unlike
+    WaitUntilDone, this does not raise if some of the flows are not
+    successful, so their state has to be checked by the caller.
+  Raises:
+    PollTimeoutError: if timeout is reached.
+  """
+  if timeout is None:
+    timeout = utils.DEFAULT_POLL_TIMEOUT
+
+  flows = list(flows)
+  results = [None] * len(flows)
+  pending = list(range(len(flows)))
+
+  started = time.time()
+  for sleep_interval in utils.PollIntervals():
+    fresh_flows = utils.MapConcurrently(
+        lambda index: flows[index].Get(), pending, max_workers=max_workers)
+
+    still_pending = []
+    for index, fresh_flow in zip(pending, fresh_flows):
+      results[index] = fresh_flow
+      if fresh_flow.data.state == fresh_flow.data.RUNNING:
+        still_pending.append(index)
+    pending = still_pending
+
+    if not pending:
+      return results
+
+    if timeout and (time.time() - started) > timeout:
+      raise errors.PollTimeoutError(
+          "Polling on %d flows timed out after %ds." % (len(pending), timeout))
+    time.sleep(sleep_interval)
+
+
 class FlowRef(FlowBase):
   """Flow reference (points to the flow, but has no data)."""
 
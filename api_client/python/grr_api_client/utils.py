@@ -4,10 +4,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import sys
+import threading
 import time
 
 
 from future.builtins import map
+from future.builtins import range
+from future.utils import raise_
 
 from google.protobuf import wrappers_pb2
 
@@ -115,6 +119,34 @@ DEFAULT_POLL_INTERVAL = 15
 # Default poll timeout in seconds.
 DEFAULT_POLL_TIMEOUT = 3600
 
+# Polling starts with this interval (in seconds) and backs off exponentially
+# up to the poll interval, so that conditions that get satisfied quickly are
+# noticed quickly, while long waits do not flood the server with requests.
+POLL_INITIAL_INTERVAL = 1
+POLL_BACKOFF_FACTOR = 2
+
+# Default number of threads used by MapConcurrently.
+DEFAULT_MAX_WORKERS = 10
+
+
+def PollIntervals(interval=None):
+  """Yields intervals to sleep for between consecutive polls.
+
+  Args:
+    interval: Maximum interval in seconds. None means the default poll
+      interval.
+
+  Yields:
+    Intervals in seconds, growing exponentially up to the maximum interval.
+  """
+  if interval is None:
+    interval = DEFAULT_POLL_INTERVAL
+
+  current = min(POLL_INITIAL_INTERVAL, interval)
+  while True:
+    yield current
+    current = min(current * POLL_BACKOFF_FACTOR, interval)
+
 
 def Poll(generator=None, condition=None, interval=None, timeout=None):
   """Periodically calls generator function until a condition is satisfied."""
@@ -125,14 +157,11 @@ def Poll(generator=None, condition=None, interval=None, timeout=None):
   if not condition:
     raise ValueError("condition has to be a lambda")
 
-  if interval is None:
-    interval = DEFAULT_POLL_INTERVAL
-
   if timeout is None:
     timeout = DEFAULT_POLL_TIMEOUT
 
   started = time.time()
-  while True:
+  for sleep_interval in PollIntervals(interval):
     obj = generator()
     check_result = condition(obj)
     if check_result:
@@ -141,7 +170,65 @@ def Poll(generator=None, condition=None, interval=None, timeout=None):
     if timeout and (time.time() - started) > timeout:
       raise errors.PollTimeoutError(
           "Polling on %s timed out after %ds." % (obj, timeout))
-    time.sleep(interval)
+    time.sleep(sleep_interval)
+
+
+def MapConcurrently(function, items, max_workers=None):
+  """Applies a function to all items using a bounded pool of threads.
+
+  This is meant for fanning out API calls (e.g. one per client). Connectors
+  are thread-safe, so the function can use the same API object in all the
+  threads.
+
+  Args:
+    function: A function to apply to every item.
+    items: An iterable of items.
+    max_workers: Maximum number of concurrent calls. None means
+      DEFAULT_MAX_WORKERS.
+
+  Returns:
+    A list of results of the function in the order of the items.
+
+  Raises:
+    Exception: The first (in the order of the items) exception raised by the
+      function. It is raised after all the calls have finished.
+  """
+  if max_workers is None:
+    max_workers = DEFAULT_MAX_WORKERS
+
+  items = list(items)
+  results = [None] * len(items)
+  exc_infos = [None] * len(items)
+
+  lock = threading.Lock()
+  indices = iter(range(len(items)))
+
+  def Worker():
+    while True:
+      with lock:
+        index = next(indices, None)
+      if index is None:
+        return
+
+      try:
+        results[index] = function(items[index])
+      except Exception:  # pylint: disable=broad-except
+        exc_infos[index] = sys.exc_info()
+
+  threads = [
+      threading.Thread(target=Worker)
+      for _ in range(min(max_workers, len(items)))
+  ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  for exc_info in exc_infos:
+    if exc_info is not None:
+      raise_(*exc_info)
+
+  return results
 
 
 AFF4_PREFIX = "aff4:/"
@@ -38,7 +38,7 @@ def FileFinderOSFromClient(args):
 
   opts = args.action.stat
 
-  for path in GetExpandedPaths(args):
+  for path in GetExpandedPaths(args, stat_cache=stat_cache):
     try:
       content_conditions = conditions.ContentCondition.Parse(args.conditions)
       for content_condition in content_conditions:
@@ -75,7 +75,7 @@ class FileFinderOS(actions.ActionPlugin):
     self._content_conditions = list(
         conditions.ContentCondition.Parse(args.conditions))
 
-    for path in GetExpandedPaths(args):
+    for path in GetExpandedPaths(args, stat_cache=self.stat_cache):
       self.Progress()
       try:
         matches = self._Validate(args, path)
@@ -137,13 +137,17 @@ class FileFinderOS(actions.ActionPlugin):
       matches.extend(result)
 
 
-def GetExpandedPaths(
-    args):
+def GetExpandedPaths(args, stat_cache = None):
   """Expands given path patterns.
 
+  All patterns are expanded in a single traversal, so directories shared by
+  multiple patterns are listed only once.
+
   Args:
     args: A `FileFinderArgs` instance that dictates the behaviour of the path
       expansion.
+    stat_cache: An optional `filesystem.StatCache` to reuse stat results made
+      during the expansion.
 
   Yields:
     Absolute paths (as string objects) derived from input patterns.
@@ -159,11 +163,12 @@ def GetExpandedPaths(
   opts = globbing.PathOpts(
       follow_links=args.follow_links,
       recursion_blacklist=_GetMountpointBlacklist(args.xdev),
-      pathtype=pathtype)
+      pathtype=pathtype,
+      dir_cache=globbing.DirectoryCache(stat_cache=stat_cache))
 
-  for path in args.paths:
-    for expanded_path in globbing.ExpandPath(str(path), opts):
-      yield expanded_path
+  paths = [str(path) for path in args.paths]
+  for expanded_path in globbing.ExpandPaths(paths, opts):
+    yield expanded_path
 
 
 def _GetMountpoints(only_physical=True):
@@ -7,19 +7,69 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import abc
+import collections
 import fnmatch
 import itertools
 import os
 import platform
 import re
 
+from future.utils import itervalues
 from future.utils import with_metaclass
 from typing import Iterator, Optional, Text
 
 from grr_response_client import vfs
+from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr_response_core.lib.util import filesystem
 from grr_response_core.lib.util import precondition
 
+class DirectoryCache(object):
+  """A cache of directory listings and file types used during path expansion.
+
+  A single instance is meant to live for the duration of one client action so
+  that directories visited by multiple patterns (or multiple components of the
+  same pattern) are listed only once. Listings go through the VFS, so virtual
+  roots and platform specific semantics of the VFS handlers apply.
+
+  Stat results needed to tell directories apart are stored in a
+  `filesystem.StatCache` which can be shared with the code consuming the
+  expanded paths.
+
+  Args:
+    stat_cache: An optional `filesystem.StatCache` instance to use.
+    max_size: The maximum number of directory listings to hold.
+  """
+
+  DEFAULT_MAX_SIZE = 1000
+
+  def __init__(self, stat_cache=None, max_size=None):
+    self.stat_cache = stat_cache or filesystem.StatCache()
+    self._listings = utils.FastStore(max_size=max_size or self.DEFAULT_MAX_SIZE)
+
+  def ListDir(self, dirpath, pathtype):
+    """Returns names of the children of a given directory."""
+    key = (dirpath, pathtype)
+    try:
+      names = self._listings.Get(key)
+    except KeyError:
+      names = _ListDir(dirpath, pathtype)
+      self._listings.Put(key, names)
+
+    return list(names)
+
+  def IsDirectory(self, path, follow_links):
+    """Checks whether an OS path is a (possibly symlinked) directory."""
+    try:
+      stat = self.stat_cache.Get(path, follow_symlink=False)
+      if not stat.IsSymlink():
+        return stat.IsDirectory()
+      if not follow_links:
+        return False
+      return self.stat_cache.Get(path, follow_symlink=True).IsDirectory()
+    except OSError:
+      return False
+
 
 class PathOpts(object):
   """Options used for path expansion.
@@ -32,15 +82,19 @@ class PathOpts(object):
     recursion_blacklist: List of folders that the glob expansion should not
       recur to.
     pathtype: The pathtype to use.
+    dir_cache: An optional `DirectoryCache` to share listings and stat results
+      between multiple expansions.
   """
 
   def __init__(self,
                follow_links=False,
                recursion_blacklist=None,
-               pathtype=None):
+               pathtype=None,
+               dir_cache=None):
     self.follow_links = follow_links
     self.recursion_blacklist = set(recursion_blacklist or [])
     self.pathtype = pathtype or rdf_paths.PathSpec.PathType.OS
+    self.dir_cache = dir_cache or DirectoryCache()
 
   def __repr__(self):
     raw = "PathOpts(follow_links={}, recursion_blacklist={!r}, pathtype={})"
@@ -84,7 +138,7 @@ class RecursiveComponent(PathComponent):
     if depth > self.max_depth:
       return
 
-    for item in _ListDir(dirpath, self.opts.pathtype):
+    for item in self.opts.dir_cache.ListDir(dirpath, self.opts.pathtype):
       itempath = os.path.join(dirpath, item)
       yield itempath
 
@@ -95,8 +149,7 @@ class RecursiveComponent(PathComponent):
 
   def _Recurse(self, path, depth):
     if self.opts.pathtype == rdf_paths.PathSpec.PathType.OS:
-      if not os.path.isdir(path) or (not self.opts.follow_links and
-                                     os.path.islink(path)):
+      if not self.opts.dir_cache.IsDirectory(path, self.opts.follow_links):
         return
     elif self.opts.pathtype == rdf_paths.PathSpec.PathType.REGISTRY:
       pathspec = rdf_paths.PathSpec(
@@ -169,7 +222,7 @@ class GlobComponent(PathComponent):
     if literal_match is not None:
       yield os.path.join(dirpath, literal_match)
 
-    for item in _ListDir(dirpath, self.opts.pathtype):
+    for item in self.opts.dir_cache.ListDir(dirpath, self.opts.pathtype):
       if self.regex.match(item) and item != literal_match:
         yield os.path.join(dirpath, item)
 
@@ -262,12 +315,7 @@ def ParsePath(path,
 
   rcount = 0
 
-  # Split the path at all forward slashes and if running under Windows, also
-  # backward slashes. This allows ParsePath to handle native paths and also
-  # normalized VFS paths like /HKEY_LOCAL_MACHINE/SAM.
-  normalized_path = path.replace(os.path.sep, "/")
-
-  for item in normalized_path.split("/"):
+  for item in _SplitPath(path):
     component = ParsePathItem(item, opts=opts)
     if isinstance(component, RecursiveComponent):
       rcount += 1
@@ -276,6 +324,14 @@ def ParsePath(path,
     yield component
 
 
+def _SplitPath(path):
+  # Split the path at all forward slashes and if running under Windows, also
+  # backward slashes. This allows ParsePath to handle native paths and also
+  # normalized VFS paths like /HKEY_LOCAL_MACHINE/SAM.
+  normalized_path = path.replace(os.path.sep, "/")
+  return normalized_path.split("/")
+
+
 def ExpandPath(path, opts=None):
   """Applies all expansion mechanisms to the given path.
 
@@ -293,6 +349,68 @@ def ExpandPath(path, opts=None):
       yield globbed_path
 
 
+def ExpandPaths(paths,
+                opts = None):
+  """Applies all expansion mechanisms to the given paths in a single traversal.
+
+  All the paths (after group expansion) are merged into a prefix tree of path
+  components, so directories matched by a shared prefix of multiple patterns
+  are visited only once.
+
+  Args:
+    paths: Paths to expand.
+    opts: A `PathOpts` object.
+
+  Yields:
+    All paths possible to obtain from given paths by performing expansions.
+  """
+  roots = collections.OrderedDict()
+
+  for path in paths:
+    precondition.AssertType(path, Text)
+
+    for grouped_path in ExpandGroups(path):
+      root_dir, tail = _SplitRoot(grouped_path, opts)
+      components = list(ParsePath(tail, opts=opts))
+
+      node = roots.setdefault(root_dir, _PathTrieNode())
+      node.Insert(list(zip(_SplitPath(tail), components)))
+
+  for root_dir, node in roots.items():
+    for expanded_path in node.Expand(root_dir):
+      yield expanded_path
+
+
+class _PathTrieNode(object):
+  """A node of a prefix tree of parsed path components."""
+
+  def __init__(self):
+    # Maps raw path items to (component, child node) pairs.
+    self.children = collections.OrderedDict()
+    self.terminal = False
+
+  def Insert(self, items):
+    node = self
+    for item, component in items:
+      try:
+        _, node = node.children[item]
+      except KeyError:
+        child = _PathTrieNode()
+        node.children[item] = (component, child)
+        node = child
+
+    node.terminal = True
+
+  def Expand(self, basepath):
+    if self.terminal:
+      yield basepath
+
+    for component, child in itervalues(self.children):
+      for childpath in component.Generate(basepath):
+        for path in child.Expand(childpath):
+          yield path
+
+
 def ExpandGroups(path):
   """Performs group expansion on a given path.
 
@@ -339,6 +457,26 @@ def ExpandGlobs(path, opts = None):
     ValueError: If given path is empty or relative.
   """
   precondition.AssertType(path, Text)
+
+  root_dir, tail = _SplitRoot(path, opts)
+  components = list(ParsePath(tail, opts=opts))
+
+  return _ExpandComponents(root_dir, components)
+
+
+def _SplitRoot(path, opts = None):
+  """Splits an absolute path into its root directory and the remaining tail.
+
+  Args:
+    path: An absolute path.
+    opts: A `PathOpts` object.
+
+  Returns:
+    A tuple with the root directory and the path relative to it.
+
+  Raises:
+    ValueError: If given path is empty or relative.
+  """
   if not path:
     raise ValueError("Path is empty")
 
@@ -348,13 +486,11 @@ def ExpandGlobs(path, opts = None):
   if opts is not None and opts.pathtype == rdf_paths.PathSpec.PathType.REGISTRY:
     # Handle HKLM\Foo and /HKLM/Foo identically.
     root_dir, tail = path.replace("\\", "/").lstrip("/").split("/", 1)
-    components = list(ParsePath(tail, opts=opts))
-  else:
-    drive, tail = os.path.splitdrive(path)
-    root_dir = os.path.join(drive, os.path.sep).upper()
-    components = list(ParsePath(tail[1:], opts=opts))
+    return root_dir, tail
 
-  return _ExpandComponents(root_dir, components)
+  drive, tail = os.path.splitdrive(path)
+  root_dir = os.path.join(drive, os.path.sep).upper()
+  return root_dir, tail[1:]
 
 
 def _IsAbsolutePath(path, opts = None):
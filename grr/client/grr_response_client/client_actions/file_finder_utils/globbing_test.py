@@ -6,6 +6,7 @@ from __future__ import unicode_literals
 
 import io
 import os
+import platform
 import shutil
 import unittest
 
@@ -13,8 +14,11 @@ import unittest
 from absl import app
 from absl.testing import absltest
 from future.builtins import zip
+import mock
 
+from grr_response_client import vfs
 from grr_response_client.client_actions.file_finder_utils import globbing
+from grr_response_core.lib.util import filesystem
 from grr_response_core.lib.util import temp
 from grr.test_lib import test_lib
 
@@ -806,6 +810,114 @@ class ExpandPathTest(DirHierarchyTestMixin, absltest.TestCase):
     ])
 
 
+class ExpandPathsTest(DirHierarchyTestMixin, absltest.TestCase):
+
+  def testMultiplePatterns(self):
+    self.Touch("foo", "bar", "0")
+    self.Touch("foo", "bar", "1")
+    self.Touch("foo", "baz", "0")
+    self.Touch("quux", "0")
+
+    paths = [
+        self.Path("foo/*/0"),
+        self.Path("foo/bar/{0,1}"),
+        self.Path("quux/*"),
+    ]
+    results = list(globbing.ExpandPaths(paths))
+    self.assertCountEqual(results, [
+        self.Path("foo", "bar", "0"),
+        self.Path("foo", "baz", "0"),
+        self.Path("foo", "bar", "0"),
+        self.Path("foo", "bar", "1"),
+        self.Path("quux", "0"),
+    ])
+
+  def testPrefixPattern(self):
+    self.Touch("foo", "bar", "0")
+
+    paths = [self.Path("foo/*"), self.Path("foo/*/*")]
+    results = list(globbing.ExpandPaths(paths))
+    self.assertCountEqual(results, [
+        self.Path("foo", "bar"),
+        self.Path("foo", "bar", "0"),
+    ])
+
+  def testSharedPrefixIsListedOnce(self):
+    self.Touch("foo", "bar", "0")
+    self.Touch("foo", "bar", "1")
+
+    dir_cache = globbing.DirectoryCache()
+    opts = globbing.PathOpts(dir_cache=dir_cache)
+
+    paths = [self.Path("foo/*/0"), self.Path("foo/*/1")]
+    with mock.patch.object(
+        globbing, "_ListDir", wraps=globbing._ListDir) as list_dir:
+      results = list(globbing.ExpandPaths(paths, opts))
+
+    self.assertCountEqual(results, [
+        self.Path("foo", "bar", "0"),
+        self.Path("foo", "bar", "1"),
+    ])
+
+    listed = [call[0][0] for call in list_dir.call_args_list]
+    self.assertEqual(listed.count(self.Path("foo")), 1)
+    self.assertEqual(listed.count(self.Path("foo", "bar")), 1)
+
+  @unittest.skipIf(platform.system() == "Windows",
+                   "Virtual root paths are POSIX paths.")
+  def testVirtualRoot(self):
+    self.Touch("root", "foo", "0")
+    self.Touch("root", "foo", "1")
+    self.Touch("foo", "2")
+
+    self.addCleanup(vfs.Init)
+    with test_lib.ConfigOverrider(
+        {"Client.vfs_virtualroots": ["os:%s" % self.Path("root")]}):
+      vfs.Init()
+      results = list(globbing.ExpandPaths(["/foo/*"]))
+
+    self.assertCountEqual(results, ["/foo/0", "/foo/1"])
+
+  def testRelativePathRaises(self):
+    with self.assertRaises(ValueError):
+      list(globbing.ExpandPaths([os.path.join("foo", "bar")]))
+
+
+class DirectoryCacheTest(DirHierarchyTestMixin, absltest.TestCase):
+
+  def testIsDirectory(self):
+    self.Touch("foo", "bar")
+
+    dir_cache = globbing.DirectoryCache()
+    dir_cache.ListDir(self.Path(), globbing.rdf_paths.PathSpec.PathType.OS)
+
+    self.assertTrue(dir_cache.IsDirectory(self.Path("foo"), False))
+    self.assertFalse(dir_cache.IsDirectory(self.Path("foo", "bar"), False))
+    self.assertFalse(dir_cache.IsDirectory(self.Path("baz"), False))
+
+  def testIsDirectorySymlink(self):
+    self.Touch("foo", "bar")
+    os.symlink(self.Path("foo"), self.Path("quux"))
+
+    dir_cache = globbing.DirectoryCache()
+    dir_cache.ListDir(self.Path(), globbing.rdf_paths.PathSpec.PathType.OS)
+
+    self.assertFalse(dir_cache.IsDirectory(self.Path("quux"), False))
+    self.assertTrue(dir_cache.IsDirectory(self.Path("quux"), True))
+
+  def testStatCacheIsShared(self):
+    self.Touch("foo", "bar")
+
+    stat_cache = filesystem.StatCache()
+    dir_cache = globbing.DirectoryCache(stat_cache=stat_cache)
+    self.assertTrue(dir_cache.IsDirectory(self.Path("foo"), False))
+
+    with mock.patch.object(os, "lstat") as lstat:
+      stat = stat_cache.Get(self.Path("foo"), follow_symlink=False)
+    self.assertFalse(lstat.called)
+    self.assertTrue(stat.IsDirectory())
+
+
 def main(argv):
   test_lib.main(argv)
 
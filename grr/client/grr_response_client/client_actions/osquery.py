@@ -5,15 +5,17 @@ from __future__ import division
 
 from __future__ import unicode_literals
 
+import codecs
 import collections
 import os
+import tempfile
+import threading
 
 from future.builtins import map
 from future.utils import iterkeys
 from typing import Any
 from typing import Iterator
 from typing import List
-from typing import NamedTuple
 from typing import Text
 
 from grr_response_client import actions
@@ -83,20 +85,25 @@ class Osquery(actions.ActionPlugin):
     if not args.query:
       raise ValueError("The `Osquery` was invoked with an empty query.")
 
-    output = Query(args)
+    max_chunk_size = config.CONFIG["Osquery.max_chunk_size"]
 
-    # For syntax errors, osquery does not fail (exits with 0) but prints stuff
-    # to the standard error.
-    if output.stderr and not args.ignore_stderr_errors:
-      raise QueryError(output.stderr)
+    with QueryProcess(args) as proc:
+      # Chunks are yielded as soon as they are full, but the last one is held
+      # back until osquery exits so that it can carry the standard error.
+      last_chunk = None
+      for chunk in ParseTableChunks(args.query, proc.Rows(), max_chunk_size):
+        if last_chunk is not None:
+          yield rdf_osquery.OsqueryResult(table=last_chunk)
+        last_chunk = chunk
 
-    json_decoder = json.Decoder(object_pairs_hook=collections.OrderedDict)
+      stderr = proc.Wait()
 
-    table = ParseTable(json_decoder.decode(output.stdout))
-    table.query = args.query
+    # For syntax errors, osquery does not fail (exits with 0) but prints stuff
+    # to the standard error.
+    if stderr and not args.ignore_stderr_errors:
+      raise QueryError(stderr)
 
-    for chunk in ChunkTable(table, config.CONFIG["Osquery.max_chunk_size"]):
-      yield rdf_osquery.OsqueryResult(table=chunk, stderr=output.stderr)
+    yield rdf_osquery.OsqueryResult(table=last_chunk, stderr=stderr)
 
 
 def ChunkTable(table,
@@ -120,23 +127,34 @@ def ChunkTable(table,
     rows.
   """
 
+  return _ChunkRows(table.query, table.header, table.rows, max_chunk_size)
+
+
+def _ChunkRows(query,
+               header,
+               rows,
+               max_chunk_size):
+  """Chunks given rows into tables not exceeding the specified size."""
+
   def ByteLength(string):
     return len(string.encode("utf-8"))
 
   def Chunk():
     result = rdf_osquery.OsqueryTable()
-    result.query = table.query
-    result.header = table.header
+    result.query = query
+    result.header = header
     return result
 
   chunk = Chunk()
   chunk_size = 0
+  chunk_count = 0
 
-  for row in table.rows:
+  for row in rows:
     row_size = sum(map(ByteLength, row.values))
 
-    if chunk_size + row_size > max_chunk_size:
+    if chunk_size + row_size > max_chunk_size and chunk.rows:
       yield chunk
+      chunk_count += 1
 
       chunk = Chunk()
       chunk_size = 0
@@ -149,7 +167,53 @@ def ChunkTable(table,
   #   been yielded as part of the loop.
   # * the initial table has no rows but we still need to yield some table even
   #   if it is empty.
-  if chunk.rows or not table.rows:
+  if chunk.rows or not chunk_count:
+    yield chunk
+
+
+def ParseTableChunks(query,
+                     table,
+                     max_chunk_size):
+  """Parses a stream of osquery output rows into tables of limited size.
+
+  Unlike `ParseTable`, this never holds more than a single chunk of the table
+  in memory, so it can be used to process arbitrarily large osquery outputs.
+
+  Args:
+    query: A query that yielded the table.
+    table: An iterator over rows in a "parsed JSON" representation.
+    max_chunk_size: A maximum size of the returned tables in bytes.
+
+  Yields:
+    Parsed `rdf_osquery.OsqueryTable` instances with the same header.
+
+  Raises:
+    ValueError: If the rows do not have the same columns.
+  """
+  table = iter(table)
+
+  first_row = next(table, None)
+  if first_row is None:
+    header = ParseHeader([])
+  else:
+    header = ParseHeader([first_row])
+
+  def Rows():
+    if first_row is None:
+      return
+
+    yield ParseRow(header, first_row)
+
+    expected = [column.name for column in header.columns]
+    for row in table:
+      columns = list(iterkeys(row))
+      if columns != expected:
+        message = "Expected columns '{expected}', got '{actual}'"
+        raise ValueError(message.format(expected=expected, actual=columns))
+
+      yield ParseRow(header, row)
+
+  for chunk in _ChunkRows(query, header, Rows(), max_chunk_size):
     yield chunk
 
 
@@ -219,51 +283,178 @@ def ParseRow(header,
   return result
 
 
-# TODO(hanuszczak): https://github.com/python/typeshed/issues/2761
-ProcOutput = NamedTuple("ProcOutput", [("stdout", Text), ("stderr", Text)])  # pytype: disable=wrong-arg-types
-
+def ParseJSONRows(filedesc,
+                  read_size = 64 * 1024):
+  """Incrementally parses a JSON array of objects from given file descriptor.
 
-def Query(args):
-  """Calls osquery with given query and returns its output.
+  osquery outputs results as a single JSON array. Instead of reading the whole
+  output and decoding it at once, objects are decoded one at a time as soon as
+  enough of the input has been read.
 
   Args:
-    args: A query to call osquery with.
+    filedesc: A binary file descriptor with UTF-8 encoded JSON to read from.
+    read_size: A number of bytes to read from the descriptor at once.
 
-  Returns:
-    A "parsed JSON" representation of the osquery output.
+  Yields:
+    Objects of the array in a "parsed JSON" representation.
 
   Raises:
-    QueryError: If the query is incorrect.
-    TimeoutError: If a call to the osquery executable times out.
-    Error: If anything else goes wrong with the subprocess call.
+    ValueError: If the input is not a valid JSON array.
+  """
+  json_decoder = json.Decoder(object_pairs_hook=collections.OrderedDict)
+  utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+
+  buf = ""
+  pos = 0
+  eof = False
+
+  started = False
+  expect_value = True
+
+  while True:
+    while pos < len(buf) and buf[pos].isspace():
+      pos += 1
+
+    value = None
+    if pos < len(buf):
+      char = buf[pos]
+      if not started:
+        if char != "[":
+          raise ValueError("Expected '[' at the beginning of JSON array")
+        started = True
+        pos += 1
+        continue
+      elif char == "]":
+        return
+      elif char == "," and not expect_value:
+        expect_value = True
+        pos += 1
+        continue
+      elif expect_value:
+        try:
+          value, pos = json_decoder.raw_decode(buf, pos)
+        except ValueError:
+          # The object might just be incomplete, so we have to read more.
+          if eof:
+            raise
+      else:
+        raise ValueError("Unexpected character '{}' in JSON array".format(char))
+
+    if value is not None:
+      expect_value = False
+      yield value
+    elif eof:
+      if started:
+        raise ValueError("Unexpected end of JSON array")
+      # No output at all (e.g. because the query is invalid).
+      return
+    else:
+      data = filedesc.read(read_size)
+      if data:
+        buf = buf[pos:] + utf8_decoder.decode(data)
+      else:
+        eof = True
+        buf = buf[pos:] + utf8_decoder.decode(b"", final=True)
+      pos = 0
+
+
+class QueryProcess(object):
+  """A context manager running osquery and streaming its output.
+
+  Args:
+    args: A query to call osquery with.
   """
-  query = args.query.encode("utf-8")
-  timeout = args.timeout_millis / 1000  # `subprocess.run` uses seconds.
-  # TODO: pytype is not aware of the backport.
-  # pytype: disable=module-attr
-  try:
+
+  def __init__(self, args):
+    self._args = args
+    self._proc = None
+    self._stderr = None
+    self._alarm = None
+    self._timed_out = False
+
+  def __enter__(self):
+    query = self._args.query.encode("utf-8")
+    timeout = self._args.timeout_millis / 1000  # `threading.Timer` uses seconds.
+
+    # The standard error is usually tiny, but it has to be consumed while the
+    # standard output is read. Storing it in a temporary file is the simplest
+    # way to avoid a deadlock on a full pipe.
+    self._stderr = tempfile.TemporaryFile()
+
     # We use `--S` to enforce shell execution. This is because on Windows there
     # is only `osqueryd` and `osqueryi` is not available. However, by passing
     # `--S` we can make `osqueryd` behave like `osqueryi`. Since this flag also
     # works with `osqueryi`, by passing it we simply expand number of supported
     # executable types.
     command = [config.CONFIG["Osquery.path"], "--S", "--json", query]
-    proc = subprocess.run(
-        command,
-        timeout=timeout,
-        check=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE)
-  # TODO: Since we use a backported API, `SubprocessError` is hard
-  # to work with. Until support for Python 2 is dropped we re-raise with simpler
-  # exception type because we don't really care that much (the exception message
-  # should be detailed enough anyway).
-  except subprocess.TimeoutExpired as error:
-    raise TimeoutError(cause=error)
-  except subprocess.CalledProcessError as error:
-    raise Error("osquery invocation error", cause=error)
-  # pytype: enable=module-attr
-
-  stdout = proc.stdout.decode("utf-8")
-  stderr = proc.stderr.decode("utf-8").strip()
-  return ProcOutput(stdout=stdout, stderr=stderr)
+    try:
+      self._proc = subprocess.Popen(
+          command, stdout=subprocess.PIPE, stderr=self._stderr)
+    except (OSError, ValueError) as error:
+      self._stderr.close()
+      raise Error("osquery invocation error", cause=error)
+
+    self._alarm = threading.Timer(timeout, self._Timeout)
+    self._alarm.daemon = True
+    self._alarm.start()
+
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self._alarm.cancel()
+    self._alarm.join()
+    self._Kill()
+    self._proc.stdout.close()
+    self._proc.wait()
+    self._stderr.close()
+
+  def _Timeout(self):
+    self._timed_out = True
+    self._Kill()
+
+  def _Kill(self):
+    if self._proc.poll() is None:
+      try:
+        self._proc.kill()
+      except OSError:
+        pass
+
+  def Rows(self):
+    """Yields osquery output rows as soon as they are read from the output.
+
+    Yields:
+      Rows in a "parsed JSON" representation.
+
+    Raises:
+      TimeoutError: If a call to the osquery executable times out.
+      Error: If the output of osquery is not valid.
+    """
+    try:
+      for row in ParseJSONRows(self._proc.stdout):
+        yield row
+    except ValueError as error:
+      if self._timed_out:
+        raise TimeoutError(cause=error)
+      raise Error("invalid osquery output", cause=error)
+
+  def Wait(self):
+    """Waits for osquery to finish and returns its standard error.
+
+    Returns:
+      The standard error output of osquery.
+
+    Raises:
+      TimeoutError: If a call to the osquery executable times out.
+      Error: If osquery exits with a non-zero status.
+    """
+    returncode = self._proc.wait()
+    self._alarm.cancel()
+
+    if self._timed_out:
+      raise TimeoutError()
+    if returncode != 0:
+      raise Error("osquery invocation error",
+                  cause="exit status {}".format(returncode))
+
+    self._stderr.seek(0)
+    return self._stderr.read().decode("utf-8").strip()
@@ -256,6 +256,132 @@ class FakeOsqueryTest(absltest.TestCase):
     self.assertEqual(list(table.Column("bar")), ["norf"])
     self.assertEqual(list(table.Column("baz")), ["thud"])
 
+  def testMultipleChunks(self):
+    stdout = """
+    [
+      { "foo": "abc", "bar": "def" },
+      { "foo": "ghi", "bar": "jkl" },
+      { "foo": "mno", "bar": "pqr" }
+    ]
+    """
+    stderr = "Warning: something unimportant"
+    with osquery_test_lib.FakeOsqueryiOutput(stdout=stdout, stderr=stderr):
+      with test_lib.ConfigOverrider({"Osquery.max_chunk_size": 6}):
+        results = _Query("SELECT foo, bar FROM quux;", ignore_stderr_errors=True)
+
+    self.assertLen(results, 3)
+    self.assertEqual(list(results[0].table.Column("foo")), ["abc"])
+    self.assertEqual(list(results[1].table.Column("foo")), ["ghi"])
+    self.assertEqual(list(results[2].table.Column("foo")), ["mno"])
+
+    # Only the last chunk carries the standard error output.
+    self.assertEqual(results[0].stderr, "")
+    self.assertEqual(results[1].stderr, "")
+    self.assertEqual(results[2].stderr, stderr)
+
+  def testInvalidOutput(self):
+    stdout = """
+    [
+      { "foo": "bar" },
+      { "foo":
+    """
+    with osquery_test_lib.FakeOsqueryiOutput(stdout=stdout, stderr=""):
+      with self.assertRaises(osquery.Error):
+        _Query("SELECT foo FROM quux;")
+
+
+class ParseJSONRowsTest(absltest.TestCase):
+
+  def _Parse(self, content, read_size=1):
+    return list(osquery.ParseJSONRows(io.BytesIO(content), read_size=read_size))
+
+  def testEmptyOutput(self):
+    self.assertEqual(self._Parse(b""), [])
+    self.assertEqual(self._Parse(b"  \n"), [])
+
+  def testEmptyArray(self):
+    self.assertEqual(self._Parse(b"[]"), [])
+    self.assertEqual(self._Parse(b" [ \n ] "), [])
+
+  def testRows(self):
+    content = b"""
+    [
+      {"foo": "bar", "baz": "quux"},
+      {"foo": "norf", "baz": "thud"}
+    ]
+    """
+    for read_size in [1, 3, 1024]:
+      rows = self._Parse(content, read_size=read_size)
+      self.assertLen(rows, 2)
+      self.assertEqual(list(rows[0].items()), [("foo", "bar"), ("baz", "quux")])
+      self.assertEqual(list(rows[1].items()), [("foo", "norf"), ("baz", "thud")])
+
+  def testMultiByteCharacters(self):
+    content = "[{\"foo\": \"zółć\"}, {\"foo\": \"🐔\"}]".encode("utf-8")
+    rows = self._Parse(content)
+    self.assertEqual([row["foo"] for row in rows], ["zółć", "🐔"])
+
+  def testIsLazy(self):
+    content = io.BytesIO(b'[{"foo": "bar"},' + b" " * 1024 + b"]")
+    rows = osquery.ParseJSONRows(content, read_size=32)
+    self.assertEqual(next(rows), {"foo": "bar"})
+    self.assertLess(content.tell(), 1024)
+
+  def testTruncated(self):
+    with self.assertRaises(ValueError):
+      self._Parse(b'[{"foo": "bar"}, {"foo"')
+
+  def testNotAnArray(self):
+    with self.assertRaises(ValueError):
+      self._Parse(b'{"foo": "bar"}')
+
+  def testMissingSeparator(self):
+    with self.assertRaises(ValueError):
+      self._Parse(b'[{"foo": "bar"} {"foo": "baz"}]')
+
+
+class ParseTableChunksTest(absltest.TestCase):
+
+  def testEmpty(self):
+    chunks = list(osquery.ParseTableChunks("SELECT * FROM foo;", [], 1024))
+    self.assertLen(chunks, 1)
+    self.assertEqual(chunks[0].query, "SELECT * FROM foo;")
+    self.assertEmpty(chunks[0].header.columns)
+    self.assertEmpty(chunks[0].rows)
+
+  def testChunks(self):
+    rows = []
+    for values in [("A", "B"), ("C", "D"), ("E", "F")]:
+      row = collections.OrderedDict()
+      row["foo"] = values[0]
+      row["bar"] = values[1]
+      rows.append(row)
+
+    chunks = list(osquery.ParseTableChunks("SELECT * FROM quux;", rows, 4))
+    self.assertLen(chunks, 2)
+    for chunk in chunks:
+      self.assertEqual(chunk.query, "SELECT * FROM quux;")
+      self.assertEqual([column.name for column in chunk.header.columns],
+                       ["foo", "bar"])
+
+    self.assertEqual(chunks[0].rows, [
+        rdf_osquery.OsqueryRow(values=["A", "B"]),
+        rdf_osquery.OsqueryRow(values=["C", "D"]),
+    ])
+    self.assertEqual(chunks[1].rows, [
+        rdf_osquery.OsqueryRow(values=["E", "F"]),
+    ])
+
+  def testIncompatibleRows(self):
+    row0 = collections.OrderedDict()
+    row0["foo"] = "quux"
+
+    row1 = collections.OrderedDict()
+    row1["bar"] = "thud"
+
+    with self.assertRaises(ValueError):
+      list(osquery.ParseTableChunks("SELECT * FROM foo;", [row0, row1], 1024))
+
 
 class ChunkTableTest(absltest.TestCase):
 
@@ -9,12 +9,17 @@ import logging
 import re
 import stat
 
+from future.utils import iteritems
+
 from grr_response_client import actions
 from grr_response_client import vfs
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_action as rdf_client_action
 from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
 from grr_response_core.lib.rdfvalues import flows as rdf_flows
+from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr_response_core.lib.rdfvalues import standard as rdf_standard
 
 
 class Find(actions.ActionPlugin):
@@ -187,6 +192,163 @@ class Find(actions.ActionPlugin):
         return
 
 
+class ExpandGlobs(actions.ActionPlugin):
+  """Expands a tree of glob components built by the server.
+
+  The server converts glob patterns into a tree of literal, regex and recursive
+  path components. Walking this tree from the server costs a client round trip
+  for every component, so instead the whole tree is sent here and expanded
+  locally through the VFS. This works for all the path types the VFS supports.
+  The expansion follows the same rules as the server side `GlobLogic`.
+  """
+  in_rdfvalue = rdf_client_action.ExpandGlobsRequest
+  out_rdfvalues = [rdf_client_fs.StatEntry]
+
+  def Run(self, args):
+    self.request = args
+    self._ProcessResponse(None, [list(args.roots)])
+
+  def _GetBasePathspec(self, response):
+    if response:
+      return response.pathspec.Copy()
+    if self.request.HasField("root_path"):
+      return self.request.root_path.Copy()
+    return None
+
+  def _ProcessResponse(self, response, node_lists, base_wildcard=False):
+    """Expands the given nodes below the path of a response."""
+    for nodes in node_lists:
+      if not nodes:
+        # There are no further components - we found a hit.
+        self.SendReply(response)
+        return
+
+      regexes = []
+      recursions = {}
+
+      for node in nodes:
+        component = node.component
+
+        # Only go deeper into the directory structure if the last response was
+        # a proper directory, it was a file (an image) that was given
+        # explicitly or process_non_regular_files was set.
+        if response and not (stat.S_ISDIR(int(response.st_mode)) or
+                             not base_wildcard or
+                             self.request.process_non_regular_files):
+          continue
+
+        if component.path_options == component.Options.RECURSIVE:
+          recursions.setdefault(component.recursion_depth, []).append(node)
+        elif component.path_options == component.Options.REGEX:
+          regexes.append(node)
+        elif component.path_options == component.Options.CASE_INSENSITIVE:
+          base_pathspec = self._GetBasePathspec(response)
+          if base_pathspec:
+            pathspec = base_pathspec.Append(component)
+          else:
+            pathspec = component.Copy()
+
+          if node.children:
+            # Intermediate literal components do not need to be checked.
+            self._ProcessResponse(
+                rdf_client_fs.StatEntry(pathspec=pathspec), [node.children])
+          elif (response is None or response.st_mode == 0 or
+                not stat.S_ISREG(int(response.st_mode))):
+            # The last component must exist, so we need to stat it.
+            stat_entry = self._Stat(pathspec)
+            if stat_entry is not None:
+              self.SendReply(stat_entry)
+
+      if recursions or regexes:
+        base_pathspec = self._GetBasePathspec(response)
+        if not base_pathspec:
+          base_pathspec = rdf_paths.PathSpec(
+              path="/", pathtype=self.request.pathtype)
+
+        for depth, recursion_nodes in iteritems(recursions):
+          path_regex = self._BuildPathRegex(recursion_nodes)
+          for stat_entry in self._ListDirectory(
+              base_pathspec, depth, path_regex, cross_devs=True):
+            self._ProcessMatches(stat_entry, nodes)
+
+        if regexes:
+          path_regex = self._BuildPathRegex(regexes)
+          for stat_entry in self._ListDirectory(base_pathspec, 1, path_regex):
+            self._ProcessMatches(stat_entry, nodes)
+
+  def _ProcessMatches(self, stat_entry, nodes):
+    matching = [
+        node.children
+        for node in nodes
+        if self._MatchPath(node.component, stat_entry)
+    ]
+    if matching:
+      self._ProcessResponse(stat_entry, matching, base_wildcard=True)
+
+  def _MatchPath(self, pathspec, response):
+    """Checks if the response matches the pathspec (considering options)."""
+    to_match = response.pathspec.Basename()
+    if pathspec.path_options == rdf_paths.PathSpec.Options.CASE_INSENSITIVE:
+      return to_match.lower() == pathspec.path.lower()
+    elif pathspec.path_options == rdf_paths.PathSpec.Options.CASE_LITERAL:
+      return to_match == pathspec.path
+    elif pathspec.path_options == rdf_paths.PathSpec.Options.REGEX:
+      return bool(re.match(pathspec.path, to_match, flags=re.IGNORECASE))
+    elif pathspec.path_options == rdf_paths.PathSpec.Options.RECURSIVE:
+      return True
+    raise ValueError("Unknown Pathspec type.")
+
+  def _BuildPathRegex(self, nodes):
+    paths = set(node.component.path for node in nodes)
+    return rdf_standard.RegularExpression("(?i)^" + "$|^".join(paths) + "$")
+
+  def _Stat(self, pathspec):
+    try:
+      fd = vfs.VFSOpen(pathspec, progress_callback=self.Progress)
+      return fd.Stat(ext_attrs=self.request.collect_ext_attrs)
+    except (IOError, OSError) as e:
+      logging.info("ExpandGlobs failed to stat %s. Err: %s", pathspec, e)
+      return None
+
+  def _ListDirectory(self,
+                     pathspec,
+                     max_depth,
+                     path_regex,
+                     cross_devs=False,
+                     depth=0,
+                     filesystem_id=None):
+    """Yields entries below pathspec with a basename matching path_regex."""
+    if depth >= max_depth:
+      return
+
+    try:
+      fd = vfs.VFSOpen(pathspec, progress_callback=self.Progress)
+      files = fd.ListFiles()
+      # Do not traverse directories in a different filesystem.
+      if not cross_devs and filesystem_id is None:
+        filesystem_id = fd.Stat().st_dev
+    except (IOError, OSError) as e:
+      logging.info("ExpandGlobs failed to list %s. Err: %s", pathspec, e)
+      return
+
+    for file_stat in files:
+      self.Progress()
+
+      if stat.S_ISDIR(int(file_stat.st_mode)):
+        if cross_devs or filesystem_id == file_stat.st_dev:
+          for child_stat in self._ListDirectory(
+              file_stat.pathspec,
+              max_depth,
+              path_regex,
+              cross_devs=cross_devs,
+              depth=depth + 1,
+              filesystem_id=filesystem_id):
+            yield child_stat
+
+      if path_regex.Search(file_stat.pathspec.Basename()):
+        yield file_stat
+
+
 class Grep(actions.ActionPlugin):
   """Search a file for a pattern."""
   in_rdfvalue = rdf_client_fs.GrepSpec
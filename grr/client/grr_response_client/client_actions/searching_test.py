@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 import functools
 import os
+import shutil
 
 
 from absl import app
@@ -15,6 +16,7 @@ from future.builtins import range
 from grr_response_client import vfs
 from grr_response_client.client_actions import searching
 from grr_response_core.lib import utils
+from grr_response_core.lib.rdfvalues import client_action as rdf_client_action
 from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
 from grr_response_core.lib.util import temp
@@ -429,6 +431,82 @@ class FindExtAttrsTest(client_test_lib.EmptyActionTest):
       self.assertCountEqual(values, [b"foo", b"bar", b"baz"])
 
 
+def _GlobNode(path, options, children=(), recursion_depth=None):
+  component = rdf_paths.PathSpec(
+      path=path,
+      pathtype=rdf_paths.PathSpec.PathType.OS,
+      path_options=options)
+  if recursion_depth is not None:
+    component.recursion_depth = recursion_depth
+  return rdf_client_action.GlobComponentNode(
+      component=component, children=list(children))
+
+
+class ExpandGlobsTest(client_test_lib.EmptyActionTest):
+  """Test the ExpandGlobs client action."""
+
+  LITERAL = rdf_paths.PathSpec.Options.CASE_INSENSITIVE
+  REGEX = rdf_paths.PathSpec.Options.REGEX
+  RECURSIVE = rdf_paths.PathSpec.Options.RECURSIVE
+
+  def setUp(self):
+    super(ExpandGlobsTest, self).setUp()
+    self.temp_dirpath = temp.TempDirPath()
+    self.addCleanup(shutil.rmtree, self.temp_dirpath)
+
+    for path in ["foo/bar/quux.txt", "foo/baz/quux.txt", "foo/norf.log",
+                 "thud.txt"]:
+      filepath = os.path.join(self.temp_dirpath, path)
+      utils.EnsureDirExists(os.path.dirname(filepath))
+      with open(filepath, "w") as fd:
+        fd.write("x")
+
+  def _Expand(self, roots, **kwargs):
+    request = rdf_client_action.ExpandGlobsRequest(
+        roots=roots,
+        root_path=rdf_paths.PathSpec(
+            path=self.temp_dirpath, pathtype=rdf_paths.PathSpec.PathType.OS),
+        **kwargs)
+    results = self.RunAction(searching.ExpandGlobs, request)
+    return sorted(
+        os.path.relpath(r.pathspec.CollapsePath(), self.temp_dirpath)
+        for r in results)
+
+  def testLiteral(self):
+    roots = [
+        _GlobNode("foo", self.LITERAL, [_GlobNode("norf.log", self.LITERAL)]),
+        _GlobNode("THUD.txt", self.LITERAL),
+        _GlobNode("missing", self.LITERAL),
+    ]
+    self.assertEqual(self._Expand(roots), ["foo/norf.log", "thud.txt"])
+
+  def testRegex(self):
+    roots = [
+        _GlobNode("foo", self.LITERAL, [
+            _GlobNode("ba.*", self.REGEX,
+                      [_GlobNode("quux.txt", self.LITERAL)]),
+            _GlobNode(".*\\.log", self.REGEX),
+        ]),
+    ]
+    self.assertEqual(
+        self._Expand(roots),
+        ["foo/bar/quux.txt", "foo/baz/quux.txt", "foo/norf.log"])
+
+  def testRecursive(self):
+    roots = [_GlobNode(".*\\.txt", self.RECURSIVE, recursion_depth=3)]
+    self.assertEqual(
+        self._Expand(roots),
+        ["foo/bar/quux.txt", "foo/baz/quux.txt", "thud.txt"])
+
+  def testRecursionDepth(self):
+    roots = [_GlobNode(".*\\.txt", self.RECURSIVE, recursion_depth=1)]
+    self.assertEqual(self._Expand(roots), ["thud.txt"])
+
+  def testDoesNotDescendIntoFilesFoundByWildcards(self):
+    roots = [_GlobNode(".*", self.REGEX, [_GlobNode("x", self.LITERAL)])]
+    self.assertEqual(self._Expand(roots), [])
+
+
 class GrepTest(client_test_lib.EmptyActionTest):
   """Test the find client Actions."""
 
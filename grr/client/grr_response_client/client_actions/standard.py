@@ -19,6 +19,7 @@ import zlib
 
 
 from absl import flags
+from future.builtins import range
 import psutil
 from typing import Text
 
@@ -179,6 +180,33 @@ class ListDirectory(ReadBuffer):
       self.SendReply(response)
 
 
+class ListDirectoryBatched(ReadBuffer):
+  """Lists all the files in a directory sending stat entries in batches.
+
+  Sending a separate message for each file adds considerable overhead on both
+  the client and the server for large directories, so multiple stat entries
+  are packed into a single response.
+  """
+  in_rdfvalue = rdf_client_action.ListDirRequest
+  out_rdfvalues = [rdf_client_fs.StatEntryBatch]
+
+  def Run(self, args):
+    """Lists a directory."""
+    try:
+      directory = vfs.VFSOpen(args.pathspec, progress_callback=self.Progress)
+    except (IOError, OSError) as e:
+      self.SetStatus(rdf_flows.GrrStatus.ReturnedStatus.IOERROR, e)
+      return
+
+    files = list(directory.ListFiles())
+    files.sort(key=lambda x: x.pathspec.path)
+
+    batch_size = config.CONFIG["Client.list_directory_batch_size"]
+    for i in range(0, len(files), batch_size):
+      self.SendReply(
+          rdf_client_fs.StatEntryBatch(entries=files[i:i + batch_size]))
+
+
 def GetFileStatFromClient(args):
   fd = vfs.VFSOpen(args.pathspec)
   stat_entry = fd.Stat(ext_attrs=args.collect_ext_attrs)
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 import hashlib
 import io
+import os
 import sys
 
 from absl import app
@@ -254,6 +255,37 @@ class GetFileStatTest(client_test_lib.EmptyActionTest):
       self.assertEmpty(results[0].ext_attrs)
 
 
+class ListDirectoryBatchedTest(client_test_lib.EmptyActionTest):
+
+  def testBatches(self):
+    with temp.AutoTempDirPath(remove_non_empty=True) as temp_dirpath:
+      for name in ["foo", "bar", "baz", "quux", "norf"]:
+        with io.open(os.path.join(temp_dirpath, name), "wb"):
+          pass
+
+      pathspec = rdf_paths.PathSpec(
+          path=temp_dirpath, pathtype=rdf_paths.PathSpec.PathType.OS)
+      request = rdf_client_action.ListDirRequest(pathspec=pathspec)
+
+      with test_lib.ConfigOverrider({"Client.list_directory_batch_size": 2}):
+        results = self.RunAction(standard.ListDirectoryBatched, request)
+
+    self.assertEqual([len(batch.entries) for batch in results], [2, 2, 1])
+
+    names = [e.pathspec.Basename() for batch in results for e in batch.entries]
+    self.assertEqual(names, ["bar", "baz", "foo", "norf", "quux"])
+
+  def testEmptyDirectory(self):
+    with temp.AutoTempDirPath() as temp_dirpath:
+      pathspec = rdf_paths.PathSpec(
+          path=temp_dirpath, pathtype=rdf_paths.PathSpec.PathType.OS)
+      request = rdf_client_action.ListDirRequest(pathspec=pathspec)
+
+      results = self.RunAction(standard.ListDirectoryBatched, request)
+
+    self.assertEmpty(results)
+
+
 class TestNetworkByteLimits(client_test_lib.EmptyActionTest):
   """Test TransferBuffer network byte limits."""
 
@@ -83,9 +83,9 @@ def _GetExpandedPaths(args):
   opts = globbing.PathOpts(
       follow_links=args.follow_links, pathtype=args.pathtype)
 
-  for path in args.paths:
-    for expanded_path in globbing.ExpandPath(str(path), opts):
-      yield expanded_path
+  paths = [str(path) for path in args.paths]
+  for expanded_path in globbing.ExpandPaths(paths, opts):
+    yield expanded_path
 
 
 # TODO: This is only used by artifact_collector. It should be
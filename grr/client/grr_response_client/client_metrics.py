@@ -12,4 +12,6 @@ def GetMetadata():
   return [
       stats_utils.CreateCounterMetadata("grr_client_received_bytes"),
       stats_utils.CreateCounterMetadata("grr_client_sent_bytes"),
+      stats_utils.CreateCounterMetadata("grr_client_tsk_block_cache_hits"),
+      stats_utils.CreateCounterMetadata("grr_client_tsk_block_cache_misses"),
   ]
@@ -6,18 +6,22 @@ from __future__ import unicode_literals
 
 import logging
 import stat
+import threading
 
+from future.builtins import range
 import pytsk3
 
 from typing import Text
 
 from grr_response_client import client_utils
 from grr_response_client.vfs_handlers import base as vfs_base
+from grr_response_core import config
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
 from grr_response_core.lib.util import compatibility
 from grr_response_core.lib.util import precondition
+from grr_response_core.stats import stats_collector_instance
 
 # A central Cache for vfs handlers. This can be used to keep objects alive
 # for a limited time.
@@ -34,7 +38,11 @@ def _DecodeUTF8WithWarning(string):
 
 
 class CachedFilesystem(object):
-  """A container for the filesystem and image."""
+  """A container for the filesystem and image.
+
+  The image holds the raw device block cache, so all TSKFile instances opened
+  on the same device share it.
+  """
 
   def __init__(self, fs, img):
     self.fs = fs
@@ -42,20 +50,118 @@ class CachedFilesystem(object):
 
 
 class MyImgInfo(pytsk3.Img_Info):
-  """An Img_Info class using the regular python file handling."""
-
-  def __init__(self, fd=None, progress_callback=None):
+  """An Img_Info class using the regular python file handling.
+
+  Sleuthkit issues a large number of small, often sector sized, reads when
+  walking filesystem metadata. Every one of them would otherwise go through
+  the whole VFSHandler stack so we keep an LRU cache of fixed size blocks of the
+  underlying device and read ahead when we detect sequential access.
+  """
+
+  def __init__(self,
+               fd=None,
+               progress_callback=None,
+               block_size=None,
+               cache_size=None,
+               readahead_blocks=None):
     pytsk3.Img_Info.__init__(self)
     self.progress_callback = progress_callback
     self.fd = fd
 
+    if block_size is None:
+      block_size = config.CONFIG["Client.tsk_block_size"]
+    if cache_size is None:
+      cache_size = config.CONFIG["Client.tsk_block_cache_size"]
+    if readahead_blocks is None:
+      readahead_blocks = config.CONFIG["Client.tsk_readahead_blocks"]
+
+    if block_size <= 0:
+      raise ValueError("Block size must be positive, got %d." % block_size)
+
+    self.block_size = block_size
+    self.readahead_blocks = max(0, readahead_blocks)
+    # The cache must be able to hold at least a full read-ahead window,
+    # otherwise prefetched blocks are expired before they are used.
+    self.block_cache = utils.FastStore(
+        max_size=max(cache_size, self.readahead_blocks + 1))
+
+    # Counted once per read, no matter how many blocks it spans: a read is a
+    # hit if all of its blocks were cached.
+    self.cache_hits = 0
+    self.cache_misses = 0
+
+    # The block following the last block we read from the device. Used to
+    # detect sequential access patterns.
+    self._next_sequential_block = None
+    # Pytsk may call us from multiple threads through the shared filesystem.
+    self.lock = threading.RLock()
+
   def read(self, offset, length):  # pylint: disable=g-bad-name
     # Sleuthkit operations might take a long time so we periodically call the
     # progress indicator callback as long as there are still data reads.
     if self.progress_callback:
       self.progress_callback()
-    self.fd.seek(offset)
-    return self.fd.read(length)
+
+    if length <= 0:
+      return b""
+
+    first_block = offset // self.block_size
+    last_block = (offset + length - 1) // self.block_size
+
+    with self.lock:
+      blocks = []
+      fetched = False
+      for block_idx in range(first_block, last_block + 1):
+        try:
+          block = self.block_cache.Get(block_idx)
+        except KeyError:
+          fetched = True
+          block = self._FetchBlocks(block_idx, last_block)
+
+        blocks.append(block)
+
+        # A short block means we have reached the end of the device.
+        if len(block) < self.block_size:
+          break
+
+      if fetched:
+        self.cache_misses += 1
+        stats_collector_instance.Get().IncrementCounter(
+            "grr_client_tsk_block_cache_misses")
+      else:
+        self.cache_hits += 1
+        stats_collector_instance.Get().IncrementCounter(
+            "grr_client_tsk_block_cache_hits")
+
+    data = b"".join(blocks)
+    start = offset - first_block * self.block_size
+    return data[start:start + length]
+
+  def _FetchBlocks(self, first_block, last_block):
+    """Reads blocks from the device into the cache.
+
+    Args:
+      first_block: The index of the first (uncached) block to read.
+      last_block: The index of the last block required by the current read.
+
+    Returns:
+      The data of the first block.
+    """
+    count = last_block - first_block + 1
+    if first_block == self._next_sequential_block:
+      count += self.readahead_blocks
+
+    self.fd.seek(first_block * self.block_size)
+    data = self.fd.read(count * self.block_size)
+
+    blocks_read = 0
+    for i in range(0, max(len(data), 1), self.block_size):
+      self.block_cache.Put(first_block + blocks_read,
+                           data[i:i + self.block_size])
+      blocks_read += 1
+
+    self._next_sequential_block = first_block + blocks_read
+    return data[:self.block_size]
 
   def get_size(self):  # pylint: disable=g-bad-name
     # Windows is unable to report the true size of the raw device and allows
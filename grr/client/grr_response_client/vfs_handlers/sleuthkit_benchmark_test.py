@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Benchmarks for the Sleuthkit VFS handler."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import time
+
+from absl import app
+import pytest
+
+from grr_response_client import vfs
+from grr_response_client.vfs_handlers import sleuthkit
+from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import test_lib
+
+
+@pytest.mark.benchmark
+class TSKBenchmark(benchmark_test_lib.MicroBenchmarks):
+  """Benchmarks listing a directory tree from a raw image with TSK."""
+
+  units = "ms"
+
+  REPEATS = 20
+
+  def setUp(self):
+    super(TSKBenchmark, self).setUp(["Cache misses", "Cache hits"],
+                                    ["<20", "<20"])
+
+  def _ListRecursively(self, fd):
+    count = 0
+    for stat_entry in fd.ListFiles():
+      count += 1
+      if stat_entry.pathspec.last.stream_name:
+        continue
+
+      child = vfs.VFSOpen(stat_entry.pathspec)
+      if child.IsDirectory():
+        count += self._ListRecursively(child)
+
+    return count
+
+  def _RunListing(self, name, **overrides):
+    config_overrides = {
+        "Client.tsk_%s" % key: value for key, value in overrides.items()
+    }
+    with test_lib.ConfigOverrider(config_overrides):
+      misses = 0
+      hits = 0
+      start = time.time()
+      for _ in range(self.REPEATS):
+        # Start every iteration with a cold filesystem cache.
+        sleuthkit.DEVICE_CACHE.Flush()
+
+        pathspec = rdf_paths.PathSpec(
+            path=os.path.join(self.base_path, "ntfs_img.dd"),
+            pathtype=rdf_paths.PathSpec.PathType.OS)
+        pathspec.Append(path="/", pathtype=rdf_paths.PathSpec.PathType.TSK)
+        fd = vfs.VFSOpen(pathspec)
+        self.assertGreater(self._ListRecursively(fd), 0)
+
+        img = fd.filesystem.img
+        misses += img.cache_misses
+        hits += img.cache_hits
+
+      self.AddResult(name, (time.time() - start) / self.REPEATS, self.REPEATS,
+                     misses // self.REPEATS, hits // self.REPEATS)
+
+  def testListDirectoryTree(self):
+    """Lists all directories of an NTFS image with different cache setups."""
+    self._RunListing(
+        "Sector sized blocks", block_size=512, block_cache_size=1,
+        readahead_blocks=0)
+    self._RunListing(
+        "4k blocks, no read-ahead", block_size=4096, block_cache_size=256,
+        readahead_blocks=0)
+    self._RunListing(
+        "64k blocks, read-ahead", block_size=64 * 1024, block_cache_size=256,
+        readahead_blocks=4)
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -6,6 +6,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import collections
+import io
 import platform
 import unittest
 from absl import app
@@ -13,6 +14,7 @@ from absl.testing import absltest
 
 from grr_response_client import vfs
 from grr_response_client.client_actions.file_finder_utils import globbing
+from grr_response_client.vfs_handlers import sleuthkit
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
 from grr.test_lib import test_lib
 
@@ -41,6 +43,77 @@ class TSKWindowsGlobbingTest(absltest.TestCase):
     self.assertEmpty(duplicates)
 
 
+class CountingBytesIO(io.BytesIO):
+
+  def __init__(self, *args, **kwargs):
+    super(CountingBytesIO, self).__init__(*args, **kwargs)
+    self.read_count = 0
+
+  def read(self, *args, **kwargs):
+    self.read_count += 1
+    return super(CountingBytesIO, self).read(*args, **kwargs)
+
+
+class MyImgInfoTest(absltest.TestCase):
+
+  DATA = bytes(bytearray(i % 251 for i in range(10000)))
+
+  def _MakeImgInfo(self, **kwargs):
+    fd = CountingBytesIO(self.DATA)
+    return fd, sleuthkit.MyImgInfo(fd=fd, **kwargs)
+
+  def testReadReturnsCorrectData(self):
+    _, img = self._MakeImgInfo(
+        block_size=512, cache_size=4, readahead_blocks=2)
+    for offset, length in [(0, 10), (500, 100), (1000, 3000), (9990, 100),
+                           (20000, 10), (0, 0)]:
+      self.assertEqual(
+          img.read(offset, length), self.DATA[offset:offset + length])
+
+  def testRepeatedReadsAreCached(self):
+    fd, img = self._MakeImgInfo(
+        block_size=512, cache_size=16, readahead_blocks=0)
+    for _ in range(10):
+      img.read(100, 50)
+
+    self.assertEqual(fd.read_count, 1)
+    self.assertEqual(img.cache_misses, 1)
+    self.assertEqual(img.cache_hits, 9)
+
+  def testSequentialReadsReadAhead(self):
+    fd, img = self._MakeImgInfo(
+        block_size=512, cache_size=16, readahead_blocks=4)
+    img.read(0, 512)
+    img.read(512, 512)
+    for i in range(2, 6):
+      self.assertEqual(
+          img.read(i * 512, 512), self.DATA[i * 512:(i + 1) * 512])
+
+    self.assertEqual(fd.read_count, 2)
+
+  def testRandomReadsDoNotReadAhead(self):
+    fd, img = self._MakeImgInfo(
+        block_size=512, cache_size=16, readahead_blocks=4)
+    img.read(4096, 10)
+    img.read(0, 10)
+    img.read(2048, 10)
+    img.read(2560, 10)
+
+    self.assertEqual(fd.read_count, 4)
+    self.assertEqual(img.cache_misses, 4)
+
+  def testMultiBlockReadCountsOneCacheLookup(self):
+    _, img = self._MakeImgInfo(
+        block_size=512, cache_size=16, readahead_blocks=0)
+    img.read(0, 4 * 512)
+    img.read(0, 4 * 512)
+    # Only the first block of this read is cached.
+    img.read(3 * 512, 2 * 512)
+
+    self.assertEqual(img.cache_misses, 2)
+    self.assertEqual(img.cache_hits, 1)
+
+
 def main(argv):
   test_lib.main(argv)
 
@@ -30,3 +30,14 @@ config_lib.DEFINE_string("API.DefaultRouter", "DisabledApiCallRouter",
                          "The default router used by the API if there are no "
                          "rules defined in API.RouterACLConfigFile or if none "
                          "of these rules matches.")
+
+config_lib.DEFINE_integer(
+    "API.ListStreamingThreshold", 1000,
+    "List results with more items than this are streamed to the client item "
+    "by item instead of being rendered as a whole. Streamed responses use "
+    "less memory, but can't be answered with 304 Not Modified.")
+
+config_lib.DEFINE_integer(
+    "API.ResponseCompressionThreshold", 1024,
+    "API responses of at least this many bytes are gzip-compressed if the "
+    "client accepts it.")
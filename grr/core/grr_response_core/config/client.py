@@ -135,6 +135,24 @@ config_lib.DEFINE_list(
           " relative to the given root. Format is os:/mount/disk."),
     default=[])
 
+config_lib.DEFINE_integer(
+    "Client.tsk_block_size", 64 * 1024,
+    "Size in bytes of the blocks cached when Sleuthkit reads a raw device.")
+
+config_lib.DEFINE_integer(
+    "Client.tsk_block_cache_size", 256,
+    "Maximum number of raw device blocks kept in the Sleuthkit block cache.")
+
+config_lib.DEFINE_integer(
+    "Client.tsk_readahead_blocks", 4,
+    "Number of additional blocks to read ahead when Sleuthkit reads a raw "
+    "device sequentially. Set to 0 to disable read-ahead.")
+
+config_lib.DEFINE_integer(
+    "Client.list_directory_batch_size", 1000,
+    "Maximum number of stat entries sent in a single response message by "
+    "the ListDirectoryBatched client action.")
+
 # Windows client specific options.
 config_lib.DEFINE_string(
     "Client.config_hive",
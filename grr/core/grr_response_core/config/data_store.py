@@ -108,6 +108,70 @@ config_lib.DEFINE_integer(
     help="The maximum number of open connections to keep available in the pool."
 )
 
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_min_idle",
+    default=2,
+    help="The number of connections opened when the pool is created. This "
+    "many idle connections are never closed for being idle.")
+
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_max_idle_time",
+    default=600,
+    help="Number of seconds after which an idle pooled connection is closed.")
+
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_ping_after",
+    default=60,
+    help="Number of seconds a pooled connection has to be idle to be pinged "
+    "before it is reused. Connections failing the ping are discarded.")
+
+config_lib.DEFINE_bool(
+    "Mysql.flow_results_text_search",
+    default=True,
+    help="Whether substring searches over flow and hunt results use the "
+    "FULLTEXT index over the text extracted from the results. Results written "
+    "before the index was introduced are still found by scanning their "
+    "serialized payloads. When disabled, searches scan the serialized "
+    "payloads of all the results.")
+
+config_lib.DEFINE_list(
+    "Mysql.replica_hosts", [],
+    "Read replicas of the MySQL database given as 'host' or 'host:port'. "
+    "Read-only transactions that tolerate stale data (e.g. UI listings and "
+    "statistics) are sent to the replicas when possible. The replicas are "
+    "accessed with the same credentials as the primary.")
+
+config_lib.DEFINE_integer(
+    "Mysql.replica_conn_pool_max",
+    default=10,
+    help="The maximum number of open connections to keep available in the "
+    "pool of each read replica.")
+
+config_lib.DEFINE_integer(
+    "Mysql.replica_max_lag",
+    default=30,
+    help="Maximum replication lag (in seconds) of a read replica. Read-only "
+    "transactions are sent to the primary if all the replicas lag more.")
+
+config_lib.DEFINE_integer(
+    "Mysql.replica_health_check_interval",
+    default=10,
+    help="Interval (in seconds) between replication lag checks of each read "
+    "replica.")
+
+config_lib.DEFINE_integer(
+    "Mysql.partition_interval_days",
+    default=1,
+    help="Length (in days) of the time bucket stored in a single partition of "
+    "time-partitioned tables. Changing it only affects partitions created "
+    "afterwards.")
+
+config_lib.DEFINE_integer(
+    "Mysql.partitions_ahead_days",
+    default=7,
+    help="How many days ahead of the current time the partition maintenance "
+    "cron job creates partitions of time-partitioned tables.")
+
 config_lib.DEFINE_string(
     "Mysql.migrations_dir", "%(grr_response_server/databases/mysql_migrations@"
     "grr-response-server|resource)", "Folder with MySQL migrations files.")
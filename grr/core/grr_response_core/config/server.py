@@ -41,6 +41,11 @@ config_lib.DEFINE_integer(
     "Worker.queue_shards", 5, "Queue notifications will be sharded across "
     "this number of datastore subjects.")
 
+config_lib.DEFINE_integer(
+    "Worker.flow_cache_size", 100,
+    "Maximum number of flow objects a worker keeps in memory between "
+    "processing steps of the flows. Set to 0 to disable the cache.")
+
 config_lib.DEFINE_list(
     "Frontend.well_known_flows", ["TransferStore"],
     "Allow these well known flows to run directly on the "
@@ -243,6 +248,20 @@ config_lib.DEFINE_string(
     help="Inactive clients marked with "
     "this label will be retained forever.")
 
+config_lib.DEFINE_integer(
+    "DataRetention.inactive_client_deletion_batch_size",
+    default=100,
+    help="Number of inactive clients deleted from the relational database at "
+    "a time.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration,
+    "DataRetention.inactive_client_deletion_pause",
+    default="1s",
+    help="Pause between deleting two batches of inactive clients from the "
+    "relational database, so that the deletion doesn't starve other "
+    "database users.")
+
 config_lib.DEFINE_integer(
     "Hunt.default_crash_limit",
     default=100,
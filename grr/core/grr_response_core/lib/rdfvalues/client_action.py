@@ -94,6 +94,25 @@ class GetFileStatRequest(rdf_structs.RDFProtoStruct):
   ]
 
 
+class GlobComponentNode(rdf_structs.RDFProtoStruct):
+  """A node of the glob component tree."""
+
+  protobuf = jobs_pb2.GlobComponentNode
+  rdf_deps = [
+      "GlobComponentNode",  # Recursive definition.
+      rdf_paths.PathSpec,
+  ]
+
+
+class ExpandGlobsRequest(rdf_structs.RDFProtoStruct):
+
+  protobuf = jobs_pb2.ExpandGlobsRequest
+  rdf_deps = [
+      GlobComponentNode,
+      rdf_paths.PathSpec,
+  ]
+
+
 class FingerprintTuple(rdf_structs.RDFProtoStruct):
   protobuf = jobs_pb2.FingerprintTuple
 
@@ -196,6 +196,14 @@ class StatEntry(rdf_structs.RDFProtoStruct):
     return self.pathspec.AFF4Path(client_urn)
 
 
+class StatEntryBatch(rdf_structs.RDFProtoStruct):
+  """A batch of stat entries sent in a single response."""
+  protobuf = jobs_pb2.StatEntryBatch
+  rdf_deps = [
+      StatEntry,
+  ]
+
+
 class FindSpec(rdf_structs.RDFProtoStruct):
   """A find specification."""
   protobuf = jobs_pb2.FindSpec
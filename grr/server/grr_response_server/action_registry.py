@@ -25,6 +25,7 @@ ACTION_STUB_BY_ID = {
     "ExecuteBinaryCommand": server_stubs.ExecuteBinaryCommand,
     "ExecuteCommand": server_stubs.ExecuteCommand,
     "ExecutePython": server_stubs.ExecutePython,
+    "ExpandGlobs": server_stubs.ExpandGlobs,
     "FileFinderOS": server_stubs.FileFinderOS,
     "Find": server_stubs.Find,
     "FingerprintFile": server_stubs.FingerprintFile,
@@ -44,6 +45,7 @@ ACTION_STUB_BY_ID = {
     "HashFile": server_stubs.HashFile,
     "Kill": server_stubs.Kill,
     "ListDirectory": server_stubs.ListDirectory,
+    "ListDirectoryBatched": server_stubs.ListDirectoryBatched,
     "ListNetworkConnections": server_stubs.ListNetworkConnections,
     "ListProcesses": server_stubs.ListProcesses,
     "OSXEnumerateRunningServices": server_stubs.OSXEnumerateRunningServices,
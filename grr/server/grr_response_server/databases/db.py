@@ -26,6 +26,7 @@ from typing import Generator, List, Optional, Set, Text, Tuple, Iterable, Dict
 
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import time_utils
+from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import artifacts as rdf_artifacts
 from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
@@ -68,6 +69,10 @@ MAX_COUNT = 1024**3
 
 CLIENT_IDS_BATCH_SIZE = 500000
 
+RESULTS_BATCH_SIZE = 5000
+
+PATH_INFOS_BATCH_SIZE = 5000
+
 
 class Error(Exception):
   """Base exception class for DB exceptions."""
@@ -252,6 +257,17 @@ class UnknownFlowError(NotFoundError):
                     (self.client_id, self.flow_id))
 
 
+class DuplicatedFlowError(Error):
+
+  def __init__(self, client_id, flow_id, cause=None):
+    message = "Flow with client id '{}' and flow id '{}' already exists".format(
+        client_id, flow_id)
+    super(DuplicatedFlowError, self).__init__(message, cause=cause)
+
+    self.client_id = client_id
+    self.flow_id = flow_id
+
+
 class UnknownHuntError(NotFoundError):
 
   def __init__(self, hunt_id, cause=None):
@@ -408,6 +424,12 @@ FlowStateAndTimestamps = collections.namedtuple("FlowStateAndTimestamps", [
     "last_update_time",
 ])
 
+HuntFlowsCompletionHistogram = collections.namedtuple(
+    "HuntFlowsCompletionHistogram", [
+        "started",
+        "completed",
+    ])
+
 
 class ClientPath(object):
   """An immutable class representing certain path on a given client.
@@ -521,6 +543,52 @@ class ClientPathHistory(object):
     self.hash_entries[timestamp] = hash_entry
 
 
+class FlowCache(object):
+  """A cache of flow objects processed by a worker.
+
+  Flows are cached together with their version in the database. When a cached
+  flow is leased again, the database reuses the cached object instead of
+  reading and parsing the stored one, but only if the stored version did not
+  change in the meantime, i.e. if nobody else modified the flow. Every write of
+  a flow bumps its version, so writes made outside of a lease (possibly by
+  other processes) don't need to touch the cache. Versions must never be
+  reused, not even when a flow is deleted and created again with the same id.
+
+  Database implementations can also keep some data about the stored flow with
+  the cached object (e.g. to write only the parts of the flow that changed).
+  """
+
+  def __init__(self, max_size=100):
+    self._store = utils.FastStore(max_size=max_size)
+
+  def Put(self, flow_obj, version, stored_data=None):
+    """Caches a flow object.
+
+    Args:
+      flow_obj: An rdf_flow_objects.Flow object to cache.
+      version: The version of the flow in the database or None if the cached
+        object may differ from the stored flow (e.g. it is being processed).
+        Flows cached without a version are never reused on lease.
+      stored_data: Database implementation specific data about the stored
+        flow.
+    """
+    key = (flow_obj.client_id, flow_obj.flow_id)
+    self._store.Put(key, (flow_obj, version, stored_data))
+
+  def Pop(self, client_id, flow_id):
+    """Removes a flow from the cache and returns it.
+
+    Args:
+      client_id: The client id on which the flow is running.
+      flow_id: The id of the flow.
+
+    Returns:
+      A tuple of the cached flow object, its version and the data about the
+      stored flow (see Put) or None if the flow is not cached.
+    """
+    return self._store.Pop((client_id, flow_id))
+
+
 class Database(with_metaclass(abc.ABCMeta, object)):
   """The GRR relational database abstraction."""
 
@@ -603,15 +671,24 @@ class Database(with_metaclass(abc.ABCMeta, object)):
   def DeleteClient(self, client_id):
     """Deletes a client with all associated metadata.
 
-    This method is a stub. Deletion is not yet supported.
-
     Args:
       client_id: A GRR client id string, e.g. "C.ea3b2b71840d6fa7".
     """
-    # TODO: Cascaded deletion of data is only implemented in MySQL
-    # yet. When the functionality for deleting clients is required, make sure to
-    # delete all associated metadata (history, stats, flows, messages, ...).
-    raise NotImplementedError("Deletetion of Clients is not yet implemented.")
+    self.DeleteClients([client_id])
+
+  @abc.abstractmethod
+  def DeleteClients(self, client_ids):
+    """Deletes clients with all associated metadata.
+
+    All the data of the clients is deleted: metadata, snapshot, startup and
+    crash history, labels, keywords, stats, paths and flows (with their
+    requests, responses, results and log entries). Unknown client ids are
+    ignored.
+
+    Args:
+      client_ids: A collection of GRR client id strings, e.g.
+        ["C.ea3b2b71840d6fa7", "C.ea3b2b71840d6fa8"]
+    """
 
   @abc.abstractmethod
   def MultiReadClientMetadata(self, client_ids):
@@ -1023,6 +1100,22 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       The number of ClientStats that were deleted since the last yield.
     """
 
+  @abc.abstractmethod
+  def CreateTablePartitions(self, until):
+    """Creates partitions of time-partitioned tables up to a given time.
+
+    Time-partitioned tables store data in partitions covering fixed time
+    buckets, so that old data can be dropped a whole partition at a time.
+    Databases that do not partition data by time do nothing.
+
+    Args:
+      until: An RDFDatetime. Partitions are created so that data written up to
+        this time is stored in a time bucket.
+
+    Returns:
+      The number of created partitions.
+    """
+
   @abc.abstractmethod
   def CountClientVersionStringsByLabel(self, day_buckets
                                       ):
@@ -1341,6 +1434,29 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       A list of `rdf_objects.PathInfo` instances sorted by path components.
     """
 
+  @abc.abstractmethod
+  def IterateDescendentPathInfos(self,
+                                 client_id,
+                                 path_type,
+                                 components,
+                                 batch_size=PATH_INFOS_BATCH_SIZE):
+    """Yields path info records that correspond to descendants of given path.
+
+    Unlike ListDescendentPathInfos, path infos are read in batches of
+    batch_size, so only a single batch is held in memory at a time.
+
+    Args:
+      client_id: An identifier string for a client.
+      path_type: A type of a path to retrieve path information for.
+      components: A tuple of path components of a path to retrieve descendent
+        path information for.
+      batch_size: Integer, specifying the number of path infos to be read at a
+        time.
+
+    Yields:
+      `rdf_objects.PathInfo` instances in no particular order.
+    """
+
   @abc.abstractmethod
   def WritePathInfos(self, client_id, path_infos):
     """Writes a collection of path_info records for a client.
@@ -1815,6 +1931,21 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       UnknownClientError: The client with the flow's client_id does not exist.
     """
 
+  @abc.abstractmethod
+  def WriteFlowObjects(self, flow_objs, allow_update=True):
+    """Writes multiple flow objects to the database.
+
+    Args:
+      flow_objs: An iterable of rdf_flow_objects.Flow objects to write.
+      allow_update: If False, no flow is written when any of them is already in
+        the database.
+
+    Raises:
+      AtLeastOneUnknownClientError: At least one of the flows' clients does not
+        exist.
+      DuplicatedFlowError: `allow_update` is False and a flow already exists.
+    """
+
   @abc.abstractmethod
   def ReadFlowObject(self, client_id, flow_id):
     """Reads a flow object from the database.
@@ -1861,7 +1992,11 @@ class Database(with_metaclass(abc.ABCMeta, object)):
     """
 
   @abc.abstractmethod
-  def LeaseFlowForProcessing(self, client_id, flow_id, processing_time):
+  def LeaseFlowForProcessing(self,
+                             client_id,
+                             flow_id,
+                             processing_time,
+                             flow_cache=None):
     """Marks a flow as being processed on this worker and returns it.
 
     Args:
@@ -1869,6 +2004,10 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       flow_id: The id of the flow to read.
       processing_time: Duration that the worker has to finish processing before
         the flow is considered stuck.
+      flow_cache: An optional FlowCache of the worker. If it holds an
+        up-to-date copy of the flow, that object is returned instead of the
+        stored one. The returned flow is kept in the cache until it is
+        released.
 
     Raises:
       ValueError: The flow is already marked as being processed.
@@ -1880,7 +2019,7 @@ class Database(with_metaclass(abc.ABCMeta, object)):
     """
 
   @abc.abstractmethod
-  def ReleaseProcessedFlow(self, flow_obj):
+  def ReleaseProcessedFlow(self, flow_obj, flow_cache=None):
     """Releases a flow that the worker was processing to the database.
 
     This method will check if there are currently more requests ready for
@@ -1889,6 +2028,10 @@ class Database(with_metaclass(abc.ABCMeta, object)):
 
     Args:
       flow_obj: The rdf_flow_objects.Flow object to return.
+      flow_cache: An optional FlowCache the flow was leased with. If the flow
+        is released, `flow_obj` is cached with its new version (and with the
+        processing lease fields cleared), so that it does not have to be read
+        from the database the next time it is leased.
 
     Returns:
       A boolean indicating if it was possible to return the flow to the
@@ -1896,6 +2039,40 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       this method will return false and the flow will not be written.
     """
 
+  @abc.abstractmethod
+  def FlushFlowUpdates(self,
+                       flow_requests=None,
+                       flow_responses=None,
+                       client_action_requests=None,
+                       completed_requests=None,
+                       flow_results=None,
+                       flow_to_release=None,
+                       flow_cache=None):
+    """Writes all updates produced by a step of flow processing at once.
+
+    This is equivalent to calling WriteFlowRequests, WriteFlowResponses,
+    WriteClientActionRequests, DeleteFlowRequests, WriteFlowResults and
+    ReleaseProcessedFlow in this order (skipping the ones with no arguments),
+    but all the updates are applied atomically.
+
+    Args:
+      flow_requests: A list of rdf_flow_objects.FlowRequest objects to write.
+      flow_responses: A list of rdf_flow_objects.FlowMessage objects to write.
+      client_action_requests: A list of rdf_flows.ClientActionRequest objects
+        to write.
+      completed_requests: A list of rdf_flow_objects.FlowRequest objects to
+        delete together with their responses.
+      flow_results: A list of rdf_flow_objects.FlowResult objects to write.
+      flow_to_release: An rdf_flow_objects.Flow object to release (see
+        ReleaseProcessedFlow).
+      flow_cache: An optional FlowCache to pass to ReleaseProcessedFlow.
+
+    Returns:
+      The result of ReleaseProcessedFlow if `flow_to_release` is given, True
+      otherwise. Note that the other updates are written even if the flow
+      could not be released.
+    """
+
   @abc.abstractmethod
   def UpdateFlow(self,
                  client_id,
@@ -2095,6 +2272,37 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       A list of FlowResult values sorted by timestamp in ascending order.
     """
 
+  @abc.abstractmethod
+  def IterateFlowResults(self,
+                         client_id,
+                         flow_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=RESULTS_BATCH_SIZE):
+    """Yields all flow results of a given flow matching given query options.
+
+    Unlike ReadFlowResults, results are read in batches of batch_size using
+    the position of the last read result instead of an offset, so the cost of
+    reading a batch doesn't grow with the number of results already read.
+
+    Args:
+      client_id: The client id on which this flow is running.
+      flow_id: The id of the flow to read results for.
+      with_tag: (Optional) When specified, should be a string. Only results
+        having specified tag will be returned.
+      with_type: (Optional) When specified, should be a string. Only results of
+        a specified type will be returned.
+      with_substring: (Optional) When specified, should be a string. Only
+        results having the specified string as a substring in their serialized
+        form will be returned.
+      batch_size: Integer, specifying the number of results to be read at a
+        time.
+
+    Yields:
+      FlowResult values sorted by timestamp in ascending order.
+    """
+
   @abc.abstractmethod
   def CountFlowResults(self, client_id, flow_id, with_tag=None, with_type=None):
     """Counts flow results of a given flow using given query options.
@@ -2509,6 +2717,35 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       A list of FlowResult values sorted by timestamp in ascending order.
     """
 
+  @abc.abstractmethod
+  def IterateHuntResults(self,
+                         hunt_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=RESULTS_BATCH_SIZE):
+    """Yields all hunt results of a given hunt matching given query options.
+
+    Unlike ReadHuntResults, results are read in batches of batch_size using
+    the position of the last read result instead of an offset, so the cost of
+    reading a batch doesn't grow with the number of results already read.
+
+    Args:
+      hunt_id: The id of the hunt to read results for.
+      with_tag: (Optional) When specified, should be a string. Only results
+        having specified tag will be returned.
+      with_type: (Optional) When specified, should be a string. Only results of
+        a specified type will be returned.
+      with_substring: (Optional) When specified, should be a string. Only
+        results having the specified string as a substring in their serialized
+        form will be returned.
+      batch_size: Integer, specifying the number of results to be read at a
+        time.
+
+    Yields:
+      FlowResult values sorted by timestamp in ascending order.
+    """
+
   @abc.abstractmethod
   def CountHuntResults(self, hunt_id, with_tag=None, with_type=None):
     """Counts hunt results of a given hunt using given query options.
@@ -2614,6 +2851,22 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       sorting order).
     """
 
+  @abc.abstractmethod
+  def ReadHuntFlowsCompletionHistogram(self, hunt_id):
+    """Counts hunt flows started and completed within every second.
+
+    Flows that are not running are considered completed at the time of their
+    last update.
+
+    Args:
+      hunt_id: The id of the hunt to count flows for.
+
+    Returns:
+      A HuntFlowsCompletionHistogram. Its `started` and `completed` fields are
+      dictionaries mapping times (in seconds since epoch) to numbers of hunt
+      flows started or completed within that second.
+    """
+
   @abc.abstractmethod
   def WriteSignedBinaryReferences(self, binary_id, references):
     """Writes blob references for a signed binary to the DB.
@@ -2776,6 +3029,10 @@ class DatabaseValidationWrapper(Database):
     return self.delegate.MultiReadClientFullInfo(
         client_ids, min_last_ping=min_last_ping)
 
+  def DeleteClients(self, client_ids):
+    _ValidateClientIds(client_ids)
+    return self.delegate.DeleteClients(client_ids)
+
   def ReadClientLastPings(self,
                           min_last_ping=None,
                           max_last_ping=None,
@@ -2964,6 +3221,10 @@ class DatabaseValidationWrapper(Database):
         yield_after_count, retention_time):
       yield deleted_count
 
+  def CreateTablePartitions(self, until):
+    _ValidateTimestamp(until)
+    return self.delegate.CreateTablePartitions(until)
+
   def WriteForemanRule(self, rule):
     precondition.AssertType(rule, foreman_rules.ForemanCondition)
 
@@ -3130,6 +3391,19 @@ class DatabaseValidationWrapper(Database):
         timestamp=timestamp,
         max_depth=max_depth)
 
+  def IterateDescendentPathInfos(self,
+                                 client_id,
+                                 path_type,
+                                 components,
+                                 batch_size=PATH_INFOS_BATCH_SIZE):
+    _ValidateClientId(client_id)
+    _ValidateEnumType(path_type, rdf_objects.PathInfo.PathType)
+    _ValidatePathComponents(components)
+    _ValidateBatchSize(batch_size)
+
+    return self.delegate.IterateDescendentPathInfos(
+        client_id, path_type, components, batch_size=batch_size)
+
   def FindPathInfoByPathID(self, client_id, path_type, path_id, timestamp=None):
     _ValidateClientId(client_id)
 
@@ -3405,6 +3679,14 @@ class DatabaseValidationWrapper(Database):
     precondition.AssertType(flow_obj.create_time, rdfvalue.RDFDatetime)
     return self.delegate.WriteFlowObject(flow_obj)
 
+  def WriteFlowObjects(self, flow_objs, allow_update=True):
+    flow_objs = list(flow_objs)
+    for flow_obj in flow_objs:
+      precondition.AssertType(flow_obj, rdf_flow_objects.Flow)
+      precondition.AssertType(flow_obj.create_time, rdfvalue.RDFDatetime)
+    precondition.AssertType(allow_update, bool)
+    return self.delegate.WriteFlowObjects(flow_objs, allow_update=allow_update)
+
   def ReadFlowObject(self, client_id, flow_id):
     _ValidateClientId(client_id)
     _ValidateFlowId(flow_id)
@@ -3432,16 +3714,61 @@ class DatabaseValidationWrapper(Database):
     _ValidateFlowId(flow_id)
     return self.delegate.ReadChildFlowObjects(client_id, flow_id)
 
-  def LeaseFlowForProcessing(self, client_id, flow_id, processing_time):
+  def LeaseFlowForProcessing(self,
+                             client_id,
+                             flow_id,
+                             processing_time,
+                             flow_cache=None):
     _ValidateClientId(client_id)
     _ValidateFlowId(flow_id)
     _ValidateDuration(processing_time)
-    return self.delegate.LeaseFlowForProcessing(client_id, flow_id,
-                                                processing_time)
+    precondition.AssertOptionalType(flow_cache, FlowCache)
+    return self.delegate.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
 
-  def ReleaseProcessedFlow(self, flow_obj):
+  def ReleaseProcessedFlow(self, flow_obj, flow_cache=None):
     precondition.AssertType(flow_obj, rdf_flow_objects.Flow)
-    return self.delegate.ReleaseProcessedFlow(flow_obj)
+    precondition.AssertOptionalType(flow_cache, FlowCache)
+    return self.delegate.ReleaseProcessedFlow(flow_obj, flow_cache=flow_cache)
+
+  def FlushFlowUpdates(self,
+                       flow_requests=None,
+                       flow_responses=None,
+                       client_action_requests=None,
+                       completed_requests=None,
+                       flow_results=None,
+                       flow_to_release=None,
+                       flow_cache=None):
+    if flow_requests is not None:
+      precondition.AssertIterableType(flow_requests,
+                                      rdf_flow_objects.FlowRequest)
+    if flow_responses is not None:
+      precondition.AssertIterableType(flow_responses,
+                                      rdf_flow_objects.FlowMessage)
+    if client_action_requests is not None:
+      for request in client_action_requests:
+        precondition.AssertType(request, rdf_flows.ClientActionRequest)
+    if completed_requests is not None:
+      precondition.AssertIterableType(completed_requests,
+                                      rdf_flow_objects.FlowRequest)
+    if flow_results is not None:
+      for r in flow_results:
+        precondition.AssertType(r, rdf_flow_objects.FlowResult)
+        _ValidateClientId(r.client_id)
+        _ValidateFlowId(r.flow_id)
+        if r.HasField("hunt_id") and r.hunt_id:
+          _ValidateHuntId(r.hunt_id)
+    precondition.AssertOptionalType(flow_to_release, rdf_flow_objects.Flow)
+    precondition.AssertOptionalType(flow_cache, FlowCache)
+
+    return self.delegate.FlushFlowUpdates(
+        flow_requests=flow_requests,
+        flow_responses=flow_responses,
+        client_action_requests=client_action_requests,
+        completed_requests=completed_requests,
+        flow_results=flow_results,
+        flow_to_release=flow_to_release,
+        flow_cache=flow_cache)
 
   def UpdateFlow(self,
                  client_id,
@@ -3589,6 +3916,28 @@ class DatabaseValidationWrapper(Database):
         with_type=with_type,
         with_substring=with_substring)
 
+  def IterateFlowResults(self,
+                         client_id,
+                         flow_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=RESULTS_BATCH_SIZE):
+    _ValidateClientId(client_id)
+    _ValidateFlowId(flow_id)
+    precondition.AssertOptionalType(with_tag, Text)
+    precondition.AssertOptionalType(with_type, Text)
+    precondition.AssertOptionalType(with_substring, Text)
+    _ValidateBatchSize(batch_size)
+
+    return self.delegate.IterateFlowResults(
+        client_id,
+        flow_id,
+        with_tag=with_tag,
+        with_type=with_type,
+        with_substring=with_substring,
+        batch_size=batch_size)
+
   def CountFlowResults(
       self,
       client_id,
@@ -3853,6 +4202,25 @@ class DatabaseValidationWrapper(Database):
         with_substring=with_substring,
         with_timestamp=with_timestamp)
 
+  def IterateHuntResults(self,
+                         hunt_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=RESULTS_BATCH_SIZE):
+    _ValidateHuntId(hunt_id)
+    precondition.AssertOptionalType(with_tag, Text)
+    precondition.AssertOptionalType(with_type, Text)
+    precondition.AssertOptionalType(with_substring, Text)
+    _ValidateBatchSize(batch_size)
+
+    return self.delegate.IterateHuntResults(
+        hunt_id,
+        with_tag=with_tag,
+        with_type=with_type,
+        with_substring=with_substring,
+        batch_size=batch_size)
+
   def CountHuntResults(self, hunt_id, with_tag=None, with_type=None):
     _ValidateHuntId(hunt_id)
     precondition.AssertOptionalType(with_tag, Text)
@@ -3892,6 +4260,10 @@ class DatabaseValidationWrapper(Database):
     _ValidateHuntId(hunt_id)
     return self.delegate.ReadHuntFlowsStatesAndTimestamps(hunt_id)
 
+  def ReadHuntFlowsCompletionHistogram(self, hunt_id):
+    _ValidateHuntId(hunt_id)
+    return self.delegate.ReadHuntFlowsCompletionHistogram(hunt_id)
+
   def WriteSignedBinaryReferences(self, binary_id, references):
     precondition.AssertType(binary_id, rdf_objects.SignedBinaryID)
     precondition.AssertType(references, rdf_objects.BlobReferences)
@@ -4131,6 +4503,13 @@ def _ValidateHuntFlowCondition(value):
     raise ValueError("Invalid hunt flow condition: %r" % value)
 
 
+def _ValidateBatchSize(batch_size):
+  precondition.AssertType(batch_size, int)
+  if batch_size < 1:
+    raise ValueError(
+        "batch_size needs to be a positive integer, got {}".format(batch_size))
+
+
 def _ValidateMessageHandlerName(name):
   _ValidateStringLength("MessageHandler names", name,
                         MAX_MESSAGE_HANDLER_NAME_LENGTH)
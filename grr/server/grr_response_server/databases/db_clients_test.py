@@ -19,6 +19,7 @@ from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
 from grr_response_core.lib.util import collection
 from grr_response_server.databases import db
 from grr_response_server.databases import db_test_utils
+from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
 from grr.test_lib import test_lib
 
@@ -1233,6 +1234,65 @@ class DatabaseTestClientsMixin(object):
     snapshots = self.db.IterateAllClientSnapshots(batch_size=2)
     self._VerifySnapshots(snapshots)
 
+  def _WriteClientWithData(self, client_id):
+    self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+    self.db.WriteClientSnapshot(rdf_objects.ClientSnapshot(client_id=client_id))
+    self.db.AddClientLabels(client_id, "owner", ["label"])
+    self.db.AddClientKeywords(client_id, ["keyword"])
+    self.db.WriteClientStats(client_id, rdf_client_stats.ClientStats())
+
+    flow_obj = rdf_flow_objects.Flow(
+        client_id=client_id,
+        flow_id="1234ABCD",
+        create_time=rdfvalue.RDFDatetime.Now())
+    self.db.WriteFlowObject(flow_obj)
+    self.db.WriteFlowResults([
+        rdf_flow_objects.FlowResult(
+            client_id=client_id,
+            flow_id="1234ABCD",
+            payload=rdf_client.ClientSummary(client_id=client_id))
+    ])
+
+    path_info = rdf_objects.PathInfo.OS(components=("foo", "bar"))
+    path_info.stat_entry.st_size = 42
+    path_info.hash_entry.sha256 = b"quux"
+    self.db.WritePathInfos(client_id, [path_info])
+
+  def testDeleteClientsRemovesAllClientData(self):
+    client_id_1 = "C.0000000000000001"
+    client_id_2 = "C.0000000000000002"
+    self._WriteClientWithData(client_id_1)
+    self._WriteClientWithData(client_id_2)
+
+    self.db.DeleteClients([client_id_1])
+
+    self.assertEqual(
+        list(self.db.MultiReadClientMetadata([client_id_1, client_id_2])),
+        [client_id_2])
+    self.assertEmpty(self.db.ReadClientLabels(client_id_1))
+    self.assertLen(self.db.ReadClientLabels(client_id_2), 1)
+    self.assertEqual(
+        self.db.ListClientsForKeywords(["keyword"]),
+        {"keyword": [client_id_2]})
+    self.assertEmpty(self.db.ReadClientStats(client_id_1))
+    self.assertLen(self.db.ReadClientStats(client_id_2), 1)
+    self.assertEmpty(self.db.ReadAllFlowObjects(client_id=client_id_1))
+    self.assertEqual(self.db.CountFlowResults(client_id_2, "1234ABCD"), 1)
+    with self.assertRaises(db.UnknownPathError):
+      self.db.ReadPathInfo(client_id_1, rdf_objects.PathInfo.PathType.OS,
+                           ("foo", "bar"))
+    path_info = self.db.ReadPathInfo(
+        client_id_2, rdf_objects.PathInfo.PathType.OS, ("foo", "bar"))
+    self.assertEqual(path_info.stat_entry.st_size, 42)
+
+  def testDeleteClientsIgnoresUnknownClients(self):
+    self.db.DeleteClients(["C.0000000000000001"])
+
+  def testDeleteClient(self):
+    self._WriteClientWithData("C.0000000000000001")
+    self.db.DeleteClient("C.0000000000000001")
+    self.assertEmpty(self.db.MultiReadClientMetadata(["C.0000000000000001"]))
+
   def _SetupLastPingClients(self, now):
     time_past = now - rdfvalue.Duration("1d")
 
@@ -1459,6 +1519,30 @@ class DatabaseTestClientsMixin(object):
     self._TestDeleteOldClientStatsYields(
         total=10, yield_after_count=4, yields_expected=[4, 4, 2])
 
+  def testDeleteOldClientStatsWithTablePartitions(self):
+    client_id = db_test_utils.InitializeClient(self.db)
+    now = rdfvalue.RDFDatetime.Now()
+
+    with test_lib.FakeTime(now - rdfvalue.Duration("40d")):
+      self.assertGreaterEqual(self.db.CreateTablePartitions(now), 0)
+    # Creating partitions is idempotent.
+    self.assertEqual(self.db.CreateTablePartitions(now), 0)
+
+    for i, age in enumerate(["35d", "32d", "31d", "1d"]):
+      with test_lib.FakeTime(now - rdfvalue.Duration(age) -
+                             rdfvalue.Duration("1h")):
+        self.db.WriteClientStats(client_id,
+                                 rdf_client_stats.ClientStats(RSS_size=i))
+
+    with test_lib.FakeTime(now):
+      deleted = list(self.db.DeleteOldClientStats(yield_after_count=100))
+    self.assertEqual(sum(deleted), 3)
+
+    stats = self.db.ReadClientStats(
+        client_id=client_id,
+        min_timestamp=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(1))
+    self.assertEqual([st.RSS_size for st in stats], [3])
+
   def _WriteTestClientsWithData(self,
                                 client_indices,
                                 last_ping=None,
@@ -18,9 +18,11 @@ from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import flows as rdf_flows
+from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
 from grr_response_core.lib.util import compatibility
 from grr_response_server import flow
 from grr_response_server.databases import db
+from grr_response_server.databases import mysql_utils
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
@@ -259,6 +261,79 @@ class DatabaseTestFlowMixin(object):
     with self.assertRaises(db.UnknownFlowError):
       self.db.ReadFlowObject(u"C.1234567890000000", flow_id)
 
+  def testWriteFlowObjects(self):
+    client_ids = [u"C.1234567890123456", u"C.1234567890123457"]
+    for client_id in client_ids:
+      self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+
+    rdf_flows = [
+        rdf_flow_objects.Flow(
+            client_id=client_id,
+            flow_id=u"1234ABCD",
+            next_request_to_process=4,
+            create_time=rdfvalue.RDFDatetime.Now()) for client_id in client_ids
+    ]
+    self.db.WriteFlowObjects(rdf_flows)
+
+    for rdf_flow in rdf_flows:
+      read_flow = self.db.ReadFlowObject(rdf_flow.client_id, u"1234ABCD")
+      read_flow.last_update_time = None
+      self.assertEqual(read_flow, rdf_flow)
+
+  def testWriteFlowObjectsUpdatesExistingFlows(self):
+    client_id = u"C.1234567890123456"
+    self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+
+    rdf_flow = rdf_flow_objects.Flow(
+        client_id=client_id,
+        flow_id=u"1234ABCD",
+        create_time=rdfvalue.RDFDatetime.Now())
+    self.db.WriteFlowObject(rdf_flow)
+
+    rdf_flow.next_request_to_process = 42
+    self.db.WriteFlowObjects([rdf_flow])
+
+    read_flow = self.db.ReadFlowObject(client_id, u"1234ABCD")
+    self.assertEqual(read_flow.next_request_to_process, 42)
+
+  def testWriteFlowObjectsRaisesForExistingFlowsIfUpdatesNotAllowed(self):
+    client_id = u"C.1234567890123456"
+    self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+
+    existing_flow = rdf_flow_objects.Flow(
+        client_id=client_id,
+        flow_id=u"1234ABCD",
+        create_time=rdfvalue.RDFDatetime.Now())
+    self.db.WriteFlowObject(existing_flow)
+
+    new_flow = rdf_flow_objects.Flow(
+        client_id=client_id,
+        flow_id=u"ABCD1234",
+        create_time=rdfvalue.RDFDatetime.Now())
+
+    with self.assertRaises(db.DuplicatedFlowError) as context:
+      self.db.WriteFlowObjects([new_flow, existing_flow], allow_update=False)
+
+    self.assertEqual(context.exception.client_id, client_id)
+    self.assertEqual(context.exception.flow_id, u"1234ABCD")
+    with self.assertRaises(db.UnknownFlowError):
+      self.db.ReadFlowObject(client_id, u"ABCD1234")
+
+  def testWriteFlowObjectsRaisesForUnknownClients(self):
+    client_id = u"C.1234567890123456"
+    self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+
+    rdf_flows = [
+        rdf_flow_objects.Flow(
+            client_id=cid,
+            flow_id=u"1234ABCD",
+            create_time=rdfvalue.RDFDatetime.Now())
+        for cid in [client_id, u"C.1234567890000000"]
+    ]
+
+    with self.assertRaises(db.AtLeastOneUnknownClientError):
+      self.db.WriteFlowObjects(rdf_flows)
+
   def testFlowOverwrite(self):
     flow_id = u"1234ABCD"
     client_id = u"C.1234567890123456"
@@ -1346,6 +1421,243 @@ class DatabaseTestFlowMixin(object):
 
     self.assertFalse(self.db.ReleaseProcessedFlow(processed_flow))
 
+  def testFlushFlowUpdates(self):
+    client_id, flow_id = self._SetupClientAndFlow(next_request_to_process=1)
+
+    # Request #1 was processed in a previous step and is being completed now.
+    self.db.WriteFlowRequests([
+        rdf_flow_objects.FlowRequest(
+            client_id=client_id, flow_id=flow_id, request_id=1)
+    ])
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, rdfvalue.Duration("60s"))
+    processed_flow.next_request_to_process = 2
+
+    released = self.db.FlushFlowUpdates(
+        flow_requests=[
+            rdf_flow_objects.FlowRequest(
+                client_id=client_id, flow_id=flow_id, request_id=2),
+            rdf_flow_objects.FlowRequest(
+                client_id=client_id, flow_id=flow_id, request_id=3)
+        ],
+        flow_responses=[
+            rdf_flow_objects.FlowResponse(
+                client_id=client_id,
+                flow_id=flow_id,
+                request_id=3,
+                response_id=1)
+        ],
+        client_action_requests=[
+            rdf_flows.ClientActionRequest(
+                client_id=client_id, flow_id=flow_id, request_id=2)
+        ],
+        completed_requests=[
+            rdf_flow_objects.FlowRequest(
+                client_id=client_id, flow_id=flow_id, request_id=1)
+        ],
+        flow_results=[
+            rdf_flow_objects.FlowResult(
+                client_id=client_id,
+                flow_id=flow_id,
+                payload=rdf_client.ClientSummary(client_id=client_id))
+        ],
+        flow_to_release=processed_flow)
+    self.assertTrue(released)
+
+    requests_and_responses = self.db.ReadAllFlowRequestsAndResponses(
+        client_id, flow_id)
+    self.assertEqual([(r.request_id, sorted(responses))
+                      for r, responses in requests_and_responses],
+                     [(2, []), (3, [1])])
+
+    action_requests = self.db.ReadAllClientActionRequests(client_id)
+    self.assertEqual([r.request_id for r in action_requests], [2])
+
+    results = self.db.ReadFlowResults(client_id, flow_id, 0, 100)
+    self.assertLen(results, 1)
+
+    rdf_flow = self.db.ReadFlowObject(client_id, flow_id)
+    self.assertFalse(rdf_flow.processing_on)
+    self.assertEqual(rdf_flow.next_request_to_process, 2)
+
+  def testFlushFlowUpdatesWithoutRelease(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+
+    released = self.db.FlushFlowUpdates(flow_requests=[
+        rdf_flow_objects.FlowRequest(
+            client_id=client_id, flow_id=flow_id, request_id=1)
+    ])
+    self.assertTrue(released)
+
+    requests_and_responses = self.db.ReadAllFlowRequestsAndResponses(
+        client_id, flow_id)
+    self.assertLen(requests_and_responses, 1)
+
+  def testFlushFlowUpdatesDoesNotReleaseFlowWithPendingRequest(self):
+    client_id, flow_id = self._SetupClientAndFlow(next_request_to_process=1)
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, rdfvalue.Duration("60s"))
+    processed_flow.next_request_to_process = 2
+
+    # The request written in the same call is ready for processing, so the
+    # flow has to stay leased.
+    released = self.db.FlushFlowUpdates(
+        flow_requests=[
+            rdf_flow_objects.FlowRequest(
+                client_id=client_id,
+                flow_id=flow_id,
+                request_id=2,
+                needs_processing=True)
+        ],
+        flow_to_release=processed_flow)
+    self.assertFalse(released)
+
+    requests_and_responses = self.db.ReadAllFlowRequestsAndResponses(
+        client_id, flow_id)
+    self.assertLen(requests_and_responses, 1)
+
+  def testFlushFlowUpdatesRaisesOnUnknownFlow(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+
+    with self.assertRaises(db.AtLeastOneUnknownFlowError):
+      self.db.FlushFlowUpdates(flow_requests=[
+          rdf_flow_objects.FlowRequest(
+              client_id=client_id, flow_id="11111111", request_id=1)
+      ])
+
+    self.assertEmpty(self.db.ReadAllFlowRequestsAndResponses(client_id,
+                                                             flow_id))
+
+  def testLeaseFlowForProcessingReusesCachedFlow(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    processed_flow.persistent_data = rdf_protodict.AttributedDict(foo="bar")
+    self.assertTrue(
+        self.db.ReleaseProcessedFlow(processed_flow, flow_cache=flow_cache))
+
+    leased_again = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.assertIs(leased_again, processed_flow)
+    self.assertEqual(leased_again.processing_on, utils.ProcessIdString())
+
+    read_flow = self.db.ReadFlowObject(client_id, flow_id)
+    self.assertEqual(read_flow.persistent_data.foo, "bar")
+
+  def testLeaseFlowForProcessingIgnoresOutdatedCachedFlow(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.assertTrue(
+        self.db.ReleaseProcessedFlow(processed_flow, flow_cache=flow_cache))
+
+    pending_termination = rdf_flow_objects.PendingFlowTermination(reason="foo")
+    self.db.UpdateFlow(
+        client_id, flow_id, pending_termination=pending_termination)
+
+    leased_again = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.assertIsNot(leased_again, processed_flow)
+    self.assertEqual(leased_again.pending_termination, pending_termination)
+
+  def testLeaseFlowForProcessingIgnoresCachedFlowThatWasRecreated(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.assertTrue(
+        self.db.ReleaseProcessedFlow(processed_flow, flow_cache=flow_cache))
+
+    # The flow is created again with the same id and written as many times as
+    # the cached one.
+    self.db.DeleteClient(client_id)
+    self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+    self.db.WriteFlowObject(
+        rdf_flow_objects.Flow(
+            client_id=client_id,
+            flow_id=flow_id,
+            create_time=rdfvalue.RDFDatetime.Now()))
+    pending_termination = rdf_flow_objects.PendingFlowTermination(reason="foo")
+    for _ in range(2):
+      self.db.UpdateFlow(
+          client_id, flow_id, pending_termination=pending_termination)
+
+    leased_again = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.assertIsNot(leased_again, processed_flow)
+    self.assertEqual(leased_again.pending_termination, pending_termination)
+
+  def testLeaseFlowForProcessingIgnoresCachedFlowThatWasNotReleased(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+    now = rdfvalue.RDFDatetime.Now()
+
+    with test_lib.FakeTime(now):
+      processed_flow = self.db.LeaseFlowForProcessing(
+          client_id, flow_id, processing_time, flow_cache=flow_cache)
+    # The worker changes the flow, but fails before releasing it.
+    processed_flow.persistent_data = rdf_protodict.AttributedDict(foo="bar")
+
+    after_deadline = now + processing_time + rdfvalue.Duration("1s")
+    with test_lib.FakeTime(after_deadline):
+      leased_again = self.db.LeaseFlowForProcessing(
+          client_id, flow_id, processing_time, flow_cache=flow_cache)
+
+    self.assertIsNot(leased_again, processed_flow)
+    self.assertFalse(leased_again.HasField("persistent_data"))
+
+  def testReleaseProcessedFlowWritesChangedPersistentData(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+
+    for i in range(3):
+      processed_flow = self.db.LeaseFlowForProcessing(
+          client_id, flow_id, processing_time, flow_cache=flow_cache)
+      # The persistent data changes only in every other step.
+      processed_flow.persistent_data = rdf_protodict.AttributedDict(
+          value=i // 2)
+      processed_flow.next_request_to_process = i
+      self.assertTrue(
+          self.db.ReleaseProcessedFlow(processed_flow, flow_cache=flow_cache))
+
+      read_flow = self.db.ReadFlowObject(client_id, flow_id)
+      self.assertEqual(read_flow.persistent_data.value, i // 2)
+      self.assertEqual(read_flow.next_request_to_process, i)
+
+  def testReleaseProcessedFlowKeepsCachedFlowIfNotReleased(self):
+    client_id, flow_id = self._SetupClientAndFlow(next_request_to_process=1)
+    processing_time = rdfvalue.Duration("60s")
+    flow_cache = db.FlowCache()
+
+    processed_flow = self.db.LeaseFlowForProcessing(
+        client_id, flow_id, processing_time, flow_cache=flow_cache)
+    self.db.WriteFlowRequests([
+        rdf_flow_objects.FlowRequest(
+            client_id=client_id,
+            flow_id=flow_id,
+            request_id=1,
+            needs_processing=True)
+    ])
+    self.assertFalse(
+        self.db.ReleaseProcessedFlow(processed_flow, flow_cache=flow_cache))
+
+    # The flow is still being processed, so it can't be leased from the cache.
+    with self.assertRaises(ValueError):
+      self.db.LeaseFlowForProcessing(
+          client_id, flow_id, processing_time, flow_cache=flow_cache)
+
   def testReadChildFlows(self):
     client_id = u"C.1234567890123456"
     self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
@@ -1852,6 +2164,33 @@ class DatabaseTestFlowMixin(object):
         client_id, flow_id, 0, 100, with_substring="manufacturer_1")
     self.assertEqual([i.payload for i in results], [sample_results[1].payload])
 
+  def testReadFlowResultsWithSubstringFilterFindsResultsWithoutText(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    # Results written before the extracted text of payloads was stored by the
+    # MySQL database have no such text.
+    with mock.patch.object(
+        mysql_utils, "ExtractPayloadText", return_value=None):
+      sample_results = self._WriteFlowResults(
+          self._SampleResults(client_id, flow_id), multiple_timestamps=True)
+
+    results = self.db.ReadFlowResults(
+        client_id, flow_id, 0, 100, with_substring="manufacturer_1")
+    self.assertEqual([i.payload for i in results], [sample_results[1].payload])
+
+  def testReadFlowResultsWithSubstringFilterSearchesBinaryFields(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    sample_results = self._WriteFlowResults(sample_results=[
+        rdf_flow_objects.FlowResult(
+            client_id=client_id,
+            flow_id=flow_id,
+            payload=rdf_client.BufferReference(data=data))
+        for data in [b"foobar", b"bazquux"]
+    ], multiple_timestamps=True)
+
+    results = self.db.ReadFlowResults(
+        client_id, flow_id, 0, 100, with_substring="quu")
+    self.assertEqual([i.payload for i in results], [sample_results[1].payload])
+
   def testReadFlowResultsCorrectlyAppliesVariousCombinationsOfFilters(self):
     client_id, flow_id = self._SetupClientAndFlow()
     sample_results = self._WriteFlowResults(
@@ -1907,6 +2246,53 @@ class DatabaseTestFlowMixin(object):
                             rdf_objects.SerializedValueOfUnrecognizedType)
       self.assertEqual(r.payload.type_name, type_name)
 
+  def testIterateFlowResultsReadsAllResultsInBatches(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    sample_results = self._WriteFlowResults(
+        self._SampleResults(client_id, flow_id), multiple_timestamps=True)
+
+    for batch_size in [1, 3, 10, 100]:
+      results = list(
+          self.db.IterateFlowResults(client_id, flow_id, batch_size=batch_size))
+      self.assertEqual([i.payload for i in results],
+                       [i.payload for i in sample_results])
+
+  def testIterateFlowResultsHandlesResultsWithEqualTimestamps(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    with test_lib.FakeTime(42):
+      sample_results = self._WriteFlowResults(
+          self._SampleResults(client_id, flow_id))
+
+    results = list(self.db.IterateFlowResults(client_id, flow_id, batch_size=3))
+    self.assertCountEqual([i.payload for i in results],
+                          [i.payload for i in sample_results])
+
+  def testIterateFlowResultsCorrectlyAppliesFilters(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    sample_results = self._WriteFlowResults(
+        self._SampleResults(client_id, flow_id), multiple_timestamps=True)
+
+    results = list(
+        self.db.IterateFlowResults(client_id, flow_id, with_tag="tag_1"))
+    self.assertEqual([i.payload for i in results], [sample_results[1].payload])
+
+    results = list(
+        self.db.IterateFlowResults(
+            client_id, flow_id, with_substring="manufacturer_2"))
+    self.assertEqual([i.payload for i in results], [sample_results[2].payload])
+
+    results = list(
+        self.db.IterateFlowResults(
+            client_id,
+            flow_id,
+            with_type=compatibility.GetName(rdf_client.ClientCrash)))
+    self.assertEmpty(results)
+
+  def testIterateFlowResultsRejectsInvalidBatchSize(self):
+    client_id, flow_id = self._SetupClientAndFlow()
+    with self.assertRaises(ValueError):
+      self.db.IterateFlowResults(client_id, flow_id, batch_size=0)
+
   def testCountFlowResultsReturnsCorrectResultsCount(self):
     client_id, flow_id = self._SetupClientAndFlow()
     sample_results = self._WriteFlowResults(
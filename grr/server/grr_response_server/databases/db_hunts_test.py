@@ -888,6 +888,49 @@ class DatabaseTestHuntMixin(object):
           isinstance(r.payload, rdf_objects.SerializedValueOfUnrecognizedType))
       self.assertEqual(r.payload.type_name, type_name)
 
+  def testIterateHuntResultsReadsAllResultsInBatches(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    sample_results = []
+    for _ in range(2):
+      client_id, flow_id = self._SetupHuntClientAndFlow(
+          hunt_id=hunt_obj.hunt_id)
+      results = self._SampleTwoTypeHuntResults(
+          client_id=client_id, flow_id=flow_id, hunt_id=hunt_obj.hunt_id)
+      self._WriteHuntResults(results)
+      sample_results.extend(results)
+
+    for batch_size in [1, 3, 20, 100]:
+      results = list(
+          self.db.IterateHuntResults(hunt_obj.hunt_id, batch_size=batch_size))
+      self.assertEqual([i.payload for i in results],
+                       [i.payload for i in sample_results])
+      for r in results:
+        self.assertEqual(r.hunt_id, hunt_obj.hunt_id)
+
+  def testIterateHuntResultsCorrectlyAppliesFilters(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    client_id, flow_id = self._SetupHuntClientAndFlow(hunt_id=hunt_obj.hunt_id)
+    sample_results = self._SampleTwoTypeHuntResults(
+        client_id=client_id, flow_id=flow_id, hunt_id=hunt_obj.hunt_id)
+    self._WriteHuntResults(sample_results)
+
+    results = list(
+        self.db.IterateHuntResults(
+            hunt_obj.hunt_id,
+            with_type=compatibility.GetName(rdf_client.ClientCrash),
+            batch_size=2))
+    self.assertEqual([i.payload for i in results],
+                     [i.payload for i in sample_results[5:]])
+
+    results = list(
+        self.db.IterateHuntResults(
+            hunt_obj.hunt_id, with_tag="tag_1", with_substring="manufacturer"))
+    self.assertEqual([i.payload for i in results], [sample_results[1].payload])
+
   def testCountHuntResultsReturnsCorrectResultsCount(self):
     hunt_obj = rdf_hunt_objects.Hunt(description="foo")
     self.db.WriteHuntObject(hunt_obj)
@@ -1379,6 +1422,50 @@ class DatabaseTestHuntMixin(object):
     state_and_times = self.db.ReadHuntFlowsStatesAndTimestamps(hunt_obj.hunt_id)
     self.assertCountEqual(state_and_times, expected)
 
+  def testReadHuntFlowsCompletionHistogramCountsFlowsPerSecond(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    started = collections.Counter()
+    completed = collections.Counter()
+    for i in range(10):
+      client_id, flow_id = self._SetupHuntClientAndFlow(
+          hunt_id=hunt_obj.hunt_id)
+
+      if i % 2 == 0:
+        flow_state = rdf_flow_objects.Flow.FlowState.RUNNING
+      else:
+        flow_state = rdf_flow_objects.Flow.FlowState.FINISHED
+      self.db.UpdateFlow(client_id, flow_id, flow_state=flow_state)
+
+      # The last update time is set by the database, so expected times are
+      # taken from the flow objects.
+      flow_obj = self.db.ReadFlowObject(client_id, flow_id)
+      started[flow_obj.create_time.AsSecondsSinceEpoch()] += 1
+      if i % 2 != 0:
+        completed[flow_obj.last_update_time.AsSecondsSinceEpoch()] += 1
+
+    histogram = self.db.ReadHuntFlowsCompletionHistogram(hunt_obj.hunt_id)
+    self.assertEqual(histogram.started, dict(started))
+    self.assertEqual(histogram.completed, dict(completed))
+    self.assertEqual(sum(histogram.completed.values()), 5)
+
+  def testReadHuntFlowsCompletionHistogramIgnoresNestedFlows(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    client_id, flow_id = self._SetupHuntClientAndFlow(
+        hunt_id=hunt_obj.hunt_id,
+        flow_state=rdf_flow_objects.Flow.FlowState.RUNNING)
+    self._SetupHuntClientAndFlow(
+        hunt_id=hunt_obj.hunt_id, parent_flow_id=flow_id)
+
+    histogram = self.db.ReadHuntFlowsCompletionHistogram(hunt_obj.hunt_id)
+    flow_obj = self.db.ReadFlowObject(client_id, flow_id)
+    self.assertEqual(histogram.started,
+                     {flow_obj.create_time.AsSecondsSinceEpoch(): 1})
+    self.assertEqual(histogram.completed, {})
+
   def testReadHuntFlowsStatesAndTimestampsIgnoresNestedFlows(self):
     hunt_obj = rdf_hunt_objects.Hunt(description="foo")
     self.db.WriteHuntObject(hunt_obj)
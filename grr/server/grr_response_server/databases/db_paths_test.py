@@ -1174,6 +1174,64 @@ class DatabaseTestPathsMixin(object):
     self.assertEqual(results[0].components, ("__", "__bar__"))
     self.assertEqual(results[1].components, ("__", "__baz__"))
 
+  def testIterateDescendentPathInfosEmptyResult(self):
+    client_id = db_test_utils.InitializeClient(self.db)
+
+    self.db.WritePathInfos(client_id,
+                           [rdf_objects.PathInfo.OS(components=["foo"])])
+
+    results = self.db.IterateDescendentPathInfos(
+        client_id, rdf_objects.PathInfo.PathType.OS, components=("foo",))
+    self.assertEmpty(list(results))
+
+  def testIterateDescendentPathInfosReadsAllBatches(self):
+    client_id = db_test_utils.InitializeClient(self.db)
+
+    self.db.WritePathInfos(client_id, [
+        rdf_objects.PathInfo.OS(components=["foo", "bar", "baz"]),
+        rdf_objects.PathInfo.OS(components=["foo", "bar", "quux"]),
+        rdf_objects.PathInfo.OS(components=["foo", "norf", "thud"]),
+        rdf_objects.PathInfo.OS(components=["blargh"]),
+        rdf_objects.PathInfo.TSK(components=["foo", "ztesch"]),
+    ])
+
+    for batch_size in [1, 2, 6, 100]:
+      results = self.db.IterateDescendentPathInfos(
+          client_id,
+          rdf_objects.PathInfo.PathType.OS,
+          components=("foo",),
+          batch_size=batch_size)
+
+      components = [tuple(path_info.components) for path_info in results]
+      self.assertCountEqual(components, [
+          ("foo", "bar"),
+          ("foo", "bar", "baz"),
+          ("foo", "bar", "quux"),
+          ("foo", "norf"),
+          ("foo", "norf", "thud"),
+      ])
+
+  def testIterateDescendentPathInfosReturnsLatestEntries(self):
+    client_id = db_test_utils.InitializeClient(self.db)
+
+    for size in [42, 1337]:
+      path_info = rdf_objects.PathInfo.OS(components=["foo", "bar"])
+      path_info.stat_entry.st_size = size
+      path_info.hash_entry.sha256 = hashlib.sha256(b"%d" % size).digest()
+      self.db.WritePathInfos(client_id, [path_info])
+
+    results = list(
+        self.db.IterateDescendentPathInfos(
+            client_id,
+            rdf_objects.PathInfo.PathType.OS,
+            components=("foo",),
+            batch_size=1))
+
+    self.assertLen(results, 1)
+    self.assertEqual(results[0].stat_entry.st_size, 1337)
+    self.assertEqual(results[0].hash_entry.sha256,
+                     hashlib.sha256(b"1337").digest())
+
   def testListChildPathInfosRoot(self):
     client_id = db_test_utils.InitializeClient(self.db)
 
@@ -87,6 +87,9 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     self.handler_stop = True
     # Maps (client_id, flow_id) to flow objects.
     self.flows = {}
+    # Maps (client_id, flow_id) to versions of flow objects.
+    self.flow_versions = {}
+    self.last_flow_version = 0
     # Maps (client_id, flow_id) to flow request id to the request.
     self.flow_requests = {}
     # Maps (client_id, flow_id) to flow request id to a list of responses.
@@ -113,6 +116,11 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     self.UnregisterMessageHandler()
     self._Init()
 
+  def CreateTablePartitions(self, until):
+    """Creates partitions of time-partitioned tables up to a given time."""
+    del until  # Unused.
+    return 0
+
   def _AllPathIDs(self):
     result = set()
 
@@ -175,6 +175,33 @@ class InMemoryDBClientMixin(object):
     if last_pings:
       yield last_pings
 
+  @utils.Synchronized
+  def DeleteClients(self, client_ids):
+    """Deletes clients with all associated metadata."""
+    client_ids = set(client_ids)
+
+    for client_data in [
+        self.metadatas, self.clients, self.startup_history, self.crash_history,
+        self.labels, self.client_stats
+    ]:
+      for client_id in client_ids:
+        client_data.pop(client_id, None)
+
+    for keyword_clients in itervalues(self.keywords):
+      for client_id in client_ids:
+        keyword_clients.pop(client_id, None)
+
+    # These are keyed by tuples starting with the client id.
+    for client_data in [
+        self.path_records, self.blob_records, self.flows, self.flow_versions,
+        self.flow_requests, self.flow_responses, self.flow_processing_requests,
+        self.flow_results, self.flow_log_entries,
+        self.flow_output_plugin_log_entries, self.client_action_requests,
+        self.client_action_request_leases
+    ]:
+      for key in [key for key in client_data if key[0] in client_ids]:
+        del client_data[key]
+
   @utils.Synchronized
   def WriteClientSnapshotHistory(self, clients):
     """Writes the full history for a particular client."""
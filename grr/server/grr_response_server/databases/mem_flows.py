@@ -230,6 +230,29 @@ class InMemoryDBFlowMixin(object):
     clone = flow_obj.Copy()
     clone.last_update_time = rdfvalue.RDFDatetime.Now()
     self.flows[(flow_obj.client_id, flow_obj.flow_id)] = clone
+    self._BumpFlowVersion(flow_obj.client_id, flow_obj.flow_id)
+
+  def _BumpFlowVersion(self, client_id, flow_id):
+    # Versions are never reused, so that a cached flow can't be mistaken for
+    # a newer flow with the same id.
+    self.last_flow_version += 1
+    self.flow_versions[(client_id, flow_id)] = self.last_flow_version
+
+  @utils.Synchronized
+  def WriteFlowObjects(self, flow_objs, allow_update=True):
+    """Writes multiple flow objects to the database."""
+    unknown_client_ids = set(flow_obj.client_id for flow_obj in flow_objs
+                             if flow_obj.client_id not in self.metadatas)
+    if unknown_client_ids:
+      raise db.AtLeastOneUnknownClientError(sorted(unknown_client_ids))
+
+    if not allow_update:
+      for flow_obj in flow_objs:
+        if (flow_obj.client_id, flow_obj.flow_id) in self.flows:
+          raise db.DuplicatedFlowError(flow_obj.client_id, flow_obj.flow_id)
+
+    for flow_obj in flow_objs:
+      self.WriteFlowObject(flow_obj)
 
   @utils.Synchronized
   def ReadFlowObject(self, client_id, flow_id):
@@ -266,9 +289,23 @@ class InMemoryDBFlowMixin(object):
     return res
 
   @utils.Synchronized
-  def LeaseFlowForProcessing(self, client_id, flow_id, processing_time):
+  def LeaseFlowForProcessing(self,
+                             client_id,
+                             flow_id,
+                             processing_time,
+                             flow_cache=None):
     """Marks a flow as being processed on this worker and returns it."""
-    rdf_flow = self.ReadFlowObject(client_id, flow_id)
+    rdf_flow = None
+    if flow_cache is not None:
+      cached = flow_cache.Pop(client_id, flow_id)
+      if cached is not None:
+        cached_flow, version, _ = cached
+        if (version is not None and
+            version == self.flow_versions.get((client_id, flow_id))):
+          rdf_flow = cached_flow
+
+    if rdf_flow is None:
+      rdf_flow = self.ReadFlowObject(client_id, flow_id)
     # TODO(user): remove the check for a legacy hunt prefix as soon as
     # AFF4 is gone.
     if rdf_flow.parent_hunt_id and not rdf_flow.parent_hunt_id.startswith("H:"):
@@ -294,6 +331,9 @@ class InMemoryDBFlowMixin(object):
     rdf_flow.processing_on = process_id_string
     rdf_flow.processing_since = now
     rdf_flow.processing_deadline = processing_deadline
+
+    if flow_cache is not None:
+      flow_cache.Put(rdf_flow, None)
     return rdf_flow
 
   @utils.Synchronized
@@ -331,6 +371,7 @@ class InMemoryDBFlowMixin(object):
     if processing_deadline != db.Database.unchanged:
       flow.processing_deadline = processing_deadline
     flow.last_update_time = rdfvalue.RDFDatetime.Now()
+    self._BumpFlowVersion(client_id, flow_id)
 
   @utils.Synchronized
   def UpdateFlows(self,
@@ -536,7 +577,7 @@ class InMemoryDBFlowMixin(object):
     return res
 
   @utils.Synchronized
-  def ReleaseProcessedFlow(self, flow_obj):
+  def ReleaseProcessedFlow(self, flow_obj, flow_cache=None):
     """Releases a flow that the worker was processing to the database."""
     key = (flow_obj.client_id, flow_obj.flow_id)
     next_id_to_process = flow_obj.next_request_to_process
@@ -545,15 +586,53 @@ class InMemoryDBFlowMixin(object):
         request_dict[next_id_to_process].needs_processing):
       return False
 
+    if flow_cache is not None:
+      # The cached object is handed out again on the next lease, so it must
+      # not be the stored one.
+      stored_flow = flow_obj.Copy()
+    else:
+      stored_flow = flow_obj
+
     self.UpdateFlow(
         flow_obj.client_id,
         flow_obj.flow_id,
-        flow_obj=flow_obj,
+        flow_obj=stored_flow,
         processing_on=None,
         processing_since=None,
         processing_deadline=None)
+
+    if flow_cache is not None:
+      flow_obj.processing_on = None
+      flow_obj.processing_since = None
+      flow_obj.processing_deadline = None
+      flow_cache.Put(flow_obj, self.flow_versions[key])
     return True
 
+  @utils.Synchronized
+  def FlushFlowUpdates(self,
+                       flow_requests=None,
+                       flow_responses=None,
+                       client_action_requests=None,
+                       completed_requests=None,
+                       flow_results=None,
+                       flow_to_release=None,
+                       flow_cache=None):
+    """Writes all updates produced by a step of flow processing at once."""
+    if flow_requests:
+      self.WriteFlowRequests(flow_requests)
+    if flow_responses:
+      self.WriteFlowResponses(flow_responses)
+    if client_action_requests:
+      self.WriteClientActionRequests(client_action_requests)
+    if completed_requests:
+      self.DeleteFlowRequests(completed_requests)
+    if flow_results:
+      self.WriteFlowResults(flow_results)
+
+    if flow_to_release is None:
+      return True
+    return self.ReleaseProcessedFlow(flow_to_release, flow_cache=flow_cache)
+
   def _InlineProcessingOK(self, requests):
     for r in requests:
       if r.delivery_time is not None:
@@ -734,6 +813,28 @@ class InMemoryDBFlowMixin(object):
 
     return results[offset:offset + count]
 
+  @utils.Synchronized
+  def IterateFlowResults(self,
+                         client_id,
+                         flow_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=db.RESULTS_BATCH_SIZE):
+    """Yields all flow results of a given flow matching given query options."""
+    del batch_size  # Unused, all the results are in memory anyway.
+    # Results are copied while holding the lock, so that writes happening while
+    # the caller iterates don't affect the iteration.
+    return iter(
+        self.ReadFlowResults(
+            client_id,
+            flow_id,
+            0,
+            sys.maxsize,
+            with_tag=with_tag,
+            with_type=with_type,
+            with_substring=with_substring))
+
   @utils.Synchronized
   def CountFlowResults(self, client_id, flow_id, with_tag=None, with_type=None):
     """Counts flow results of a given flow using given query options."""
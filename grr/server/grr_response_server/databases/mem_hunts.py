@@ -4,6 +4,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
 import sys
 
 from grr_response_core.lib import rdfvalue
@@ -229,6 +230,26 @@ class InMemoryDBHuntMixin(object):
 
     return sorted(all_results, key=lambda x: x.timestamp)[offset:offset + count]
 
+  @utils.Synchronized
+  def IterateHuntResults(self,
+                         hunt_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=db.RESULTS_BATCH_SIZE):
+    """Yields all hunt results of a given hunt matching given query options."""
+    del batch_size  # Unused, all the results are in memory anyway.
+    # Results are copied while holding the lock, so that writes happening while
+    # the caller iterates don't affect the iteration.
+    return iter(
+        self.ReadHuntResults(
+            hunt_id,
+            0,
+            sys.maxsize,
+            with_tag=with_tag,
+            with_type=with_type,
+            with_substring=with_substring))
+
   @utils.Synchronized
   def CountHuntResults(self, hunt_id, with_tag=None, with_type=None):
     """Counts hunt results of a given hunt using given query options."""
@@ -350,6 +371,19 @@ class InMemoryDBHuntMixin(object):
 
     return result
 
+  @utils.Synchronized
+  def ReadHuntFlowsCompletionHistogram(self, hunt_id):
+    """Counts hunt flows started and completed within every second."""
+    started = collections.Counter()
+    completed = collections.Counter()
+    for f in self._GetHuntFlows(hunt_id):
+      started[f.create_time.AsSecondsSinceEpoch()] += 1
+      if f.flow_state != rdf_flow_objects.Flow.FlowState.RUNNING:
+        completed[f.last_update_time.AsSecondsSinceEpoch()] += 1
+
+    return db.HuntFlowsCompletionHistogram(
+        started=dict(started), completed=dict(completed))
+
   @utils.Synchronized
   def ReadHuntOutputPluginLogEntries(self,
                                      hunt_id,
@@ -276,6 +276,18 @@ class InMemoryDBPathMixin(object):
     trie.Collect(explicit_path_infos)
     return explicit_path_infos
 
+  @utils.Synchronized
+  def IterateDescendentPathInfos(self,
+                                 client_id,
+                                 path_type,
+                                 components,
+                                 batch_size=db.PATH_INFOS_BATCH_SIZE):
+    """Yields path info records that correspond to descendants of given path."""
+    del batch_size  # Unused, all the path infos are in memory anyway.
+    # Path infos are read while holding the lock, so that writes happening
+    # while the caller iterates don't affect the iteration.
+    return iter(self.ListDescendentPathInfos(client_id, path_type, components))
+
   def _GetPathRecord(self, client_id, path_info, set_default=True):
     components = tuple(path_info.components)
     path_idx = (client_id, path_info.path_type, components)
@@ -26,6 +26,7 @@ from MySQLdb.constants import ER as mysql_error_constants
 from typing import Callable
 
 from grr_response_core import config
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server import threadpool
 from grr_response_server.databases import db as db_module
 from grr_response_server.databases import mysql_artifacts
@@ -38,8 +39,10 @@ from grr_response_server.databases import mysql_flows
 from grr_response_server.databases import mysql_foreman_rules
 from grr_response_server.databases import mysql_hunts
 from grr_response_server.databases import mysql_migration
+from grr_response_server.databases import mysql_partitions
 from grr_response_server.databases import mysql_paths
 from grr_response_server.databases import mysql_pool
+from grr_response_server.databases import mysql_replicas
 from grr_response_server.databases import mysql_signed_binaries
 from grr_response_server.databases import mysql_users
 
@@ -412,6 +415,7 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
               mysql_flows.MySQLDBFlowMixin,
               mysql_foreman_rules.MySQLDBForemanRulesMixin,
               mysql_hunts.MySQLDBHuntMixin,
+              mysql_partitions.MySQLDBPartitionsMixin,
               mysql_paths.MySQLDBPathMixin,
               mysql_signed_binaries.MySQLDBSignedBinariesMixin,
               mysql_users.MySQLDBUsersMixin,
@@ -432,7 +436,8 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
                port=None,
                user=None,
                password=None,
-               database=None):
+               database=None,
+               replica_hosts=None):
     """Creates a datastore implementation.
 
     Args:
@@ -441,6 +446,8 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
       user: Passed to MySQLdb.Connect when creating a new connection.
       password: Passed to MySQLdb.Connect when creating a new connection.
       database: Passed to MySQLdb.Connect when creating a new connection.
+      replica_hosts: A list of read replica addresses ('host' or 'host:port').
+        Defaults to the Mysql.replica_hosts config option.
     """
 
     # Turn all SQL warnings not mentioned below into exceptions.
@@ -480,7 +487,18 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
     _SetupDatabase(**self._connect_args)
 
     max_pool_size = config.CONFIG.Get("Mysql.conn_pool_max", 10)
-    self.pool = mysql_pool.Pool(self._Connect, max_size=max_pool_size)
+    self.pool = mysql_pool.Pool(
+        self._Connect,
+        max_size=max_pool_size,
+        min_size=config.CONFIG["Mysql.conn_pool_min_idle"],
+        max_idle_time=config.CONFIG["Mysql.conn_pool_max_idle_time"],
+        ping_after=config.CONFIG["Mysql.conn_pool_ping_after"],
+        name="primary")
+    self.pool.Warm()
+
+    if replica_hosts is None:
+      replica_hosts = config.CONFIG["Mysql.replica_hosts"]
+    self.replicas = self._CreateReplicaSet(replica_hosts)
 
     self.handler_thread = None
     self.handler_stop = True
@@ -495,12 +513,42 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
   def _Connect(self):
     return _Connect(**self._connect_args)
 
+  def _CreateReplicaSet(self, replica_hosts):
+    """Creates a set of read replicas with a connection pool for each."""
+    replicas = []
+    for address in replica_hosts:
+      host, port = mysql_replicas.ParseReplicaAddress(
+          address, default_port=self._connect_args["port"])
+
+      connect_args = self._connect_args.copy()
+      connect_args["host"] = host
+      connect_args["port"] = port
+
+      name = "{}:{}".format(host, port)
+      # Replica pools are not warmed up, so that an unavailable replica does
+      # not prevent the server from starting.
+      pool = mysql_pool.Pool(
+          lambda args=connect_args: _Connect(**args),
+          max_size=config.CONFIG["Mysql.replica_conn_pool_max"],
+          max_idle_time=config.CONFIG["Mysql.conn_pool_max_idle_time"],
+          ping_after=config.CONFIG["Mysql.conn_pool_ping_after"],
+          name=name)
+      replicas.append(mysql_replicas.Replica(name, pool))
+
+    return mysql_replicas.ReplicaSet(
+        replicas,
+        max_lag=config.CONFIG["Mysql.replica_max_lag"],
+        check_interval=config.CONFIG["Mysql.replica_health_check_interval"])
+
   def Close(self):
     self.pool.close()
+    self.replicas.Close()
 
   def _RunInTransaction(self,
                         function,
-                        readonly = False):
+                        readonly = False,
+                        allow_replica = False,
+                        single_statement = False):
     """Runs function within a transaction.
 
     Allocates a connection, begins a transaction on it and passes the connection
@@ -511,25 +559,76 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
     If function raises, the transaction will be rolled back, if a retryable
     database error is raised, the operation may be repeated.
 
+    Readonly transactions that allow it are run on a read replica if there is a
+    healthy one.
+    If the replica fails, the transaction is repeated on the primary.
+
+    Functions that execute a single SQL statement do not need an explicit
+    transaction: the statement is atomic on its own, so the START TRANSACTION
+    round trip can be skipped.
+
     Args:
       function: A function to be run.
       readonly: Indicates that only a readonly (snapshot) transaction is
         required.
+      allow_replica: Whether a readonly transaction can be run on a read
+        replica. Only reads that tolerate stale data should pass True.
+      single_statement: Indicates that function executes only a single SQL
+        statement, so no explicit transaction has to be started.
 
     Returns:
       The value returned by the last call to function.
 
     Raises: Any exception raised by function.
     """
+    if readonly and allow_replica and self.replicas:
+      replica = self.replicas.GetReplica()
+      if replica is None:
+        stats_collector_instance.Get().IncrementCounter(
+            "mysql_replica_fallbacks", fields=["unavailable"])
+      else:
+        try:
+          return self._RunInTransactionOnPool(
+              function,
+              replica.pool,
+              replica.name,
+              readonly=True,
+              single_statement=single_statement)
+        except MySQLdb.OperationalError as e:
+          logging.warning(
+              "Readonly transaction failed on MySQL replica %s, "
+              "falling back to the primary: %s", replica.name, e)
+          self.replicas.MarkFailed(replica)
+          stats_collector_instance.Get().IncrementCounter(
+              "mysql_replica_fallbacks", fields=["error"])
+
+    return self._RunInTransactionOnPool(
+        function,
+        self.pool,
+        "primary",
+        readonly=readonly,
+        single_statement=single_statement)
+
+  def _RunInTransactionOnPool(self,
+                              function,
+                              pool,
+                              pool_name,
+                              readonly=False,
+                              single_statement=False):
+    """Runs function within a transaction on a connection from given pool."""
+    stats_collector_instance.Get().IncrementCounter(
+        "mysql_transactions", fields=[pool_name])
+
     start_query = "START TRANSACTION"
     if readonly:
       start_query = "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY"
 
     for retry_count in range(_MAX_RETRY_COUNT):
-      with contextlib.closing(self.pool.get()) as connection:
+      with contextlib.closing(pool.get()) as connection:
         try:
-          with contextlib.closing(connection.cursor()) as cursor:
-            cursor.execute(start_query)
+          if not single_statement:
+            with contextlib.closing(connection.cursor()) as cursor:
+              cursor.execute(start_query)
 
           ret = function(connection)
 
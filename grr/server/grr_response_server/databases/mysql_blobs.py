@@ -93,7 +93,7 @@ class MySQLDBBlobsMixin(blob_store.BlobStore):
     for values in _PartitionChunks(chunks):
       _Insert(cursor, "blobs", values)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadBlobs(self, blob_ids, cursor=None):
     """Reads given blobs."""
     if not blob_ids:
@@ -115,7 +115,7 @@ class MySQLDBBlobsMixin(blob_store.BlobStore):
         results[blob_id] += blob
     return results
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def CheckBlobsExist(self, blob_ids, cursor=None):
     """Checks if given blobs exist."""
     if not blob_ids:
@@ -144,7 +144,7 @@ class MySQLDBBlobsMixin(blob_store.BlobStore):
       })
     _Insert(cursor, "hash_blob_references", values)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadHashBlobReferences(self, hashes, cursor):
     """Reads blob references of a given set of hashes."""
     query = ("SELECT hash_id, blob_references FROM hash_blob_references WHERE "
@@ -43,7 +43,7 @@ class MySQLDBClientReportsMixin(object):
 
     cursor.execute(query, args)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadAllClientGraphSeries(
       self,
       client_label,
@@ -77,7 +77,7 @@ class MySQLDBClientReportsMixin(object):
       results[timestamp] = series
     return results
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadMostRecentClientGraphSeries(
       self,
       client_label,
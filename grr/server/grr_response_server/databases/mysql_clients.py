@@ -32,6 +32,24 @@ from grr_response_server.rdfvalues import objects as rdf_objects
 class MySQLDBClientMixin(object):
   """MySQLDataStore mixin for client related functions."""
 
+  # Tables holding client data that can grow large. Their rows are deleted in
+  # chunks before the clients themselves, so that the cascading delete of a
+  # client doesn't have to remove a huge number of rows in a single
+  # transaction. Tables are listed before the tables they refer to (path
+  # entries before client_paths), so that deleting a chunk only cascades to
+  # rows that are already gone. Partitioned tables (client_stats) have no
+  # foreign keys, so their rows are only ever deleted here.
+  _CLIENT_TABLES_DELETED_IN_CHUNKS = [
+      "flow_results",
+      "flow_log_entries",
+      "flow_output_plugin_log_entries",
+      "flow_responses",
+      "client_stats",
+      "client_path_stat_entries",
+      "client_path_hash_entries",
+      "client_paths",
+  ]
+
   @mysql_utils.WithTransaction()
   def WriteClientMetadata(self,
                           client_id,
@@ -87,7 +105,7 @@ class MySQLDBClientMixin(object):
 
     cursor.execute(query, values)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def MultiReadClientMetadata(self, client_ids, cursor=None):
     """Reads ClientMetadata records for a list of clients."""
     ids = [db_utils.ClientIDToInt(client_id) for client_id in client_ids]
@@ -169,7 +187,7 @@ class MySQLDBClientMixin(object):
     finally:
       snapshot.startup_info = startup_info
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def MultiReadClientSnapshot(self, client_ids, cursor=None):
     """Reads the latest client snapshots for a list of clients."""
     int_ids = [db_utils.ClientIDToInt(cid) for cid in client_ids]
@@ -328,7 +346,7 @@ class MySQLDBClientMixin(object):
     except MySQLdb.IntegrityError as e:
       raise db.UnknownClientError(client_id, cause=e)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadClientStartupInfo(self, client_id, cursor=None):
     """Reads the latest client startup record for a single client."""
     query = (
@@ -612,7 +630,7 @@ class MySQLDBClientMixin(object):
     except MySQLdb.IntegrityError as e:
       raise db.UnknownClientError(client_id, cause=e)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def MultiReadClientLabels(self, client_ids, cursor=None):
     """Reads the user labels for a list of clients."""
 
@@ -700,7 +718,7 @@ class MySQLDBClientMixin(object):
     res.timestamp = mysql_utils.TimestampToRDFDatetime(timestamp)
     return res
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadClientCrashInfoHistory(self, client_id, cursor=None):
     """Reads the full crash history for a particular client."""
     cursor.execute(
@@ -739,7 +757,7 @@ class MySQLDBClientMixin(object):
       else:
         raise
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadClientStats(self,
                       client_id,
                       min_timestamp,
@@ -763,6 +781,38 @@ class MySQLDBClientMixin(object):
         for stats_bytes, in cursor.fetchall()
     ]
 
+  # DeleteClients does not use a single transaction, since deleting all the
+  # data of many clients can take a long time. Instead, it uses multiple
+  # transactions internally.
+  def DeleteClients(self, client_ids):
+    """Deletes clients with all associated metadata."""
+    client_id_ints = [db_utils.ClientIDToInt(c) for c in client_ids]
+    if not client_id_ints:
+      return
+
+    for table in self._CLIENT_TABLES_DELETED_IN_CHUNKS:
+      while True:
+        deleted_count = self._DeleteClientRows(
+            table, client_id_ints, limit=self._DELETE_ROWS_BATCH_SIZE)
+        if deleted_count < self._DELETE_ROWS_BATCH_SIZE:
+          break
+
+    # All the remaining client data is removed by ON DELETE CASCADE.
+    self._DeleteClientRows("clients", client_id_ints)
+
+  @mysql_utils.WithTransaction()
+  def _DeleteClientRows(self, table, client_id_ints, limit=None, cursor=None):
+    """Deletes (up to `limit`) rows of given clients from a given table."""
+    query = "DELETE FROM {} WHERE client_id IN {}".format(
+        table, mysql_utils.Placeholders(len(client_id_ints)))
+    args = list(client_id_ints)
+    if limit is not None:
+      query += " LIMIT %s"
+      args.append(limit)
+
+    cursor.execute(query, args)
+    return cursor.rowcount
+
   # DeleteOldClientStats does not use a single transaction, since it runs for
   # a long time. Instead, it uses multiple transactions internally.
   def DeleteOldClientStats(self, yield_after_count,
@@ -770,6 +820,12 @@ class MySQLDBClientMixin(object):
                           ):
     """Deletes ClientStats older than a given timestamp."""
 
+    # Partitions holding only expired stats are dropped as a whole. Remaining
+    # expired stats are in the partition the retention time falls into.
+    dropped_count = self._DropPartitionsBefore("client_stats", retention_time)
+    if dropped_count > 0:
+      yield dropped_count
+
     while True:
       deleted_count = self._DeleteClientStats(
           limit=yield_after_count, retention_time=retention_time)
@@ -795,19 +851,19 @@ class MySQLDBClientMixin(object):
         [mysql_utils.RDFDatetimeToTimestamp(retention_time), limit])
     return cursor.rowcount
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountClientVersionStringsByLabel(self, day_buckets, cursor):
     """Computes client-activity stats for all GRR versions in the DB."""
     return self._CountClientStatisticByLabel("last_version_string", day_buckets,
                                              cursor)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountClientPlatformsByLabel(self, day_buckets, cursor):
     """Computes client-activity stats for all client platforms in the DB."""
     return self._CountClientStatisticByLabel("last_platform", day_buckets,
                                              cursor)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountClientPlatformReleasesByLabel(self, day_buckets, cursor):
     """Computes client-activity stats for OS-release strings in the DB."""
     return self._CountClientStatisticByLabel("last_platform_release",
@@ -18,7 +18,7 @@ def _AuditEntryFromRow(details, timestamp):
 class MySQLDBEventMixin(object):
   """MySQLDB mixin for event handling."""
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadAPIAuditEntries(self,
                           username=None,
                           router_method_names=None,
@@ -67,7 +67,7 @@ class MySQLDBEventMixin(object):
         for details, timestamp in cursor.fetchall()
     ]
 
-  @mysql_utils.WithTransaction()
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountAPIAuditEntriesByUserAndDay(self,
                                        min_timestamp=None,
                                        max_timestamp=None,
@@ -5,18 +5,21 @@ from __future__ import division
 
 from __future__ import unicode_literals
 
+import hashlib
 import logging
 import threading
 import time
 
 from future.utils import iteritems
 import MySQLdb
+from MySQLdb.constants import ER as mysql_error_constants
 from typing import List, Optional, Text
 
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import flows as rdf_flows
+from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
 from grr_response_core.lib.util import collection
 from grr_response_core.lib.util import compatibility
 from grr_response_server.databases import db
@@ -26,6 +29,34 @@ from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
 
+_RESULTS_INDEX_HINT = (
+    "FORCE INDEX (flow_results_by_client_id_flow_id_timestamp) ")
+_RESULTS_NO_TEXT_INDEX_HINT = (
+    "FORCE INDEX (flow_results_by_client_id_flow_id_payload_text) ")
+
+# Flow versions never repeat, even when a flow is deleted and created again
+# with the same id: a new version is at least the current time in
+# microseconds (and always greater than the previous version of the flow).
+_NOW_MICROS = "CAST(UNIX_TIMESTAMP(NOW(6)) * 1000000 AS UNSIGNED)"
+_NEXT_VERSION = "GREATEST(version + 1, {})".format(_NOW_MICROS)
+
+
+def _SerializeFlow(flow_obj):
+  """Serializes a flow into values of the flow and persistent_data columns."""
+  if not flow_obj.HasField("persistent_data"):
+    return flow_obj.SerializeToString(), None
+
+  clone = flow_obj.Copy()
+  persistent_data = clone.persistent_data.SerializeToString()
+  clone.persistent_data = None
+  return clone.SerializeToString(), persistent_data
+
+
+def _PersistentDataDigest(persistent_data):
+  if persistent_data is None:
+    return None
+  return hashlib.sha256(persistent_data).digest()
+
 
 class MySQLDBFlowMixin(object):
   """MySQLDB mixin for flow handling."""
@@ -45,7 +76,7 @@ class MySQLDBFlowMixin(object):
     query += ",".join(value_templates)
     cursor.execute(query, args)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadMessageHandlerRequests(self, cursor=None):
     """Reads all message handler requests from the database."""
 
@@ -146,7 +177,7 @@ class MySQLDBFlowMixin(object):
 
     return res
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadAllClientActionRequests(self, client_id, cursor=None):
     """Reads all client messages available for a given client_id."""
 
@@ -267,72 +298,162 @@ class MySQLDBFlowMixin(object):
   @mysql_utils.WithTransaction()
   def WriteFlowObject(self, flow_obj, cursor=None):
     """Writes a flow object to the database."""
+    try:
+      self._WriteFlowObjects([flow_obj], cursor)
+    except MySQLdb.IntegrityError as e:
+      raise db.UnknownClientError(flow_obj.client_id, cause=e)
+
+  @mysql_utils.WithTransaction()
+  def WriteFlowObjects(self, flow_objs, allow_update=True, cursor=None):
+    """Writes multiple flow objects to the database."""
+    for batch in collection.Batch(flow_objs, self._WRITE_ROWS_BATCH_SIZE):
+      try:
+        self._WriteFlowObjects(batch, cursor, allow_update=allow_update)
+      except MySQLdb.IntegrityError as e:
+        if e.args[0] == mysql_error_constants.DUP_ENTRY:
+          client_id, flow_id = self._FindDuplicatedFlow(batch, cursor)
+          raise db.DuplicatedFlowError(client_id, flow_id, cause=e)
+
+        client_ids = sorted(set(flow_obj.client_id for flow_obj in batch))
+        raise db.AtLeastOneUnknownClientError(client_ids, cause=e)
 
+  def _FindDuplicatedFlow(self, flow_objs, cursor):
+    """Finds a flow that made inserting the given flows fail.
+
+    Args:
+      flow_objs: Flow objects that failed to be inserted.
+      cursor: MySQL cursor to use.
+
+    Returns:
+      A tuple of the client id and the flow id of a flow that either is already
+      in the database or occurs among the given flows more than once.
+    """
+    keys = [(flow_obj.client_id, flow_obj.flow_id) for flow_obj in flow_objs]
+
+    conditions = []
+    args = []
+    for client_id, flow_id in keys:
+      conditions.append("(client_id=%s AND flow_id=%s)")
+      args.append(db_utils.ClientIDToInt(client_id))
+      args.append(db_utils.FlowIDToInt(flow_id))
+
+    # A locking read sees flows committed by concurrent transactions after the
+    # snapshot of this one was taken.
+    query = ("SELECT client_id, flow_id FROM flows WHERE {} LIMIT 1 "
+             "LOCK IN SHARE MODE").format(" OR ".join(conditions))
+    cursor.execute(query, args)
+
+    row = cursor.fetchone()
+    if row is not None:
+      client_id_int, flow_id_int = row
+      return (db_utils.IntToClientID(client_id_int),
+              db_utils.IntToFlowID(flow_id_int))
+
+    seen = set()
+    for key in keys:
+      if key in seen:
+        return key
+      seen.add(key)
+
+    return keys[0]
+
+  def _WriteFlowObjects(self, flow_objs, cursor, allow_update=True):
+    """Writes flow objects to the database using a single query.
+
+    Args:
+      flow_objs: Flow objects to write.
+      cursor: MySQL cursor to use.
+      allow_update: If False, the query fails with a DUP_ENTRY error instead of
+        overwriting flows that already exist.
+    """
     query = """
     INSERT INTO flows (client_id, flow_id, long_flow_id, parent_flow_id,
-                       parent_hunt_id, flow, flow_state,
+                       parent_hunt_id, flow, persistent_data, flow_state,
                        next_request_to_process, pending_termination, timestamp,
                        network_bytes_sent, user_cpu_time_used_micros,
-                       system_cpu_time_used_micros, num_replies_sent, last_update)
-    VALUES (%(client_id)s, %(flow_id)s, %(long_flow_id)s, %(parent_flow_id)s,
-            %(parent_hunt_id)s, %(flow)s, %(flow_state)s,
-            %(next_request_to_process)s, %(pending_termination)s,
-            FROM_UNIXTIME(%(timestamp)s),
-            %(network_bytes_sent)s, %(user_cpu_time_used_micros)s,
-            %(system_cpu_time_used_micros)s, %(num_replies_sent)s, NOW(6))
+                       system_cpu_time_used_micros, num_replies_sent,
+                       last_update, version)
+    VALUES {}
+    """
+    if allow_update:
+      query += """
     ON DUPLICATE KEY UPDATE
         flow=VALUES(flow),
+        persistent_data=VALUES(persistent_data),
         flow_state=VALUES(flow_state),
         next_request_to_process=VALUES(next_request_to_process),
-        last_update=VALUES(last_update)
-    """
+        last_update=VALUES(last_update),
+        version=""" + _NEXT_VERSION
 
-    user_cpu_time_used_micros = db_utils.SecondsToMicros(
-        flow_obj.cpu_time_used.user_cpu_time)
-    system_cpu_time_used_micros = db_utils.SecondsToMicros(
-        flow_obj.cpu_time_used.system_cpu_time)
+    templates = []
+    args = []
+    for flow_obj in flow_objs:
+      templates.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
+                       "FROM_UNIXTIME(%s), %s, %s, %s, %s, NOW(6), " +
+                       _NOW_MICROS + ")")
 
-    args = {
-        "client_id": db_utils.ClientIDToInt(flow_obj.client_id),
-        "flow_id": db_utils.FlowIDToInt(flow_obj.flow_id),
-        "long_flow_id": flow_obj.long_flow_id,
-        "flow": flow_obj.SerializeToString(),
-        "flow_state": int(flow_obj.flow_state),
-        "next_request_to_process": flow_obj.next_request_to_process,
-        "timestamp": mysql_utils.RDFDatetimeToTimestamp(flow_obj.create_time),
-        "network_bytes_sent": flow_obj.network_bytes_sent,
-        "num_replies_sent": flow_obj.num_replies_sent,
-        "user_cpu_time_used_micros": user_cpu_time_used_micros,
-        "system_cpu_time_used_micros": system_cpu_time_used_micros,
-    }
+      if flow_obj.parent_flow_id:
+        parent_flow_id = db_utils.FlowIDToInt(flow_obj.parent_flow_id)
+      else:
+        parent_flow_id = None
 
-    if flow_obj.parent_flow_id:
-      args["parent_flow_id"] = db_utils.FlowIDToInt(flow_obj.parent_flow_id)
-    else:
-      args["parent_flow_id"] = None
+      if flow_obj.parent_hunt_id:
+        parent_hunt_id = db_utils.HuntIDToInt(flow_obj.parent_hunt_id)
+      else:
+        parent_hunt_id = None
 
-    if flow_obj.parent_hunt_id:
-      args["parent_hunt_id"] = db_utils.HuntIDToInt(flow_obj.parent_hunt_id)
-    else:
-      args["parent_hunt_id"] = None
+      if flow_obj.HasField("pending_termination"):
+        pending_termination = flow_obj.pending_termination.SerializeToString()
+      else:
+        pending_termination = None
 
-    if flow_obj.HasField("pending_termination"):
-      serialized_termination = flow_obj.pending_termination.SerializeToString()
-      args["pending_termination"] = serialized_termination
-    else:
-      args["pending_termination"] = None
+      serialized_flow, persistent_data = _SerializeFlow(flow_obj)
 
-    try:
-      cursor.execute(query, args)
-    except MySQLdb.IntegrityError as e:
-      raise db.UnknownClientError(flow_obj.client_id, cause=e)
+      args.extend([
+          db_utils.ClientIDToInt(flow_obj.client_id),
+          db_utils.FlowIDToInt(flow_obj.flow_id),
+          flow_obj.long_flow_id,
+          parent_flow_id,
+          parent_hunt_id,
+          serialized_flow,
+          persistent_data,
+          int(flow_obj.flow_state),
+          flow_obj.next_request_to_process,
+          pending_termination,
+          mysql_utils.RDFDatetimeToTimestamp(flow_obj.create_time),
+          flow_obj.network_bytes_sent,
+          db_utils.SecondsToMicros(flow_obj.cpu_time_used.user_cpu_time),
+          db_utils.SecondsToMicros(flow_obj.cpu_time_used.system_cpu_time),
+          flow_obj.num_replies_sent,
+      ])
+
+    cursor.execute(query.format(", ".join(templates)), args)
+
+  def _FlowObjectFromRow(self, row, cached_flow=None):
+    """Generates a flow object from a database row.
 
-  def _FlowObjectFromRow(self, row):
-    """Generates a flow object from a database row."""
+    Args:
+      row: A row of FLOW_DB_FIELDS values.
+      cached_flow: An up-to-date flow object to use instead of parsing the
+        flow and persistent_data columns when these are NULL.
 
-    flow, fs, cci, pt, nr, pd, po, ps, uct, sct, nbs, nrs, ts, lut = row
+    Returns:
+      An rdf_flow_objects.Flow object.
+    """
+
+    (flow, data, fs, cci, pt, nr, pd, po, ps, uct, sct, nbs, nrs, ts,
+     lut) = row
+
+    if flow is None and cached_flow is not None:
+      flow_obj = cached_flow
+    else:
+      flow_obj = rdf_flow_objects.Flow.FromSerializedString(flow)
+      # Flows written before persistent data got its own column have it
+      # stored in the flow column.
+      if data is not None:
+        flow_obj.persistent_data = (
+            rdf_protodict.AttributedDict.FromSerializedString(data))
 
-    flow_obj = rdf_flow_objects.Flow.FromSerializedString(flow)
     if fs not in [None, rdf_flow_objects.Flow.FlowState.UNSET]:
       flow_obj.flow_state = fs
     if cci is not None:
@@ -359,22 +480,23 @@ class MySQLDBFlowMixin(object):
 
     return flow_obj
 
-  FLOW_DB_FIELDS = ("flow, "
-                    "flow_state, "
-                    "client_crash_info, "
-                    "pending_termination, "
-                    "next_request_to_process, "
-                    "UNIX_TIMESTAMP(processing_deadline), "
-                    "processing_on, "
-                    "UNIX_TIMESTAMP(processing_since), "
-                    "user_cpu_time_used_micros, "
-                    "system_cpu_time_used_micros, "
-                    "network_bytes_sent, "
-                    "num_replies_sent, "
-                    "UNIX_TIMESTAMP(timestamp), "
-                    "UNIX_TIMESTAMP(last_update) ")
-
-  @mysql_utils.WithTransaction(readonly=True)
+  _FLOW_DB_METADATA_FIELDS = ("flow_state, "
+                              "client_crash_info, "
+                              "pending_termination, "
+                              "next_request_to_process, "
+                              "UNIX_TIMESTAMP(processing_deadline), "
+                              "processing_on, "
+                              "UNIX_TIMESTAMP(processing_since), "
+                              "user_cpu_time_used_micros, "
+                              "system_cpu_time_used_micros, "
+                              "network_bytes_sent, "
+                              "num_replies_sent, "
+                              "UNIX_TIMESTAMP(timestamp), "
+                              "UNIX_TIMESTAMP(last_update) ")
+
+  FLOW_DB_FIELDS = "flow, persistent_data, " + _FLOW_DB_METADATA_FIELDS
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadFlowObject(self, client_id, flow_id, cursor=None):
     """Reads a flow object from the database."""
     query = ("SELECT " + self.FLOW_DB_FIELDS +
@@ -438,20 +560,37 @@ class MySQLDBFlowMixin(object):
                              client_id,
                              flow_id,
                              processing_time,
+                             flow_cache=None,
                              cursor=None):
     """Marks a flow as being processed on this worker and returns it."""
-    query = ("SELECT " + self.FLOW_DB_FIELDS +
+    cached_flow, cached_version, persistent_data_digest = None, None, None
+    if flow_cache is not None:
+      cached = flow_cache.Pop(client_id, flow_id)
+      if cached is not None and cached[1] is not None:
+        cached_flow, cached_version, persistent_data_digest = cached
+
+    # Large flow blobs are only transferred and parsed if the cached flow is
+    # out of date.
+    query = ("SELECT version, "
+             "IF(version = %s, NULL, flow), "
+             "IF(version = %s, NULL, persistent_data), " +
+             self._FLOW_DB_METADATA_FIELDS +
              "FROM flows WHERE client_id=%s AND flow_id=%s")
-    cursor.execute(
-        query,
-        [db_utils.ClientIDToInt(client_id),
-         db_utils.FlowIDToInt(flow_id)])
+    cursor.execute(query, [
+        cached_version, cached_version,
+        db_utils.ClientIDToInt(client_id),
+        db_utils.FlowIDToInt(flow_id)
+    ])
     response = cursor.fetchall()
     if not response:
       raise db.UnknownFlowError(client_id, flow_id)
 
     row, = response
-    rdf_flow = self._FlowObjectFromRow(row)
+    version, row = row[0], row[1:]
+    if version != cached_version:
+      cached_flow = None
+      persistent_data_digest = _PersistentDataDigest(row[1])
+    rdf_flow = self._FlowObjectFromRow(row, cached_flow=cached_flow)
 
     now = rdfvalue.RDFDatetime.Now()
     if rdf_flow.processing_on and rdf_flow.processing_deadline > now:
@@ -475,6 +614,7 @@ class MySQLDBFlowMixin(object):
                                                hunt_state)
 
     update_query = ("UPDATE flows SET "
+                    "version=" + _NEXT_VERSION + ", "
                     "processing_on=%s, "
                     "processing_since=FROM_UNIXTIME(%s), "
                     "processing_deadline=FROM_UNIXTIME(%s) "
@@ -495,6 +635,9 @@ class MySQLDBFlowMixin(object):
     rdf_flow.processing_on = process_id_string
     rdf_flow.processing_since = now
     rdf_flow.processing_deadline = processing_deadline
+
+    if flow_cache is not None:
+      flow_cache.Put(rdf_flow, None, persistent_data_digest)
     return rdf_flow
 
   @mysql_utils.WithTransaction()
@@ -513,8 +656,11 @@ class MySQLDBFlowMixin(object):
     updates = []
     args = []
     if flow_obj != db.Database.unchanged:
+      serialized_flow, persistent_data = _SerializeFlow(flow_obj)
       updates.append("flow=%s")
-      args.append(flow_obj.SerializeToString())
+      args.append(serialized_flow)
+      updates.append("persistent_data=%s")
+      args.append(persistent_data)
       updates.append("flow_state=%s")
       args.append(int(flow_obj.flow_state))
       updates.append("user_cpu_time_used_micros=%s")
@@ -550,7 +696,8 @@ class MySQLDBFlowMixin(object):
     if not updates:
       return
 
-    query = "UPDATE flows SET last_update=NOW(6), "
+    query = ("UPDATE flows SET last_update=NOW(6), version=" + _NEXT_VERSION +
+             ", ")
     query += ", ".join(updates)
     query += " WHERE client_id=%s AND flow_id=%s"
 
@@ -571,7 +718,8 @@ class MySQLDBFlowMixin(object):
       return
 
     serialized_termination = pending_termination.SerializeToString()
-    query = "UPDATE flows SET pending_termination=%s WHERE "
+    query = ("UPDATE flows SET pending_termination=%s, version=" +
+             _NEXT_VERSION + " WHERE ")
     args = [serialized_termination]
     for index, (client_id, flow_id) in enumerate(client_id_flow_id_pairs):
       query += ("" if index == 0 else " OR ") + " client_id=%s AND flow_id=%s"
@@ -904,13 +1052,17 @@ class MySQLDBFlowMixin(object):
       return
 
     for batch in collection.Batch(responses, self._WRITE_ROWS_BATCH_SIZE):
+      self._WriteFlowResponsesBatch(batch)
 
-      self._WriteFlowResponsesAndExpectedUpdates(batch)
+  def _WriteFlowResponsesBatch(self, responses, cursor=None):
+    """Writes a batch of FlowMessages and updates corresponding requests."""
+    self._WriteFlowResponsesAndExpectedUpdates(responses, cursor=cursor)
 
-      completed_requests = self._UpdateRequestsAndScheduleFPRs(batch)
+    completed_requests = self._UpdateRequestsAndScheduleFPRs(
+        responses, cursor=cursor)
 
-      if completed_requests:
-        self._DeleteClientActionRequest(completed_requests)
+    if completed_requests:
+      self._DeleteClientActionRequest(completed_requests, cursor=cursor)
 
   @mysql_utils.WithTransaction()
   def DeleteFlowRequests(self, requests, cursor=None):
@@ -937,6 +1089,40 @@ class MySQLDBFlowMixin(object):
       cursor.execute(res_query, args)
       cursor.execute(req_query, args)
 
+  @mysql_utils.WithTransaction()
+  def FlushFlowUpdates(self,
+                       flow_requests=None,
+                       flow_responses=None,
+                       client_action_requests=None,
+                       completed_requests=None,
+                       flow_results=None,
+                       flow_to_release=None,
+                       flow_cache=None,
+                       cursor=None):
+    """Writes all updates produced by a step of flow processing at once."""
+    # All the calls below share the cursor and hence the transaction.
+    if flow_requests:
+      self.WriteFlowRequests(flow_requests, cursor=cursor)
+
+    if flow_responses:
+      for batch in collection.Batch(flow_responses,
+                                    self._WRITE_ROWS_BATCH_SIZE):
+        self._WriteFlowResponsesBatch(batch, cursor=cursor)
+
+    if client_action_requests:
+      self.WriteClientActionRequests(client_action_requests, cursor=cursor)
+
+    if completed_requests:
+      self.DeleteFlowRequests(completed_requests, cursor=cursor)
+
+    if flow_results:
+      self.WriteFlowResults(flow_results, cursor=cursor)
+
+    if flow_to_release is None:
+      return True
+    return self.ReleaseProcessedFlow(
+        flow_to_release, flow_cache=flow_cache, cursor=cursor)
+
   @mysql_utils.WithTransaction(readonly=True)
   def ReadAllFlowRequestsAndResponses(self, client_id, flow_id, cursor=None):
     """Reads all requests and responses for a given flow from the database."""
@@ -1037,7 +1223,7 @@ class MySQLDBFlowMixin(object):
     return res
 
   @mysql_utils.WithTransaction()
-  def ReleaseProcessedFlow(self, flow_obj, cursor=None):
+  def ReleaseProcessedFlow(self, flow_obj, flow_cache=None, cursor=None):
     """Releases a flow that the worker was processing to the database."""
 
     update_query = """
@@ -1056,6 +1242,7 @@ class MySQLDBFlowMixin(object):
       flows.flow_id = needs_processing.flow_id
     SET
       flows.flow = %(flow)s,
+      {persistent_data_update}
       flows.processing_on = NULL,
       flows.processing_since = NULL,
       flows.processing_deadline = NULL,
@@ -1065,7 +1252,8 @@ class MySQLDBFlowMixin(object):
       flows.system_cpu_time_used_micros = %(system_cpu_time_used_micros)s,
       flows.network_bytes_sent = %(network_bytes_sent)s,
       flows.num_replies_sent = %(num_replies_sent)s,
-      flows.last_update = NOW(6)
+      flows.last_update = NOW(6),
+      flows.version = {next_version}
     WHERE
       flows.client_id = %(client_id)s AND
       flows.flow_id = %(flow_id)s AND (
@@ -1073,15 +1261,33 @@ class MySQLDBFlowMixin(object):
         needs_processing.needs_processing IS NULL)
     """
 
+    # The digest of the persistent data stored when the flow was leased.
+    stored_digest = None
+    cached = None
+    if flow_cache is not None:
+      cached = flow_cache.Pop(flow_obj.client_id, flow_obj.flow_id)
+      if cached is not None and cached[0] is flow_obj:
+        stored_digest = cached[2]
+
     clone = flow_obj.Copy()
     clone.processing_on = None
     clone.processing_since = None
     clone.processing_deadline = None
+    serialized_flow, persistent_data = _SerializeFlow(clone)
+
+    # Persistent data is often big and does not change in every step of
+    # processing, so it is only written if it differs from the stored one.
+    digest = _PersistentDataDigest(persistent_data)
+    if digest is not None and digest == stored_digest:
+      persistent_data_update = ""
+    else:
+      persistent_data_update = "flows.persistent_data = %(persistent_data)s,"
+
     args = {
         "client_id":
             db_utils.ClientIDToInt(flow_obj.client_id),
         "flow":
-            clone.SerializeToString(),
+            serialized_flow,
         "flow_id":
             db_utils.FlowIDToInt(flow_obj.flow_id),
         "flow_state":
@@ -1092,20 +1298,45 @@ class MySQLDBFlowMixin(object):
             flow_obj.next_request_to_process,
         "num_replies_sent":
             flow_obj.num_replies_sent,
+        "persistent_data":
+            persistent_data,
         "system_cpu_time_used_micros":
             db_utils.SecondsToMicros(flow_obj.cpu_time_used.system_cpu_time),
         "user_cpu_time_used_micros":
             db_utils.SecondsToMicros(flow_obj.cpu_time_used.user_cpu_time),
     }
-    rows_updated = cursor.execute(update_query, args)
-    return rows_updated == 1
+    rows_updated = cursor.execute(
+        update_query.format(
+            persistent_data_update=persistent_data_update,
+            next_version=_NEXT_VERSION), args)
+    released = rows_updated == 1
+
+    if flow_cache is not None:
+      if released:
+        cursor.execute(
+            "SELECT version FROM flows WHERE client_id=%s AND flow_id=%s", [
+                db_utils.ClientIDToInt(flow_obj.client_id),
+                db_utils.FlowIDToInt(flow_obj.flow_id)
+            ])
+        [(version,)] = cursor.fetchall()
+
+        # The cached object has to match the stored flow.
+        flow_obj.processing_on = None
+        flow_obj.processing_since = None
+        flow_obj.processing_deadline = None
+        flow_cache.Put(flow_obj, version, digest)
+      elif cached is not None:
+        # The flow is still leased and nothing was written.
+        flow_cache.Put(*cached)
+
+    return released
 
   @mysql_utils.WithTransaction()
   def WriteFlowProcessingRequests(self, requests, cursor=None):
     """Writes a list of flow processing requests to the database."""
     self._WriteFlowProcessingRequests(requests, cursor)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadFlowProcessingRequests(self, cursor=None):
     """Reads all flow processing requests from the database."""
     query = ("SELECT request, UNIX_TIMESTAMP(timestamp) "
@@ -1245,13 +1476,14 @@ class MySQLDBFlowMixin(object):
   def WriteFlowResults(self, results, cursor=None):
     """Writes flow results for a given flow."""
     query = ("INSERT INTO flow_results "
-             "(client_id, flow_id, hunt_id, timestamp, payload, type, tag) "
+             "(client_id, flow_id, hunt_id, timestamp, payload, payload_text, "
+             "type, tag) "
              "VALUES ")
     templates = []
 
     args = []
     for r in results:
-      templates.append("(%s, %s, %s, FROM_UNIXTIME(%s), %s, %s, %s)")
+      templates.append("(%s, %s, %s, FROM_UNIXTIME(%s), %s, %s, %s, %s)")
       args.append(db_utils.ClientIDToInt(r.client_id))
       args.append(db_utils.FlowIDToInt(r.flow_id))
       if r.hunt_id:
@@ -1261,6 +1493,7 @@ class MySQLDBFlowMixin(object):
       args.append(
           mysql_utils.RDFDatetimeToTimestamp(rdfvalue.RDFDatetime.Now()))
       args.append(r.payload.SerializeToString())
+      args.append(mysql_utils.ExtractPayloadText(r.payload))
       args.append(compatibility.GetName(r.payload.__class__))
       args.append(r.tag)
 
@@ -1272,7 +1505,7 @@ class MySQLDBFlowMixin(object):
       raise db.AtLeastOneUnknownFlowError(
           [(r.client_id, r.flow_id) for r in results], cause=e)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadFlowResults(self,
                       client_id,
                       flow_id,
@@ -1284,25 +1517,26 @@ class MySQLDBFlowMixin(object):
                       cursor=None):
     """Reads flow results of a given flow using given query options."""
 
-    query = ("SELECT payload, type, UNIX_TIMESTAMP(timestamp), tag "
-             "FROM flow_results "
-             "FORCE INDEX (flow_results_by_client_id_flow_id_timestamp) "
-             "WHERE client_id = %s AND flow_id = %s ")
+    conditions = "WHERE client_id = %s AND flow_id = %s "
     args = [db_utils.ClientIDToInt(client_id), db_utils.FlowIDToInt(flow_id)]
 
     if with_tag is not None:
-      query += "AND tag = %s "
+      conditions += "AND tag = %s "
       args.append(with_tag)
 
     if with_type is not None:
-      query += "AND type = %s "
+      conditions += "AND type = %s "
       args.append(with_type)
 
-    if with_substring is not None:
-      query += "AND payload LIKE %s "
-      args.append("%{}%".format(with_substring))
+    source, args = mysql_utils.ResultsSource(
+        conditions,
+        args,
+        _RESULTS_INDEX_HINT,
+        _RESULTS_NO_TEXT_INDEX_HINT,
+        substring=with_substring)
 
-    query += "ORDER BY timestamp ASC LIMIT %s OFFSET %s"
+    query = ("SELECT payload, type, UNIX_TIMESTAMP(timestamp), tag "
+             "FROM " + source + "ORDER BY timestamp ASC LIMIT %s OFFSET %s")
     args.append(count)
     args.append(offset)
 
@@ -1310,13 +1544,8 @@ class MySQLDBFlowMixin(object):
 
     ret = []
     for serialized_payload, payload_type, ts, tag in cursor.fetchall():
-      if payload_type in rdfvalue.RDFValue.classes:
-        payload = rdfvalue.RDFValue.classes[payload_type]()
-        payload.ParseFromString(serialized_payload)
-      else:
-        payload = rdf_objects.SerializedValueOfUnrecognizedType(
-            type_name=payload_type, value=serialized_payload)
-
+      payload = mysql_utils.DeserializeResultPayload(payload_type,
+                                                     serialized_payload)
       timestamp = mysql_utils.TimestampToRDFDatetime(ts)
       result = rdf_flow_objects.FlowResult(payload=payload, timestamp=timestamp)
       if tag:
@@ -1326,7 +1555,107 @@ class MySQLDBFlowMixin(object):
 
     return ret
 
-  @mysql_utils.WithTransaction(readonly=True)
+  def IterateFlowResults(self,
+                         client_id,
+                         flow_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=db.RESULTS_BATCH_SIZE):
+    """Yields all flow results of a given flow matching given query options."""
+    last_position = None
+
+    while True:
+      last_position, results = self._ReadFlowResultsAfter(
+          client_id,
+          flow_id,
+          last_position,
+          batch_size,
+          with_tag=with_tag,
+          with_type=with_type,
+          with_substring=with_substring)
+      for result in results:
+        yield result
+      if len(results) < batch_size:
+        break
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
+  def _ReadFlowResultsAfter(self,
+                            client_id,
+                            flow_id,
+                            last_position,
+                            count,
+                            with_tag=None,
+                            with_type=None,
+                            with_substring=None,
+                            cursor=None):
+    """Reads flow results following a given (timestamp, result_id) position.
+
+    Args:
+      client_id: The client id on which this flow is running.
+      flow_id: The id of the flow to read results for.
+      last_position: A (timestamp, result_id) tuple of the last result read so
+        far (as returned by a previous call) or None to start from the
+        beginning.
+      count: Maximum number of results to read.
+      with_tag: See db.Database.IterateFlowResults.
+      with_type: See db.Database.IterateFlowResults.
+      with_substring: See db.Database.IterateFlowResults.
+      cursor: MySQL cursor provided by WithTransaction.
+
+    Returns:
+      A tuple of the position of the last read result (or last_position if
+      nothing was read) and a list of FlowResult values.
+    """
+    conditions = "WHERE client_id = %s AND flow_id = %s "
+    args = [db_utils.ClientIDToInt(client_id), db_utils.FlowIDToInt(flow_id)]
+
+    if last_position is not None:
+      # Timestamps are passed back in the form MySQL returned them in, so that
+      # no precision is lost when comparing them.
+      last_timestamp, last_result_id = last_position
+      conditions += ("AND (timestamp > FROM_UNIXTIME(%s) OR "
+                     "(timestamp = FROM_UNIXTIME(%s) AND result_id > %s)) ")
+      args.extend([last_timestamp, last_timestamp, last_result_id])
+
+    if with_tag is not None:
+      conditions += "AND tag = %s "
+      args.append(with_tag)
+
+    if with_type is not None:
+      conditions += "AND type = %s "
+      args.append(with_type)
+
+    source, args = mysql_utils.ResultsSource(
+        conditions,
+        args,
+        _RESULTS_INDEX_HINT,
+        _RESULTS_NO_TEXT_INDEX_HINT,
+        substring=with_substring)
+
+    query = ("SELECT result_id, payload, type, UNIX_TIMESTAMP(timestamp), tag "
+             "FROM " + source +
+             "ORDER BY timestamp ASC, result_id ASC LIMIT %s")
+    args.append(count)
+
+    cursor.execute(query, args)
+
+    ret = []
+    for result_id, serialized_payload, payload_type, ts, tag in (
+        cursor.fetchall()):
+      payload = mysql_utils.DeserializeResultPayload(payload_type,
+                                                     serialized_payload)
+      timestamp = mysql_utils.TimestampToRDFDatetime(ts)
+      result = rdf_flow_objects.FlowResult(payload=payload, timestamp=timestamp)
+      if tag:
+        result.tag = tag
+
+      ret.append(result)
+      last_position = (ts, result_id)
+
+    return last_position, ret
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def CountFlowResults(self,
                        client_id,
                        flow_id,
@@ -1390,7 +1719,7 @@ class MySQLDBFlowMixin(object):
       raise db.AtLeastOneUnknownFlowError(
           [(entry.client_id, entry.flow_id) for entry in entries], cause=e)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadFlowLogEntries(self,
                          client_id,
                          flow_id,
@@ -1425,7 +1754,7 @@ class MySQLDBFlowMixin(object):
 
     return ret
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountFlowLogEntries(self, client_id, flow_id, cursor=None):
     """Returns number of flow log entries of a given flow."""
 
@@ -1467,7 +1796,7 @@ class MySQLDBFlowMixin(object):
       raise db.AtLeastOneUnknownFlowError(
           [(entry.client_id, entry.flow_id) for entry in entries], cause=e)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadFlowOutputPluginLogEntries(self,
                                      client_id,
                                      flow_id,
@@ -1510,7 +1839,7 @@ class MySQLDBFlowMixin(object):
 
     return ret
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountFlowOutputPluginLogEntries(self,
                                       client_id,
                                       flow_id,
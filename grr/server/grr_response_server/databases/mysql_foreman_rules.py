@@ -30,7 +30,7 @@ class MySQLDBForemanRulesMixin(object):
     query = "DELETE FROM foreman_rules WHERE hunt_id=%s"
     cursor.execute(query, [hunt_id])
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadAllForemanRules(self, cursor=None):
     cursor.execute("SELECT rule FROM foreman_rules")
     res = []
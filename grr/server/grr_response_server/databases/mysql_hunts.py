@@ -16,7 +16,6 @@ from grr_response_server.databases import mysql_utils
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import flow_runner as rdf_flow_runner
 from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
-from grr_response_server.rdfvalues import objects as rdf_objects
 from grr_response_server.rdfvalues import output_plugin as rdf_output_plugin
 
 _HUNT_COLUMNS_SELECT = ", ".join((
@@ -41,6 +40,8 @@ _HUNT_OUTPUT_PLUGINS_STATES_COLUMNS = (
     "plugin_state",
 )
 
+_RESULTS_NO_TEXT_INDEX_HINT = "FORCE INDEX (flow_results_hunt_id_payload_text) "
+
 
 class MySQLDBHuntMixin(object):
   """MySQLDB mixin for flow handling."""
@@ -253,7 +254,7 @@ class MySQLDBHuntMixin(object):
     cursor.execute(query, args)
     return [self._HuntObjectFromRow(row) for row in cursor.fetchall()]
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ListHuntObjects(self,
                       offset,
                       count,
@@ -429,7 +430,7 @@ class MySQLDBHuntMixin(object):
     cursor.execute(query, args)
     return state
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadHuntLogEntries(self,
                          hunt_id,
                          offset,
@@ -469,7 +470,7 @@ class MySQLDBHuntMixin(object):
 
     return flow_log_entries
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountHuntLogEntries(self, hunt_id, cursor=None):
     """Returns number of hunt log entries of a given hunt."""
     hunt_id_int = db_utils.HuntIDToInt(hunt_id)
@@ -480,7 +481,7 @@ class MySQLDBHuntMixin(object):
     cursor.execute(query, [hunt_id_int])
     return cursor.fetchone()[0]
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadHuntResults(self,
                       hunt_id,
                       offset,
@@ -493,31 +494,32 @@ class MySQLDBHuntMixin(object):
     """Reads hunt results of a given hunt using given query options."""
     hunt_id_int = db_utils.HuntIDToInt(hunt_id)
 
-    query = ("SELECT client_id, flow_id, hunt_id, payload, type, "
-             "UNIX_TIMESTAMP(timestamp), tag "
-             "FROM flow_results "
-             "FORCE INDEX(flow_results_hunt_id_flow_id_timestamp) "
-             "WHERE hunt_id = %s ")
-
+    index_hint = "FORCE INDEX(flow_results_hunt_id_flow_id_timestamp) "
+    conditions = "WHERE hunt_id = %s "
     args = [hunt_id_int]
 
     if with_tag:
-      query += "AND tag = %s "
+      conditions += "AND tag = %s "
       args.append(with_tag)
 
     if with_type:
-      query += "AND type = %s "
+      conditions += "AND type = %s "
       args.append(with_type)
 
-    if with_substring:
-      query += "AND payload LIKE %s "
-      args.append("%" + db_utils.EscapeWildcards(with_substring) + "%")
-
     if with_timestamp:
-      query += "AND timestamp = FROM_UNIXTIME(%s) "
+      conditions += "AND timestamp = FROM_UNIXTIME(%s) "
       args.append(mysql_utils.RDFDatetimeToTimestamp(with_timestamp))
 
-    query += "ORDER BY timestamp ASC LIMIT %s OFFSET %s"
+    source, args = mysql_utils.ResultsSource(
+        conditions,
+        args,
+        index_hint,
+        _RESULTS_NO_TEXT_INDEX_HINT,
+        substring=with_substring or None)
+
+    query = ("SELECT client_id, flow_id, hunt_id, payload, type, "
+             "UNIX_TIMESTAMP(timestamp), tag "
+             "FROM " + source + "ORDER BY timestamp ASC LIMIT %s OFFSET %s")
     args.append(count)
     args.append(offset)
 
@@ -533,13 +535,8 @@ class MySQLDBHuntMixin(object):
         timestamp,
         tag,
     ) in cursor.fetchall():
-      if payload_type in rdfvalue.RDFValue.classes:
-        payload = rdfvalue.RDFValue.classes[payload_type]()
-        payload.ParseFromString(serialized_payload)
-      else:
-        payload = rdf_objects.SerializedValueOfUnrecognizedType(
-            type_name=payload_type, value=serialized_payload)
-
+      payload = mysql_utils.DeserializeResultPayload(payload_type,
+                                                     serialized_payload)
       result = rdf_flow_objects.FlowResult(
           client_id=db_utils.IntToClientID(client_id_int),
           flow_id=db_utils.IntToFlowID(flow_id_int),
@@ -553,7 +550,116 @@ class MySQLDBHuntMixin(object):
 
     return ret
 
-  @mysql_utils.WithTransaction(readonly=True)
+  def IterateHuntResults(self,
+                         hunt_id,
+                         with_tag=None,
+                         with_type=None,
+                         with_substring=None,
+                         batch_size=db.RESULTS_BATCH_SIZE):
+    """Yields all hunt results of a given hunt matching given query options."""
+    last_position = None
+
+    while True:
+      last_position, results = self._ReadHuntResultsAfter(
+          hunt_id,
+          last_position,
+          batch_size,
+          with_tag=with_tag,
+          with_type=with_type,
+          with_substring=with_substring)
+      for result in results:
+        yield result
+      if len(results) < batch_size:
+        break
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
+  def _ReadHuntResultsAfter(self,
+                            hunt_id,
+                            last_position,
+                            count,
+                            with_tag=None,
+                            with_type=None,
+                            with_substring=None,
+                            cursor=None):
+    """Reads hunt results following a given (timestamp, result_id) position.
+
+    Args:
+      hunt_id: The id of the hunt to read results for.
+      last_position: A (timestamp, result_id) tuple of the last result read so
+        far (as returned by a previous call) or None to start from the
+        beginning.
+      count: Maximum number of results to read.
+      with_tag: See db.Database.IterateHuntResults.
+      with_type: See db.Database.IterateHuntResults.
+      with_substring: See db.Database.IterateHuntResults.
+      cursor: MySQL cursor provided by WithTransaction.
+
+    Returns:
+      A tuple of the position of the last read result (or last_position if
+      nothing was read) and a list of FlowResult values.
+    """
+    index_hint = "FORCE INDEX(flow_results_hunt_id_timestamp) "
+    conditions = "WHERE hunt_id = %s "
+    args = [db_utils.HuntIDToInt(hunt_id)]
+
+    if last_position is not None:
+      # Timestamps are passed back in the form MySQL returned them in, so that
+      # no precision is lost when comparing them.
+      last_timestamp, last_result_id = last_position
+      conditions += ("AND (timestamp > FROM_UNIXTIME(%s) OR "
+                     "(timestamp = FROM_UNIXTIME(%s) AND result_id > %s)) ")
+      args.extend([last_timestamp, last_timestamp, last_result_id])
+
+    if with_tag:
+      conditions += "AND tag = %s "
+      args.append(with_tag)
+
+    if with_type:
+      conditions += "AND type = %s "
+      args.append(with_type)
+
+    source, args = mysql_utils.ResultsSource(
+        conditions,
+        args,
+        index_hint,
+        _RESULTS_NO_TEXT_INDEX_HINT,
+        substring=with_substring or None)
+
+    query = ("SELECT result_id, client_id, flow_id, payload, type, "
+             "UNIX_TIMESTAMP(timestamp), tag "
+             "FROM " + source +
+             "ORDER BY timestamp ASC, result_id ASC LIMIT %s")
+    args.append(count)
+
+    cursor.execute(query, args)
+
+    ret = []
+    for (
+        result_id,
+        client_id_int,
+        flow_id_int,
+        serialized_payload,
+        payload_type,
+        timestamp,
+        tag,
+    ) in cursor.fetchall():
+      payload = mysql_utils.DeserializeResultPayload(payload_type,
+                                                     serialized_payload)
+      result = rdf_flow_objects.FlowResult(
+          client_id=db_utils.IntToClientID(client_id_int),
+          flow_id=db_utils.IntToFlowID(flow_id_int),
+          hunt_id=hunt_id,
+          payload=payload,
+          timestamp=mysql_utils.TimestampToRDFDatetime(timestamp))
+      if tag is not None:
+        result.tag = tag
+
+      ret.append(result)
+      last_position = (timestamp, result_id)
+
+    return last_position, ret
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def CountHuntResults(self,
                        hunt_id,
                        with_tag=None,
@@ -733,7 +839,7 @@ class MySQLDBHuntMixin(object):
 
     return ", ".join(result)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadHuntClientResourcesStats(self, hunt_id, cursor=None):
     """Read/calculate hunt client resources stats."""
     hunt_id_int = db_utils.HuntIDToInt(hunt_id)
@@ -840,7 +946,7 @@ class MySQLDBHuntMixin(object):
 
     return stats
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadHuntFlowsStatesAndTimestamps(self, hunt_id, cursor=None):
     """Reads hunt flows states and timestamps."""
 
@@ -864,7 +970,38 @@ class MySQLDBHuntMixin(object):
 
     return result
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
+  def ReadHuntFlowsCompletionHistogram(self, hunt_id, cursor=None):
+    """Counts hunt flows started and completed within every second."""
+    hunt_id_int = db_utils.HuntIDToInt(hunt_id)
+
+    query = """
+      SELECT FLOOR(UNIX_TIMESTAMP(timestamp)) AS t, COUNT(*)
+      FROM flows
+      FORCE INDEX(flows_by_hunt)
+      WHERE parent_hunt_id = %s AND parent_flow_id IS NULL
+      GROUP BY t
+    """
+    cursor.execute(query, [hunt_id_int])
+    started = {int(t): count for t, count in cursor.fetchall()}
+
+    query = """
+      SELECT FLOOR(UNIX_TIMESTAMP(last_update)) AS t, COUNT(*)
+      FROM flows
+      FORCE INDEX(flows_by_hunt)
+      WHERE parent_hunt_id = %s AND parent_flow_id IS NULL
+        AND (flow_state IS NULL OR flow_state != %s)
+      GROUP BY t
+    """
+    cursor.execute(
+        query,
+        [hunt_id_int, int(rdf_flow_objects.Flow.FlowState.RUNNING)])
+    completed = {int(t): count for t, count in cursor.fetchall()}
+
+    return db.HuntFlowsCompletionHistogram(
+        started=started, completed=completed)
+
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadHuntOutputPluginLogEntries(self,
                                      hunt_id,
                                      output_plugin_id,
@@ -908,7 +1045,7 @@ class MySQLDBHuntMixin(object):
 
     return ret
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountHuntOutputPluginLogEntries(self,
                                       hunt_id,
                                       output_plugin_id,
@@ -0,0 +1,4 @@
+-- Allows paging through hunt results in timestamp order without sorting all
+-- results of the hunt. The primary key (result_id) is implicitly appended.
+CREATE INDEX flow_results_hunt_id_timestamp
+    ON flow_results(hunt_id, timestamp);
@@ -0,0 +1,9 @@
+-- Text extracted from the string fields of result payloads, used for
+-- substring searches over results. A binary collation keeps the search
+-- case-sensitive, like the search over serialized payloads.
+ALTER TABLE flow_results
+    ADD COLUMN payload_text MEDIUMTEXT
+        CHARACTER SET utf8mb4 COLLATE utf8mb4_bin;
+
+CREATE FULLTEXT INDEX flow_results_payload_text
+    ON flow_results(payload_text) WITH PARSER ngram;
@@ -0,0 +1,38 @@
+-- Range-partitions client stats by time, so that retention drops whole
+-- partitions instead of deleting rows one by one. Partitions for time buckets
+-- are split off the catch-all p_future partition ahead of time by the
+-- PartitionMaintenanceCronJob.
+--
+-- Partitioned InnoDB tables can not have foreign keys, so client stats of
+-- deleted clients are removed explicitly by DeleteClients.
+ALTER TABLE client_stats DROP FOREIGN KEY client_stats_ibfk_1;
+
+-- Stats written before the current (UTC) day go into p_history and daily
+-- partitions are created for the following week, so that p_future starts
+-- empty. Splitting new partitions off p_future is only cheap while it holds
+-- no rows. Partition definitions have to be literals, hence the prepared
+-- statement.
+SET @day = 24 * 60 * 60;
+SET @today = UNIX_TIMESTAMP() DIV @day * @day;
+
+SELECT CONCAT(
+    'ALTER TABLE client_stats ',
+    'PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (',
+    'PARTITION p_history VALUES LESS THAN (', @today, '), ',
+    GROUP_CONCAT(
+        'PARTITION p',
+        DATE_FORMAT(
+            DATE_ADD('1970-01-01', INTERVAL @today DIV @day + n DAY),
+            '%Y%m%d'),
+        ' VALUES LESS THAN (', @today + (n + 1) * @day, ')'
+        ORDER BY n SEPARATOR ', '),
+    ', PARTITION p_future VALUES LESS THAN MAXVALUE)')
+INTO @partition_query
+FROM (
+    SELECT 0 AS n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3
+    UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7
+) AS days;
+
+PREPARE partition_statement FROM @partition_query;
+EXECUTE partition_statement;
+DEALLOCATE PREPARE partition_statement;
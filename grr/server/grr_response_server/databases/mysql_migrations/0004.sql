@@ -0,0 +1,10 @@
+-- Every write to a flow increments its version, so that workers can tell
+-- whether a flow object they cached is still up to date.
+--
+-- Persistent data of flows is stored separately from the rest of the flow, so
+-- that it is only rewritten when it changes. Flows written before this
+-- migration keep their persistent data in the flow column until they are
+-- written again.
+ALTER TABLE flows
+    ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD COLUMN persistent_data MEDIUMBLOB;
@@ -0,0 +1,9 @@
+-- Results written before the 0002.sql migration have no extracted text, so
+-- substring searches look them up separately from the FULLTEXT index lookup.
+-- These indexes keep that lookup from scanning all the results of a flow or a
+-- hunt. A one character prefix is enough to tell NULL values apart.
+CREATE INDEX flow_results_by_client_id_flow_id_payload_text
+    ON flow_results(client_id, flow_id, payload_text(1));
+
+CREATE INDEX flow_results_hunt_id_payload_text
+    ON flow_results(hunt_id, payload_text(1));
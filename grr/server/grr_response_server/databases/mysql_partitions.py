@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""The MySQL database methods for maintenance of time-partitioned tables."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import datetime
+
+from grr_response_core import config
+from grr_response_core.lib import rdfvalue
+from grr_response_server.databases import mysql_utils
+
+# Tables that are range-partitioned by time, see the 0003.sql migration. Every
+# table has a catch-all partition for rows newer than its last time bucket.
+PARTITIONED_TABLES = ["client_stats"]
+
+FUTURE_PARTITION = "p_future"
+
+_MAXVALUE = "MAXVALUE"
+
+
+def PartitionName(start):
+  """Returns a name of the partition of the bucket starting at `start`."""
+  date = datetime.datetime.utcfromtimestamp(start)
+  return "p{:04d}{:02d}{:02d}".format(date.year, date.month, date.day)
+
+
+def NewPartitionBoundaries(last_boundary, now, until, interval):
+  """Computes upper boundaries of partitions needed to store data until a time.
+
+  Args:
+    last_boundary: The upper boundary (in seconds since epoch) of the newest
+      bucketed partition or None if the table has no bucketed partitions yet.
+    now: Current time in seconds since epoch.
+    until: Time (in seconds since epoch) which has to fall into a bucketed
+      partition.
+    interval: Length of the bucket of a single partition in seconds.
+
+  Returns:
+    A sorted list of upper boundaries (in seconds since epoch) of partitions
+    to create.
+  """
+  if last_boundary is None:
+    # The 0003.sql migration creates the initial buckets, so this only happens
+    # when all of them got dropped by retention in the meantime.
+    last_boundary = now // interval * interval
+
+  boundaries = []
+  while last_boundary <= until:
+    last_boundary += interval
+    boundaries.append(last_boundary)
+  return boundaries
+
+
+def ReorganizeFuturePartitionQuery(table, boundaries, interval):
+  """Returns a query splitting new partitions off the catch-all partition."""
+  partitions = [
+      "PARTITION {} VALUES LESS THAN ({})".format(
+          PartitionName(boundary - interval), boundary)
+      for boundary in boundaries
+  ]
+  partitions.append("PARTITION {} VALUES LESS THAN ({})".format(
+      FUTURE_PARTITION, _MAXVALUE))
+
+  return "ALTER TABLE {} REORGANIZE PARTITION {} INTO ({})".format(
+      table, FUTURE_PARTITION, ", ".join(partitions))
+
+
+def _ReadPartitions(table, cursor):
+  """Reads bucketed partitions of the table.
+
+  Args:
+    table: A name of the table.
+    cursor: MySQL cursor to use.
+
+  Returns:
+    A list of (name, upper boundary in seconds since epoch) tuples sorted by
+    the boundary. The catch-all partition is omitted.
+  """
+  cursor.execute(
+      "SELECT partition_name, partition_description "
+      "FROM information_schema.partitions "
+      "WHERE table_schema = DATABASE() AND table_name = %s "
+      "AND partition_name IS NOT NULL "
+      "ORDER BY partition_ordinal_position", [table])
+
+  result = []
+  for name, description in cursor.fetchall():
+    if description != _MAXVALUE:
+      result.append((name, int(description)))
+  return result
+
+
+class MySQLDBPartitionsMixin(object):
+  """MySQLDataStore mixin for time-partitioned tables maintenance."""
+
+  def _PartitionInterval(self):
+    return config.CONFIG["Mysql.partition_interval_days"] * 24 * 60 * 60
+
+  @mysql_utils.WithTransaction()
+  def CreateTablePartitions(self, until, cursor=None):
+    """Creates partitions of time-partitioned tables up to a given time."""
+    interval = self._PartitionInterval()
+    now = rdfvalue.RDFDatetime.Now().AsSecondsSinceEpoch()
+    until = until.AsSecondsSinceEpoch()
+
+    created_count = 0
+    for table in PARTITIONED_TABLES:
+      partitions = _ReadPartitions(table, cursor)
+      last_boundary = partitions[-1][1] if partitions else None
+
+      boundaries = NewPartitionBoundaries(last_boundary, now, until, interval)
+      if not boundaries:
+        continue
+
+      # Reorganizing the catch-all partition is cheap as long as it is empty,
+      # i.e. as long as partitions are created ahead of time. The 0003.sql
+      # migration creates it empty.
+      cursor.execute(ReorganizeFuturePartitionQuery(table, boundaries,
+                                                    interval))
+      created_count += len(boundaries)
+
+    return created_count
+
+  @mysql_utils.WithTransaction()
+  def _DropPartitionsBefore(self, table, timestamp, cursor=None):
+    """Drops partitions of the table that hold only rows older than given time.
+
+    Args:
+      table: A name of a time-partitioned table.
+      timestamp: An RDFDatetime. Partitions with the upper boundary not after
+        this time are dropped.
+      cursor: MySQL cursor to use.
+
+    Returns:
+      The number of rows in the dropped partitions.
+    """
+    timestamp = timestamp.AsSecondsSinceEpoch()
+    names = [
+        name for name, boundary in _ReadPartitions(table, cursor)
+        if boundary <= timestamp
+    ]
+    if not names:
+      return 0
+
+    names = ", ".join(names)
+    cursor.execute("SELECT COUNT(*) FROM {} PARTITION ({})".format(
+        table, names))
+    [(row_count,)] = cursor.fetchall()
+
+    # Dropping a partition discards its data files instead of deleting rows
+    # one by one, which is fast and leaves no fragmentation behind.
+    cursor.execute("ALTER TABLE {} DROP PARTITION {}".format(table, names))
+    return row_count
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Tests for mysql_partitions.py."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from absl import app
+from absl.testing import absltest
+
+from grr_response_server.databases import mysql_partitions
+from grr.test_lib import test_lib
+
+_DAY = 24 * 60 * 60
+
+
+class PartitionNameTest(absltest.TestCase):
+
+  def testName(self):
+    # 2019-03-04 00:00:00 UTC.
+    self.assertEqual(mysql_partitions.PartitionName(1551657600), "p20190304")
+
+
+class NewPartitionBoundariesTest(absltest.TestCase):
+
+  def testFirstPartitionsStartAtCurrentBucket(self):
+    now = 10 * _DAY + 123
+    boundaries = mysql_partitions.NewPartitionBoundaries(
+        None, now, now + 2 * _DAY, _DAY)
+    self.assertEqual(boundaries, [11 * _DAY, 12 * _DAY, 13 * _DAY])
+
+  def testContinuesFromLastBoundary(self):
+    boundaries = mysql_partitions.NewPartitionBoundaries(
+        12 * _DAY, 10 * _DAY, 13 * _DAY + 1, _DAY)
+    self.assertEqual(boundaries, [13 * _DAY, 14 * _DAY])
+
+  def testNothingToCreate(self):
+    boundaries = mysql_partitions.NewPartitionBoundaries(
+        12 * _DAY, 10 * _DAY, 12 * _DAY - 1, _DAY)
+    self.assertEqual(boundaries, [])
+
+
+class ReorganizeFuturePartitionQueryTest(absltest.TestCase):
+
+  def testQuery(self):
+    query = mysql_partitions.ReorganizeFuturePartitionQuery(
+        "client_stats", [1551657600, 1551744000], _DAY)
+    self.assertEqual(
+        query, "ALTER TABLE client_stats REORGANIZE PARTITION p_future INTO ("
+        "PARTITION p20190303 VALUES LESS THAN (1551657600), "
+        "PARTITION p20190304 VALUES LESS THAN (1551744000), "
+        "PARTITION p_future VALUES LESS THAN (MAXVALUE))")
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
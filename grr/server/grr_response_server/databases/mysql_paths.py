@@ -18,10 +18,52 @@ from grr_response_server.databases import mysql_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
+def _PathInfoFromRow(path_type, row):
+  """Builds a path info from a row of a client_paths query joined with entries.
+
+  Args:
+    path_type: A type of the path.
+    row: A (path, directory, timestamp, stat_entry, last_stat_entry_timestamp,
+      hash_entry, last_hash_entry_timestamp) tuple. Timestamps are expected to
+      be returned by UNIX_TIMESTAMP.
+
+  Returns:
+    An `rdf_objects.PathInfo` instance.
+  """
+  # pyformat: disable
+  (path, directory, timestamp,
+   stat_entry_bytes, last_stat_entry_timestamp,
+   hash_entry_bytes, last_hash_entry_timestamp) = row
+  # pyformat: enable
+
+  components = mysql_utils.PathToComponents(path)
+
+  if stat_entry_bytes is not None:
+    stat_entry = rdf_client_fs.StatEntry.FromSerializedString(stat_entry_bytes)
+  else:
+    stat_entry = None
+
+  if hash_entry_bytes is not None:
+    hash_entry = rdf_crypto.Hash.FromSerializedString(hash_entry_bytes)
+  else:
+    hash_entry = None
+
+  datetime = mysql_utils.TimestampToRDFDatetime
+  return rdf_objects.PathInfo(
+      path_type=path_type,
+      components=components,
+      timestamp=datetime(timestamp),
+      last_stat_entry_timestamp=datetime(last_stat_entry_timestamp),
+      last_hash_entry_timestamp=datetime(last_hash_entry_timestamp),
+      directory=directory,
+      stat_entry=stat_entry,
+      hash_entry=hash_entry)
+
+
 class MySQLDBPathMixin(object):
   """MySQLDB mixin for path related functions."""
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadPathInfo(self,
                    client_id,
                    path_type,
@@ -111,7 +153,7 @@ class MySQLDBPathMixin(object):
         stat_entry=stat_entry,
         hash_entry=hash_entry)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadPathInfos(self, client_id, path_type, components_list, cursor=None):
     """Retrieves path info records for given paths."""
 
@@ -401,37 +443,7 @@ class MySQLDBPathMixin(object):
 
     cursor.execute(query, values)
     for row in cursor.fetchall():
-      # pyformat: disable
-      (path, directory, timestamp,
-       stat_entry_bytes, last_stat_entry_timestamp,
-       hash_entry_bytes, last_hash_entry_timestamp) = row
-      # pyformat: enable
-
-      components = mysql_utils.PathToComponents(path)
-
-      if stat_entry_bytes is not None:
-        stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
-            stat_entry_bytes)
-      else:
-        stat_entry = None
-
-      if hash_entry_bytes is not None:
-        hash_entry = rdf_crypto.Hash.FromSerializedString(hash_entry_bytes)
-      else:
-        hash_entry = None
-
-      datetime = mysql_utils.TimestampToRDFDatetime
-      path_info = rdf_objects.PathInfo(
-          path_type=path_type,
-          components=components,
-          timestamp=datetime(timestamp),
-          last_stat_entry_timestamp=datetime(last_stat_entry_timestamp),
-          last_hash_entry_timestamp=datetime(last_hash_entry_timestamp),
-          directory=directory,
-          stat_entry=stat_entry,
-          hash_entry=hash_entry)
-
-      path_infos.append(path_info)
+      path_infos.append(_PathInfoFromRow(path_type, row))
 
     path_infos.sort(key=lambda _: tuple(_.components))
 
@@ -459,6 +471,97 @@ class MySQLDBPathMixin(object):
     # again to conform to the interface.
     return list(reversed(explicit_path_infos))
 
+  def IterateDescendentPathInfos(self,
+                                 client_id,
+                                 path_type,
+                                 components,
+                                 batch_size=db.PATH_INFOS_BATCH_SIZE):
+    """Yields path info records that correspond to descendants of given path."""
+    last_path_id = None
+
+    while True:
+      last_path_id, path_infos = self._ReadDescendentPathInfosAfter(
+          client_id, path_type, components, last_path_id, batch_size)
+      for path_info in path_infos:
+        yield path_info
+      if len(path_infos) < batch_size:
+        break
+
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
+  def _ReadDescendentPathInfosAfter(self,
+                                    client_id,
+                                    path_type,
+                                    components,
+                                    last_path_id,
+                                    count,
+                                    cursor=None):
+    """Reads descendent path infos following a given path id.
+
+    Path infos are read in the order of path ids, i.e. in the order of the
+    primary key of the client_paths table.
+
+    Args:
+      client_id: An identifier string for a client.
+      path_type: A type of a path to retrieve path information for.
+      components: A tuple of path components of a path to retrieve descendent
+        path information for.
+      last_path_id: A path id (as bytes) of the last path info read so far (as
+        returned by a previous call) or None to start from the beginning.
+      count: Maximum number of path infos to read.
+      cursor: MySQL cursor provided by WithTransaction.
+
+    Returns:
+      A tuple of the path id of the last read path info (or last_path_id if
+      nothing was read) and a list of `rdf_objects.PathInfo` instances.
+    """
+    query = """
+    SELECT path, directory, UNIX_TIMESTAMP(p.timestamp),
+           stat_entry, UNIX_TIMESTAMP(last_stat_entry_timestamp),
+           hash_entry, UNIX_TIMESTAMP(last_hash_entry_timestamp),
+           p.path_id
+      FROM client_paths AS p
+      LEFT JOIN client_path_stat_entries AS s ON
+                (p.client_id = s.client_id AND
+                 p.path_type = s.path_type AND
+                 p.path_id = s.path_id AND
+                 p.last_stat_entry_timestamp = s.timestamp)
+      LEFT JOIN client_path_hash_entries AS h ON
+                (p.client_id = h.client_id AND
+                 p.path_type = h.path_type AND
+                 p.path_id = h.path_id AND
+                 p.last_hash_entry_timestamp = h.timestamp)
+     WHERE p.client_id = %(client_id)s
+       AND p.path_type = %(path_type)s
+       AND path LIKE concat(%(path)s, '/%%')
+    """
+    values = {
+        "client_id": db_utils.ClientIDToInt(client_id),
+        "path_type": int(path_type),
+        "path": db_utils.EscapeWildcards(
+            mysql_utils.ComponentsToPath(components)),
+        "count": count,
+    }
+
+    if last_path_id is not None:
+      query += """
+       AND p.path_id > %(last_path_id)s
+      """
+      values["last_path_id"] = last_path_id
+
+    query += """
+     ORDER BY p.path_id
+     LIMIT %(count)s
+    """
+
+    cursor.execute(query, values)
+
+    path_infos = []
+    for row in cursor.fetchall():
+      last_path_id = row[-1]
+      path_infos.append(_PathInfoFromRow(path_type, row[:-1]))
+
+    return last_path_id, path_infos
+
   @mysql_utils.WithTransaction(readonly=True)
   def ReadPathInfosHistories(self,
                              client_id,
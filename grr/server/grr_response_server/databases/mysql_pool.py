@@ -5,12 +5,62 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import logging
+import re
 import threading
+import time
 
+from future.builtins import range
 from future.utils import string_types
 
 import MySQLdb
 
+from grr_response_core.stats import stats_collector_instance
+
+# Maximum number of distinct queries whose fingerprints are cached.
+_MAX_FINGERPRINT_CACHE_SIZE = 1000
+# Maximum length of a query fingerprint (used as a metric field value).
+_MAX_FINGERPRINT_LENGTH = 256
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_PLACEHOLDER_RE = re.compile(r"%(?:\([^)]*\))?s")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST_RE = re.compile(r"\((?:\?\+?)\)(?:\s*,\s*\((?:\?\+?)\))+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_fingerprint_cache = {}
+
+
+def QueryFingerprint(query):
+  """Normalizes a query so that queries differing only in values are equal.
+
+  Literals and placeholders are replaced with '?', lists of values (as used in
+  IN clauses and multi-row INSERTs) are collapsed and whitespace is squeezed.
+
+  Args:
+    query: An SQL query template.
+
+  Returns:
+    A normalized form of the query suitable for use as a metric field value.
+  """
+  try:
+    return _fingerprint_cache[query]
+  except KeyError:
+    pass
+
+  fingerprint = _STRING_LITERAL_RE.sub("?", query)
+  fingerprint = _PLACEHOLDER_RE.sub("?", fingerprint)
+  fingerprint = _NUMBER_RE.sub("?", fingerprint)
+  fingerprint = _VALUE_LIST_RE.sub("?+", fingerprint)
+  fingerprint = _ROW_LIST_RE.sub("(?)+", fingerprint)
+  fingerprint = _WHITESPACE_RE.sub(" ", fingerprint).strip()
+  fingerprint = fingerprint[:_MAX_FINGERPRINT_LENGTH]
+
+  if len(_fingerprint_cache) >= _MAX_FINGERPRINT_CACHE_SIZE:
+    _fingerprint_cache.clear()
+  _fingerprint_cache[query] = fingerprint
+  return fingerprint
+
 
 class Error(Exception):
   pass
@@ -34,9 +84,24 @@ class Pool(object):
   Intends to be thread safe in that multiple connections can be requested and
   used by multiple threads without synchronization, but operations on each
   connection (and its associated cursors) are assumed to be serial.
+
+  Idle connections are closed once they have been idle for longer than
+  max_idle_time (while keeping at least min_size of them around) and are pinged
+  before reuse if they have been idle for longer than ping_after, so that
+  connections dropped by the server are not handed out.
+
+  The pool exports the time spent waiting for a connection, the number of
+  in-use and idle connections and the latency of every executed statement
+  (keyed by the query fingerprint) through the stats collector.
   """
 
-  def __init__(self, connect_func, max_size=10):
+  def __init__(self,
+               connect_func,
+               max_size=10,
+               min_size=0,
+               max_idle_time=None,
+               ping_after=None,
+               name="primary"):
     """Creates a ConnectionPool.
 
     Args:
@@ -44,12 +109,104 @@ class Pool(object):
        database, i.e. a MySQLdb.Connection. Should raise or block if the
        database is unavailable.
      max_size: The maximum number of simultaneous connections.
+     min_size: The number of connections opened by Warm() and never evicted
+       for being idle.
+     max_idle_time: Number of seconds after which an idle connection is
+       closed. None means idle connections are kept forever.
+     ping_after: Number of seconds of idleness after which a connection is
+       pinged before being reused. None disables pinging.
+     name: A name of the pool used in metrics.
     """
     self.connect_func = connect_func
     self.limiter = threading.BoundedSemaphore(max_size)
-    self.idle_conns = []  # Atomic access only!!
+    self.min_size = min_size
+    self.max_idle_time = max_idle_time
+    self.ping_after = ping_after
+    self.name = name
+    # Pairs of (connection, time it became idle), oldest first. Guarded by
+    # self._lock.
+    self.idle_conns = []
     self.closed = False
 
+    self._lock = threading.Lock()
+    self._in_use = 0
+
+  def _UpdateGauges(self):
+    stats = stats_collector_instance.Get()
+    stats.SetGaugeValue(
+        "mysql_pool_connections", self._in_use, fields=[self.name, "in_use"])
+    stats.SetGaugeValue(
+        "mysql_pool_connections",
+        len(self.idle_conns),
+        fields=[self.name, "idle"])
+
+  def _Evict(self, con, reason):
+    stats_collector_instance.Get().IncrementCounter(
+        "mysql_pool_evictions", fields=[self.name, reason])
+    try:
+      con.close()
+    except MySQLdb.Error:
+      pass
+
+  def _EvictStaleConnections(self, now):
+    """Closes connections that have been idle for too long."""
+    if self.max_idle_time is None:
+      return
+
+    stale = []
+    with self._lock:
+      while (len(self.idle_conns) > self.min_size and
+             now - self.idle_conns[0][1] > self.max_idle_time):
+        stale.append(self.idle_conns.pop(0)[0])
+
+    for con in stale:
+      self._Evict(con, "idle")
+
+  def _PopIdleConnection(self):
+    """Returns a live idle connection or None if there is none."""
+    while True:
+      now = time.time()
+      self._EvictStaleConnections(now)
+
+      with self._lock:
+        if not self.idle_conns:
+          return None
+        # Reuse the most recently used connection, so that the rarely used
+        # ones can expire.
+        con, idle_since = self.idle_conns.pop()
+
+      if self.ping_after is None or now - idle_since <= self.ping_after:
+        return con
+
+      try:
+        con.ping()
+        return con
+      except MySQLdb.Error as e:
+        logging.info("Discarding broken idle MySQL connection: %s", e)
+        self._Evict(con, "ping")
+
+  def _ReturnIdleConnection(self, con):
+    with self._lock:
+      self.idle_conns.append((con, time.time()))
+
+  def _ReleaseConnection(self):
+    with self._lock:
+      self._in_use -= 1
+    self.limiter.release()
+    self._UpdateGauges()
+
+  def Warm(self):
+    """Opens connections until there are at least min_size idle ones."""
+    new_conns = []
+    with self._lock:
+      missing = self.min_size - len(self.idle_conns) - self._in_use
+    for _ in range(missing):
+      new_conns.append(self.connect_func())
+
+    for con in new_conns:
+      self._ReturnIdleConnection(con)
+    self._UpdateGauges()
+
   def get(self, blocking=True):
     """Gets a connection.
 
@@ -70,25 +227,32 @@ class Pool(object):
     # NOTE: Once we acquire capacity from the semaphore, it is essential that we
     # return it eventually. On success, this responsibility is delegated to
     # _ConnectionProxy.
+    start_time = time.time()
     if not self.limiter.acquire(blocking=blocking):
       return None
-    c = None
-    # pop is atomic, but if we did a check first, it would not be atomic with
-    # the pop.
+    stats_collector_instance.Get().RecordEvent(
+        "mysql_pool_wait_time", time.time() - start_time, fields=[self.name])
+
     try:
-      c = self.idle_conns.pop()
-    except IndexError:
-      # Create a connection, release the pool allocation if it fails.
-      try:
+      c = self._PopIdleConnection()
+      if c is None:
         c = self.connect_func()
-      except Exception:
-        self.limiter.release()
-        raise
+    except Exception:
+      # Release the pool allocation if no connection could be obtained.
+      self.limiter.release()
+      raise
+
+    with self._lock:
+      self._in_use += 1
+    self._UpdateGauges()
     return _ConnectionProxy(self, c)
 
   def close(self):
     self.closed = True
-    for conn in self.idle_conns:
+    with self._lock:
+      idle_conns = self.idle_conns
+      self.idle_conns = []
+    for conn, _ in idle_conns:
       conn.close()
 
 
@@ -116,8 +280,7 @@ class _ConnectionProxy(object):
         if not self.errored and not self.pool.closed:
           try:
             self.con.rollback()
-            # append is atomic.
-            self.pool.idle_conns.append(self.con)
+            self.pool._ReturnIdleConnection(self.con)
           except Exception:
             # rollback raised and the connection didn't make it into the idle
             # list, so close it.
@@ -127,7 +290,7 @@ class _ConnectionProxy(object):
           self.con.close()
       finally:
         self.con = None
-        self.pool.limiter.release()
+        self.pool._ReleaseConnection()
 
   def commit(self):
     self.con.commit()
@@ -150,6 +313,17 @@ class _CursorProxy(object):
     self.con = con
     self.cursor = cursor
 
+  def _Timed(self, method, query, *args, **kwargs):
+    """Forwards a statement execution and records its latency."""
+    start_time = time.time()
+    try:
+      return self._forward(method, query, *args, **kwargs)
+    finally:
+      stats_collector_instance.Get().RecordEvent(
+          "mysql_query_latency",
+          time.time() - start_time,
+          fields=[self.con.pool.name, QueryFingerprint(query)])
+
   @property
   def description(self):
     return self.cursor.description
@@ -194,7 +368,7 @@ class _CursorProxy(object):
           "cursor.execute() can execute a single SQL statement only")
 
     try:
-      return self._forward(self.cursor.execute, query, args=args)
+      return self._Timed(self.cursor.execute, query, args=args)
     except Warning as e:
       # TODO: check if newer versions of mysqlclient report
       # integrity errors as MySQLdb.IntegrityError exceptions and
@@ -224,7 +398,7 @@ class _CursorProxy(object):
       raise
 
   def executemany(self, query, args):
-    return self._forward(self.cursor.executemany, query, args)
+    return self._Timed(self.cursor.executemany, query, args)
 
   def fetchone(self):
     return self._forward(self.cursor.fetchone)
@@ -10,7 +10,9 @@ from future import builtins
 import mock
 import MySQLdb
 
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server.databases import mysql_pool
+from grr.test_lib import stats_test_lib
 from grr.test_lib import test_lib
 
 
@@ -138,5 +140,140 @@ class TestPool(absltest.TestCase):
         self.assertLen(pool.idle_conns, 1)
 
 
+class TestPoolHealth(stats_test_lib.StatsTestMixin, absltest.TestCase):
+
+  def _Pool(self, **kwargs):
+    self.connections = []
+
+    def Connect():
+      self.connections.append(mock.MagicMock())
+      return self.connections[-1]
+
+    return mysql_pool.Pool(Connect, max_size=5, **kwargs)
+
+  def _GetGauge(self, name, state):
+    return stats_collector_instance.Get().GetMetricValue(
+        'mysql_pool_connections', fields=[name, state])
+
+  def testWarm(self):
+    pool = self._Pool(min_size=3)
+    pool.Warm()
+    self.assertLen(self.connections, 3)
+    self.assertLen(pool.idle_conns, 3)
+
+    # Warming up an already warm pool doesn't open new connections.
+    pool.Warm()
+    self.assertLen(self.connections, 3)
+
+  def testConnectionGauges(self):
+    pool = self._Pool(name='gauges')
+
+    con = pool.get()
+    self.assertEqual(self._GetGauge('gauges', 'in_use'), 1)
+    self.assertEqual(self._GetGauge('gauges', 'idle'), 0)
+
+    con.close()
+    self.assertEqual(self._GetGauge('gauges', 'in_use'), 0)
+    self.assertEqual(self._GetGauge('gauges', 'idle'), 1)
+
+  def testIdleConnectionIsEvicted(self):
+    pool = self._Pool(max_idle_time=60, name='idle')
+
+    with test_lib.FakeTime(1000):
+      pool.get().close()
+
+    with test_lib.FakeTime(1000 + 61):
+      with self.assertStatsCounterDelta(
+          1, 'mysql_pool_evictions', fields=['idle', 'idle']):
+        con = pool.get()
+
+    self.assertLen(self.connections, 2)
+    self.connections[0].close.assert_called_once()
+    con.close()
+
+  def testMinSizeConnectionsAreNotEvicted(self):
+    pool = self._Pool(min_size=1, max_idle_time=60)
+
+    with test_lib.FakeTime(1000):
+      pool.Warm()
+
+    with test_lib.FakeTime(1000 + 61):
+      pool.get().close()
+
+    self.assertLen(self.connections, 1)
+
+  def testIdleConnectionIsPingedBeforeReuse(self):
+    pool = self._Pool(ping_after=10)
+
+    with test_lib.FakeTime(1000):
+      pool.get().close()
+      pool.get().close()
+    self.connections[0].ping.assert_not_called()
+
+    with test_lib.FakeTime(1000 + 11):
+      pool.get().close()
+    self.connections[0].ping.assert_called_once()
+    self.assertLen(self.connections, 1)
+
+  def testBrokenIdleConnectionIsReplaced(self):
+    pool = self._Pool(ping_after=10, name='ping')
+
+    with test_lib.FakeTime(1000):
+      pool.get().close()
+    self.connections[0].ping.side_effect = MySQLdb.OperationalError(
+        2006, 'MySQL server has gone away')
+
+    with test_lib.FakeTime(1000 + 11):
+      with self.assertStatsCounterDelta(
+          1, 'mysql_pool_evictions', fields=['ping', 'ping']):
+        con = pool.get()
+
+    self.assertIs(con.con, self.connections[1])
+    con.close()
+
+  def testQueryLatencyIsRecorded(self):
+    pool = self._Pool()
+    con = pool.get()
+
+    query = 'SELECT foo FROM bar WHERE baz IN (%s, %s, %s)'
+    fingerprint = mysql_pool.QueryFingerprint(query)
+    stats = stats_collector_instance.Get()
+    count = stats.GetMetricValue(
+        'mysql_query_latency', fields=[pool.name, fingerprint]).count
+
+    con.cursor().execute(query, args=[1, 2, 3])
+    con.close()
+
+    self.assertEqual(
+        stats.GetMetricValue(
+            'mysql_query_latency', fields=[pool.name, fingerprint]).count,
+        count + 1)
+
+
+class QueryFingerprintTest(absltest.TestCase):
+
+  def testPlaceholdersAndLiterals(self):
+    self.assertEqual(
+        mysql_pool.QueryFingerprint(
+            "SELECT a FROM t1 WHERE b = %s AND c = 'x' AND d > 42"),
+        'SELECT a FROM t1 WHERE b = ? AND c = ? AND d > ?')
+
+  def testValueListsAreCollapsed(self):
+    self.assertEqual(
+        mysql_pool.QueryFingerprint('SELECT a FROM t WHERE b IN (%s, %s)'),
+        mysql_pool.QueryFingerprint('SELECT a FROM t WHERE b IN (%s,%s,%s)'))
+    self.assertEqual(
+        mysql_pool.QueryFingerprint(
+            'INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+        'INSERT INTO t (a, b) VALUES (?)+')
+
+  def testWhitespaceIsSqueezed(self):
+    self.assertEqual(
+        mysql_pool.QueryFingerprint("""
+            SELECT a
+              FROM t
+        """), 'SELECT a FROM t')
+
+
 if __name__ == '__main__':
   app.run(test_lib.main)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""Routing of read-only MySQL transactions to read replicas."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import contextlib
+import logging
+import threading
+import time
+
+from future.builtins import range
+import MySQLdb
+
+from grr_response_core.stats import stats_collector_instance
+
+# Names of the replication lag column in the replication status output. Newer
+# MySQL versions use the "source/replica" terminology.
+_LAG_COLUMNS = ["Seconds_Behind_Master", "Seconds_Behind_Source"]
+
+
+def ParseReplicaAddress(address, default_port=None):
+  """Parses a replica address of the form 'host' or 'host:port'.
+
+  Args:
+    address: A replica address to parse.
+    default_port: A port to use when the address does not specify one.
+
+  Returns:
+    A tuple of the host and the port.
+
+  Raises:
+    ValueError: If the address is invalid.
+  """
+  host, separator, port = address.strip().rpartition(":")
+  if not separator:
+    host, port = port, default_port
+  elif not port.isdigit():
+    raise ValueError("Invalid port in replica address: {}".format(address))
+  else:
+    port = int(port)
+
+  if not host:
+    raise ValueError("Invalid replica address: {}".format(address))
+
+  return host, port
+
+
+def _ReadReplicationLag(cursor):
+  """Returns the replication lag in seconds or None if replication is broken."""
+  cursor.execute("SHOW SLAVE STATUS")
+  row = cursor.fetchone()
+  if row is None:
+    # The server is not a replica at all.
+    return None
+
+  columns = [column[0] for column in cursor.description]
+  for column in _LAG_COLUMNS:
+    if column in columns:
+      value = row[columns.index(column)]
+      # The lag is NULL when replication threads are not running.
+      return None if value is None else int(value)
+
+  return None
+
+
+class Replica(object):
+  """A read replica of the database together with its health state.
+
+  Attributes:
+    name: A name of the replica used in logs and metrics.
+    pool: A connection pool of the replica.
+    healthy: Whether the replica can be used for read-only transactions. False
+      until the first health check succeeds.
+    lag: The last observed replication lag in seconds (if known).
+    last_check: Time of the last (possibly still running) health check (in
+      seconds since epoch).
+  """
+
+  def __init__(self, name, pool):
+    self.name = name
+    self.pool = pool
+    self.healthy = False
+    self.lag = None
+    self.last_check = None
+
+
+class ReplicaSet(object):
+  """A set of read replicas used for read-only transactions.
+
+  Replicas are picked in a round-robin fashion. Every replica has its
+  replication lag checked periodically and is skipped while the lag is unknown
+  or above the configured limit. Replicas that fail are skipped until the next
+  successful health check.
+
+  Health checks run outside of the lock of the set, so a slow or unreachable
+  replica only delays the caller that happens to check it. Other callers keep
+  using the last known health state of the replica meanwhile.
+  """
+
+  def __init__(self, replicas, max_lag, check_interval):
+    """Initializes the replica set.
+
+    Args:
+      replicas: A list of `Replica` instances.
+      max_lag: Maximum acceptable replication lag in seconds.
+      check_interval: Interval between health checks of a replica in seconds.
+    """
+    self.replicas = replicas
+    self.max_lag = max_lag
+    self.check_interval = check_interval
+
+    self._lock = threading.RLock()
+    self._next_index = 0
+
+  def __len__(self):
+    return len(self.replicas)
+
+  def _IsCheckDue(self, replica, now):
+    return (replica.last_check is None or
+            now - replica.last_check >= self.check_interval)
+
+  def CheckHealth(self, replica):
+    """Checks replication lag of the replica and updates its health state.
+
+    The check is a database round trip, so it must not be called while holding
+    the lock of the set.
+
+    Args:
+      replica: A `Replica` to check.
+    """
+    lag = None
+    try:
+      with contextlib.closing(replica.pool.get()) as connection:
+        with contextlib.closing(connection.cursor()) as cursor:
+          lag = _ReadReplicationLag(cursor)
+    except MySQLdb.Error as error:
+      logging.warning("Health check of MySQL replica %s failed: %s",
+                      replica.name, error)
+
+    healthy = lag is not None and lag <= self.max_lag
+    with self._lock:
+      if replica.healthy and not healthy:
+        logging.warning("MySQL replica %s is unhealthy (lag: %s).",
+                        replica.name, lag)
+
+      replica.lag = lag
+      replica.healthy = healthy
+      replica.last_check = time.time()
+
+    stats = stats_collector_instance.Get()
+    stats.SetGaugeValue(
+        "mysql_replica_lag", -1 if lag is None else lag, fields=[replica.name])
+    stats.SetGaugeValue(
+        "mysql_replica_healthy", int(healthy), fields=[replica.name])
+
+  def MarkFailed(self, replica):
+    """Marks the replica as unhealthy until its next health check."""
+    with self._lock:
+      replica.healthy = False
+      replica.last_check = time.time()
+
+    stats_collector_instance.Get().SetGaugeValue(
+        "mysql_replica_healthy", 0, fields=[replica.name])
+
+  def GetReplica(self):
+    """Returns the next healthy replica or None if there is none."""
+    for _ in range(len(self.replicas)):
+      with self._lock:
+        replica = self.replicas[self._next_index]
+        self._next_index = (self._next_index + 1) % len(self.replicas)
+
+        now = time.time()
+        check_due = self._IsCheckDue(replica, now)
+        if check_due:
+          # Claims the check, so that concurrent callers don't wait for it.
+          replica.last_check = now
+
+      if check_due:
+        self.CheckHealth(replica)
+
+      if replica.healthy:
+        return replica
+
+    return None
+
+  def Close(self):
+    for replica in self.replicas:
+      replica.pool.close()
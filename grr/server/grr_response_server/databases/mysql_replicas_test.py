@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""Tests for mysql_replicas.py."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import threading
+
+from absl import app
+from absl.testing import absltest
+import mock
+import MySQLdb
+
+from grr_response_server.databases import mysql
+from grr_response_server.databases import mysql_replicas
+from grr.test_lib import stats_test_lib
+from grr.test_lib import test_lib
+
+
+def _ReplicaPool(lag=0, error=None):
+  """Creates a mock connection pool of a replica with given lag."""
+  cursor = mock.MagicMock()
+  cursor.description = [("Slave_IO_State",), ("Seconds_Behind_Master",)]
+  cursor.fetchone.return_value = ("Waiting for master", lag)
+  if error is not None:
+    cursor.execute.side_effect = error
+
+  pool = mock.MagicMock()
+  pool.get.return_value.cursor.return_value = cursor
+  return pool
+
+
+def _ReplicaSet(*pools):
+  replicas = [
+      mysql_replicas.Replica("replica{}".format(i), pool)
+      for i, pool in enumerate(pools)
+  ]
+  return mysql_replicas.ReplicaSet(replicas, max_lag=10, check_interval=60)
+
+
+class ParseReplicaAddressTest(absltest.TestCase):
+
+  def testHostOnly(self):
+    self.assertEqual(
+        mysql_replicas.ParseReplicaAddress("db1", default_port=3306),
+        ("db1", 3306))
+
+  def testHostAndPort(self):
+    self.assertEqual(
+        mysql_replicas.ParseReplicaAddress(" db1:3307 ", default_port=3306),
+        ("db1", 3307))
+
+  def testInvalidPort(self):
+    with self.assertRaises(ValueError):
+      mysql_replicas.ParseReplicaAddress("db1:foo")
+
+  def testEmptyHost(self):
+    with self.assertRaises(ValueError):
+      mysql_replicas.ParseReplicaAddress(":3306")
+
+
+class ReplicaSetTest(absltest.TestCase):
+
+  def testRoundRobin(self):
+    replica_set = _ReplicaSet(_ReplicaPool(), _ReplicaPool())
+
+    names = [replica_set.GetReplica().name for _ in range(4)]
+    self.assertEqual(names, ["replica0", "replica1", "replica0", "replica1"])
+
+  def testLaggingReplicaIsSkipped(self):
+    replica_set = _ReplicaSet(_ReplicaPool(lag=100), _ReplicaPool(lag=5))
+
+    for _ in range(3):
+      self.assertEqual(replica_set.GetReplica().name, "replica1")
+    self.assertEqual(replica_set.replicas[0].lag, 100)
+
+  def testBrokenReplicationIsSkipped(self):
+    replica_set = _ReplicaSet(_ReplicaPool(lag=None))
+    self.assertIsNone(replica_set.GetReplica())
+
+  def testUnreachableReplicaIsSkipped(self):
+    error = MySQLdb.OperationalError(2003, "Can't connect to MySQL server")
+    replica_set = _ReplicaSet(_ReplicaPool(error=error))
+    self.assertIsNone(replica_set.GetReplica())
+
+  def testHealthIsCheckedPeriodically(self):
+    pool = _ReplicaPool()
+    replica_set = _ReplicaSet(pool)
+
+    with test_lib.FakeTime(1000):
+      replica_set.GetReplica()
+      replica_set.GetReplica()
+    self.assertEqual(pool.get.call_count, 1)
+
+    with test_lib.FakeTime(1000 + 60):
+      replica_set.GetReplica()
+    self.assertEqual(pool.get.call_count, 2)
+
+  def testFailedReplicaIsSkippedUntilNextCheck(self):
+    replica_set = _ReplicaSet(_ReplicaPool())
+
+    with test_lib.FakeTime(1000):
+      replica = replica_set.GetReplica()
+      replica_set.MarkFailed(replica)
+      self.assertIsNone(replica_set.GetReplica())
+
+    with test_lib.FakeTime(1000 + 60):
+      self.assertIs(replica_set.GetReplica(), replica)
+
+  def testSlowHealthCheckDoesNotBlockOtherCallers(self):
+    check_started = threading.Event()
+    check_unblocked = threading.Event()
+    check_finished = threading.Event()
+
+    slow_pool = _ReplicaPool()
+
+    def SlowGet():
+      check_started.set()
+      check_unblocked.wait(5)
+      check_finished.set()
+      return _ReplicaPool().get()
+
+    slow_pool.get.side_effect = SlowGet
+    replica_set = _ReplicaSet(slow_pool, _ReplicaPool())
+
+    thread = threading.Thread(target=replica_set.GetReplica)
+    thread.start()
+    try:
+      self.assertTrue(check_started.wait(10))
+      # The first replica is still being checked, so it is skipped.
+      self.assertEqual(replica_set.GetReplica().name, "replica1")
+      self.assertEqual(replica_set.GetReplica().name, "replica1")
+      self.assertFalse(check_finished.is_set())
+    finally:
+      check_unblocked.set()
+      thread.join()
+
+    self.assertTrue(replica_set.replicas[0].healthy)
+
+
+class RunInTransactionTest(stats_test_lib.StatsTestMixin, absltest.TestCase):
+
+  def _CreateDB(self, replica_set):
+    # The constructor connects to the database, so it is bypassed here.
+    db = mysql.MysqlDB.__new__(mysql.MysqlDB)
+    db.pool = mock.MagicMock()
+    db.replicas = replica_set
+    return db
+
+  def testReadonlyTransactionGoesToReplica(self):
+    replica_pool = _ReplicaPool()
+    db = self._CreateDB(_ReplicaSet(replica_pool))
+
+    with self.assertStatsCounterDelta(
+        1, "mysql_transactions", fields=["replica0"]):
+      db._RunInTransaction(
+          lambda connection: None, readonly=True, allow_replica=True)
+
+    db.pool.get.assert_not_called()
+
+  def testWriteTransactionGoesToPrimary(self):
+    replica_pool = _ReplicaPool()
+    db = self._CreateDB(_ReplicaSet(replica_pool))
+
+    with self.assertStatsCounterDelta(
+        1, "mysql_transactions", fields=["primary"]):
+      db._RunInTransaction(lambda connection: None)
+
+    replica_pool.get.assert_not_called()
+
+  def testReadonlyTransactionGoesToPrimaryByDefault(self):
+    replica_pool = _ReplicaPool()
+    db = self._CreateDB(_ReplicaSet(replica_pool))
+
+    db._RunInTransaction(lambda connection: None, readonly=True)
+
+    replica_pool.get.assert_not_called()
+    db.pool.get.assert_called_once()
+
+  def testFallbackToPrimaryWhenNoReplicaIsHealthy(self):
+    db = self._CreateDB(_ReplicaSet(_ReplicaPool(lag=100)))
+
+    with self.assertStatsCounterDelta(
+        1, "mysql_replica_fallbacks", fields=["unavailable"]):
+      db._RunInTransaction(
+          lambda connection: None, readonly=True, allow_replica=True)
+
+    db.pool.get.assert_called_once()
+
+  def testFallbackToPrimaryOnReplicaError(self):
+    replica_set = _ReplicaSet(_ReplicaPool())
+    db = self._CreateDB(replica_set)
+
+    def Function(connection):
+      if connection is not db.pool.get.return_value:
+        raise MySQLdb.OperationalError(2013, "Lost connection")
+      return 42
+
+    with self.assertStatsCounterDelta(
+        1, "mysql_replica_fallbacks", fields=["error"]):
+      self.assertEqual(
+          db._RunInTransaction(Function, readonly=True, allow_replica=True),
+          42)
+
+    self.assertFalse(replica_set.replicas[0].healthy)
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -102,7 +102,7 @@ class MySQLDBUsersMixin(object):
 
     return result
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadGRRUser(self, username, cursor=None):
     """Reads a user object corresponding to a given name."""
     cursor.execute(
@@ -115,7 +115,7 @@ class MySQLDBUsersMixin(object):
 
     return self._RowToGRRUser(row)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def ReadGRRUsers(self, offset=0, count=None, cursor=None):
     """Reads GRR users with optional pagination, sorted by username."""
     if count is None:
@@ -127,7 +127,7 @@ class MySQLDBUsersMixin(object):
         "LIMIT %s OFFSET %s", [count, offset])
     return [self._RowToGRRUser(row) for row in cursor.fetchall()]
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, allow_replica=True)
   def CountGRRUsers(self, cursor=None):
     """Returns the total count of GRR users."""
     cursor.execute("SELECT COUNT(*) FROM grr_users")
@@ -204,7 +204,7 @@ class MySQLDBUsersMixin(object):
         requestor_username, _ApprovalIDToInt(approval_id), grantor_username,
         cursor)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, single_statement=True)
   def ReadApprovalRequest(self, requestor_username, approval_id, cursor=None):
     """Reads an approval request object with a given id."""
 
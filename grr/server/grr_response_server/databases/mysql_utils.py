@@ -15,10 +15,13 @@ from typing import Optional
 from typing import Sequence
 from typing import Text
 
+from grr_response_core import config
 from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import structs as rdf_structs
 from grr_response_core.lib.util import compatibility
 from grr_response_core.lib.util import precondition
 from grr_response_server.databases import db_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
 
 
 def StringToRDFProto(proto_type, value):
@@ -141,6 +144,112 @@ def RDFDatetimeToTimestamp(datetime
     return "%.6f" % (datetime.AsMicrosecondsSinceEpoch() / 1000000)
 
 
+def DeserializeResultPayload(payload_type, serialized_payload):
+  """Deserializes a flow result payload stored with its type name."""
+  if payload_type in rdfvalue.RDFValue.classes:
+    payload = rdfvalue.RDFValue.classes[payload_type]()
+    payload.ParseFromString(serialized_payload)
+    return payload
+  else:
+    return rdf_objects.SerializedValueOfUnrecognizedType(
+        type_name=payload_type, value=serialized_payload)
+
+
+def _CollectStrings(value, strings):
+  """Appends all strings found in a given (possibly nested) value."""
+  if isinstance(value, rdf_structs.RDFProtoStruct):
+    for _, field_value in value.ListSetFields():
+      _CollectStrings(field_value, strings)
+  elif isinstance(value, (list, tuple, rdf_structs.RepeatedFieldHelper)):
+    for item in value:
+      _CollectStrings(item, strings)
+  elif isinstance(value, (rdfvalue.RDFString, rdfvalue.RDFURN)):
+    strings.append(str(value))
+  elif isinstance(value, Text):
+    strings.append(value)
+  elif isinstance(value, rdfvalue.RDFBytes):
+    _CollectStrings(value.SerializeToString(), strings)
+  elif isinstance(value, bytes):
+    # Undecodable bytes are replaced, so that no match spans over them.
+    strings.append(value.decode("utf-8", "replace"))
+
+
+def ExtractPayloadText(payload):
+  """Extracts the text searched by ResultsSource from a payload.
+
+  String and binary fields (including the ones of nested messages) are
+  extracted, so that searches find the same results as searches over the
+  serialized payloads do. Binary fields are decoded as UTF-8. Numbers and
+  enums are skipped.
+
+  Args:
+    payload: A flow result payload.
+
+  Returns:
+    Newline-separated values of all the string and binary fields of the
+    payload.
+  """
+  strings = []
+  _CollectStrings(payload, strings)
+  return "\n".join(strings)
+
+
+# Substrings shorter than this can't be looked up in the n-gram FULLTEXT index
+# of flow_results.payload_text (this is MySQL's default ngram_token_size).
+_MIN_INDEXED_SUBSTRING_LENGTH = 2
+
+
+def ResultsSource(conditions, args, index_hint, no_text_index_hint,
+                  substring=None):
+  """Builds the FROM and WHERE clauses of a query reading flow results.
+
+  If enabled in the config, results containing the substring are looked up in
+  the FULLTEXT index over the text extracted from their payloads (LIKE checks
+  the exact match). Results written before the payload_text column was
+  introduced have no extracted text: they are found with the index given by
+  no_text_index_hint and their serialized payloads are scanned. The two lookups
+  are combined with UNION ALL, so that each of them uses its own index.
+
+  If the text search is disabled, or if the substring is too short to be looked
+  up in the index, the serialized payloads of all the results are scanned.
+
+  Args:
+    conditions: A WHERE clause selecting the results to read.
+    args: A list of arguments of the conditions.
+    index_hint: An index hint to use when scanning the results.
+    no_text_index_hint: An index hint to use when looking up the results
+      without extracted text.
+    substring: An optional string the results have to contain.
+
+  Returns:
+    A tuple of the clauses to put after FROM, which select flow_results rows,
+    and a list of their arguments.
+  """
+  if substring is None:
+    return "flow_results " + index_hint + conditions, args
+
+  pattern = "%" + db_utils.EscapeWildcards(substring) + "%"
+
+  # Within a phrase, the only special character of the boolean mode is '"',
+  # so substrings containing it are not looked up in the index.
+  if (not config.CONFIG["Mysql.flow_results_text_search"] or
+      len(substring) < _MIN_INDEXED_SUBSTRING_LENGTH or '"' in substring):
+    return ("flow_results " + index_hint + conditions +
+            "AND payload LIKE %s ", args + [pattern])
+
+  phrase = '"{}"'.format(substring)
+  source = (
+      "(SELECT result_id FROM flow_results "
+      "FORCE INDEX (flow_results_payload_text) " + conditions +
+      "AND MATCH (payload_text) AGAINST (%s IN BOOLEAN MODE) "
+      "AND payload_text LIKE %s "
+      "UNION ALL "
+      "SELECT result_id FROM flow_results " + no_text_index_hint + conditions +
+      "AND payload_text IS NULL AND payload LIKE %s) AS matches "
+      "JOIN flow_results USING (result_id) ")
+  return source, args + [phrase, pattern] + args + [pattern]
+
+
 def ComponentsToPath(components):
   """Converts a list of path components to a canonical path representation.
 
@@ -200,17 +309,30 @@ class WithTransaction(object):
   process, the decorated function may be called again after a short delay.
   """
 
-  def __init__(self, readonly=False):
+  def __init__(self, readonly=False, allow_replica=False,
+               single_statement=False):
     """Constructs a decorator.
 
     Args:
       readonly: Whether the decorated function only requires a readonly
         transaction. Has no effect when a connection is provided.
+      allow_replica: Whether a readonly transaction may run on a read replica.
+        Replicas may lag behind the primary, so this should only be set by
+        functions whose results may be slightly stale, e.g. UI listings and
+        statistics. Anything that drives processing decisions has to read
+        from the primary.
+      single_statement: Whether the decorated function executes only a single
+        SQL statement. Such functions are run without an explicit transaction,
+        saving a database round trip.
     """
     self.readonly = readonly
+    self.allow_replica = allow_replica
+    self.single_statement = single_statement
 
   def __call__(self, func):
     readonly = self.readonly
+    allow_replica = self.allow_replica
+    single_statement = self.single_statement
 
     if compatibility.PY2:
       takes_args = inspect.getargspec(func).args
@@ -239,7 +361,11 @@ class WithTransaction(object):
           new_kw["connection"] = connection
           return func(self, *args, **new_kw)
 
-        return self._RunInTransaction(Closure, readonly)
+        return self._RunInTransaction(
+            Closure,
+            readonly=readonly,
+            allow_replica=allow_replica,
+            single_statement=single_statement)
 
       return Decorated
 
@@ -256,6 +382,10 @@ class WithTransaction(object):
           new_kw["cursor"] = cursor
           return func(self, *args, **new_kw)
 
-      return self._RunInTransaction(Closure, readonly)
+      return self._RunInTransaction(
+          Closure,
+          readonly=readonly,
+          allow_replica=allow_replica,
+          single_statement=single_statement)
 
     return db_utils.CallLoggedAndAccounted(Decorated)
@@ -6,7 +6,12 @@ from __future__ import unicode_literals
 
 from absl import app
 from absl.testing import absltest
+import mock
 
+from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
+from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr_response_server.databases import mysql
 from grr_response_server.databases import mysql_utils
 from grr.test_lib import test_lib
 
@@ -90,6 +95,152 @@ class ColumnsTest(absltest.TestCase):
     self.assertEqual(mysql_utils.Columns(["a", "a_hash"]), "(`a`, `a_hash`)")
 
 
+class _FakeDB(object):
+
+  def __init__(self):
+    self.transactions = []
+
+  def _RunInTransaction(self, function, **kwargs):
+    self.transactions.append(kwargs)
+    return function(mock.MagicMock())
+
+  @mysql_utils.WithTransaction()
+  def Write(self, cursor=None):
+    del cursor  # Unused.
+
+  @mysql_utils.WithTransaction(
+      readonly=True, allow_replica=True, single_statement=True)
+  def Read(self, cursor=None):
+    del cursor  # Unused.
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadOwnWrites(self, connection=None):
+    del connection  # Unused.
+
+
+class WithTransactionTest(absltest.TestCase):
+
+  def testDefaults(self):
+    db = _FakeDB()
+    db.Write()
+    self.assertEqual(db.transactions, [
+        dict(readonly=False, allow_replica=False, single_statement=False),
+    ])
+
+  def testOptions(self):
+    db = _FakeDB()
+    db.Read()
+    db.ReadOwnWrites()
+    self.assertEqual(db.transactions, [
+        dict(readonly=True, allow_replica=True, single_statement=True),
+        dict(readonly=True, allow_replica=False, single_statement=False),
+    ])
+
+  def testCursorPassedThrough(self):
+    db = _FakeDB()
+    db.Read(cursor=mock.MagicMock())
+    self.assertEmpty(db.transactions)
+
+
+class RunInTransactionTest(absltest.TestCase):
+
+  def _Run(self, **kwargs):
+    # The constructor connects to the database, so it is bypassed here.
+    db = mysql.MysqlDB.__new__(mysql.MysqlDB)
+    db.pool = mock.MagicMock()
+    db.replicas = []
+    db._RunInTransaction(lambda connection: None, **kwargs)
+    return db.pool.get.return_value
+
+  def testTransactionIsStarted(self):
+    connection = self._Run(readonly=True)
+    connection.cursor.return_value.execute.assert_called_once_with(
+        "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+
+  def testSingleStatementSkipsTransactionStart(self):
+    connection = self._Run(readonly=True, single_statement=True)
+    connection.cursor.return_value.execute.assert_not_called()
+
+  def testSingleStatementWriteIsCommitted(self):
+    connection = self._Run(single_statement=True)
+    connection.cursor.return_value.execute.assert_not_called()
+    connection.commit.assert_called_once()
+
+
+class ExtractPayloadTextTest(absltest.TestCase):
+
+  def testStringFields(self):
+    payload = rdf_client.ClientSummary(
+        client_id="C.0000000000000001", system_manufacturer="Acme")
+    text = mysql_utils.ExtractPayloadText(payload)
+    self.assertIn("C.0000000000000001", text)
+    self.assertIn("Acme", text)
+
+  def testNestedAndRepeatedFields(self):
+    payload = rdf_client_fs.StatEntry(
+        pathspec=rdf_paths.PathSpec(
+            path="/foo/bar", pathtype=rdf_paths.PathSpec.PathType.OS),
+        symlink="/baz",
+        st_size=1337)
+    text = mysql_utils.ExtractPayloadText(payload)
+    self.assertIn("/foo/bar", text.split("\n"))
+    self.assertIn("/baz", text.split("\n"))
+    self.assertNotIn("1337", text)
+
+  def testBinaryFieldsAreDecoded(self):
+    payload = rdf_client.BufferReference(data=b"foo\xffbar", offset=42)
+    self.assertEqual(mysql_utils.ExtractPayloadText(payload), "foo\ufffdbar")
+
+
+class ResultsSourceTest(absltest.TestCase):
+
+  def _Source(self, substring):
+    return mysql_utils.ResultsSource(
+        "WHERE hunt_id = %s ", [42],
+        "FORCE INDEX (scan) ",
+        "FORCE INDEX (no_text) ",
+        substring=substring)
+
+  def testWithoutSubstring(self):
+    source, args = self._Source(None)
+    self.assertEqual(source,
+                     "flow_results FORCE INDEX (scan) WHERE hunt_id = %s ")
+    self.assertEqual(args, [42])
+
+  def testUsesTextIndex(self):
+    source, args = self._Source("foo%")
+    self.assertIn("FORCE INDEX (flow_results_payload_text) WHERE hunt_id = %s "
+                  "AND MATCH (payload_text)", source)
+    self.assertNotIn("FORCE INDEX (scan)", source)
+    self.assertEqual(source.count("%s"), len(args))
+    self.assertEqual(args, [42, '"foo%"', "%foo\\%%", 42, "%foo\\%%"])
+
+  def testLooksUpResultsWithoutTextSeparately(self):
+    source, _ = self._Source("foo")
+    self.assertIn(
+        "UNION ALL SELECT result_id FROM flow_results FORCE INDEX (no_text) "
+        "WHERE hunt_id = %s AND payload_text IS NULL AND payload LIKE %s",
+        source)
+
+  def testShortSubstringFallsBackToScan(self):
+    source, args = self._Source("f")
+    self.assertEqual(
+        source, "flow_results FORCE INDEX (scan) WHERE hunt_id = %s "
+        "AND payload LIKE %s ")
+    self.assertEqual(args, [42, "%f%"])
+
+  def testQuotedSubstringFallsBackToScan(self):
+    source, _ = self._Source('"foo"')
+    self.assertNotIn("MATCH", source)
+    self.assertIn("payload LIKE %s", source)
+
+  def testDisabledTextIndexFallsBackToScan(self):
+    with test_lib.ConfigOverrider({"Mysql.flow_results_text_search": False}):
+      source, _ = self._Source("foo")
+    self.assertNotIn("MATCH", source)
+    self.assertIn("payload LIKE %s", source)
+
+
 def main(argv):
   test_lib.main(argv)
 
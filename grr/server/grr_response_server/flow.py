@@ -59,6 +59,7 @@ from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import events as rdf_events
 from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_core.lib.util import collection
 from grr_response_core.lib.util import random
 from grr_response_core.stats import stats_collector_instance
 from grr_response_proto import flows_pb2
@@ -339,6 +340,68 @@ def RandomFlowId():
   return "%08X" % random.PositiveUInt32()
 
 
+def _CheckFlowClass(flow_cls):
+  """Raises if the given flow class is not a known flow."""
+  try:
+    registry.FlowRegistry.FlowClassByName(flow_cls.__name__)
+  except ValueError:
+    stats_collector_instance.Get().IncrementCounter(
+        "grr_flow_invalid_flow_count")
+    raise ValueError("Unable to locate flow %s" % flow_cls.__name__)
+
+
+def _CreateRDFFlow(client_id,
+                   flow_cls,
+                   flow_args,
+                   creator=None,
+                   cpu_limit=None,
+                   network_bytes_limit=None,
+                   original_flow=None,
+                   output_plugins=None,
+                   parent_flow_obj=None,
+                   parent_hunt_id=None):
+  """Creates a flow object of a new flow (see StartFlow for arguments)."""
+  rdf_flow = rdf_flow_objects.Flow(
+      client_id=client_id,
+      flow_class_name=flow_cls.__name__,
+      args=flow_args,
+      create_time=rdfvalue.RDFDatetime.Now(),
+      creator=creator,
+      output_plugins=output_plugins,
+      original_flow=original_flow,
+      flow_state="RUNNING")
+
+  if parent_hunt_id is not None and parent_flow_obj is None:
+    rdf_flow.flow_id = parent_hunt_id
+    if IsLegacyHunt(parent_hunt_id):
+      rdf_flow.flow_id = rdf_flow.flow_id[2:]
+  else:
+    rdf_flow.flow_id = RandomFlowId()
+
+  if parent_flow_obj:  # A flow is a nested flow.
+    parent_rdf_flow = parent_flow_obj.rdf_flow
+    rdf_flow.long_flow_id = "%s/%s" % (parent_rdf_flow.long_flow_id,
+                                       rdf_flow.flow_id)
+    rdf_flow.parent_flow_id = parent_rdf_flow.flow_id
+    rdf_flow.parent_hunt_id = parent_rdf_flow.parent_hunt_id
+    rdf_flow.parent_request_id = parent_flow_obj.GetCurrentOutboundId()
+    if parent_rdf_flow.creator:
+      rdf_flow.creator = parent_rdf_flow.creator
+  elif parent_hunt_id:  # A flow is a root-level hunt-induced flow.
+    rdf_flow.long_flow_id = "%s/%s" % (client_id, rdf_flow.flow_id)
+    rdf_flow.parent_hunt_id = parent_hunt_id
+  else:  # A flow is a root-level non-hunt flow.
+    rdf_flow.long_flow_id = "%s/%s" % (client_id, rdf_flow.flow_id)
+
+  if network_bytes_limit is not None:
+    rdf_flow.network_bytes_limit = network_bytes_limit
+  if cpu_limit is not None:
+    rdf_flow.cpu_limit = cpu_limit
+
+  rdf_flow.current_state = "Start"
+  return rdf_flow
+
+
 def StartFlow(client_id=None,
               cpu_limit=None,
               creator=None,
@@ -384,13 +447,7 @@ def StartFlow(client_id=None,
     raise ValueError(
         "parent_flow_obj and parent_hunt_id are mutually exclusive.")
 
-  # Is the required flow a known flow?
-  try:
-    registry.FlowRegistry.FlowClassByName(flow_cls.__name__)
-  except ValueError:
-    stats_collector_instance.Get().IncrementCounter(
-        "grr_flow_invalid_flow_count")
-    raise ValueError("Unable to locate flow %s" % flow_cls.__name__)
+  _CheckFlowClass(flow_cls)
 
   if not client_id:
     raise ValueError("Client_id is needed to start a flow.")
@@ -408,22 +465,17 @@ def StartFlow(client_id=None,
   # Check that the flow args are valid.
   flow_args.Validate()
 
-  rdf_flow = rdf_flow_objects.Flow(
-      client_id=client_id,
-      flow_class_name=flow_cls.__name__,
-      args=flow_args,
-      create_time=rdfvalue.RDFDatetime.Now(),
+  rdf_flow = _CreateRDFFlow(
+      client_id,
+      flow_cls,
+      flow_args,
       creator=creator,
-      output_plugins=output_plugins,
+      cpu_limit=cpu_limit,
+      network_bytes_limit=network_bytes_limit,
       original_flow=original_flow,
-      flow_state="RUNNING")
-
-  if parent_hunt_id is not None and parent_flow_obj is None:
-    rdf_flow.flow_id = parent_hunt_id
-    if IsLegacyHunt(parent_hunt_id):
-      rdf_flow.flow_id = rdf_flow.flow_id[2:]
-  else:
-    rdf_flow.flow_id = RandomFlowId()
+      output_plugins=output_plugins,
+      parent_flow_obj=parent_flow_obj,
+      parent_hunt_id=parent_hunt_id)
 
   # For better performance, only do conflicting IDs check for top-level flows.
   if not parent_flow_obj:
@@ -433,37 +485,15 @@ def StartFlow(client_id=None,
     except db.UnknownFlowError:
       pass
 
-  if parent_flow_obj:  # A flow is a nested flow.
-    parent_rdf_flow = parent_flow_obj.rdf_flow
-    rdf_flow.long_flow_id = "%s/%s" % (parent_rdf_flow.long_flow_id,
-                                       rdf_flow.flow_id)
-    rdf_flow.parent_flow_id = parent_rdf_flow.flow_id
-    rdf_flow.parent_hunt_id = parent_rdf_flow.parent_hunt_id
-    rdf_flow.parent_request_id = parent_flow_obj.GetCurrentOutboundId()
-    if parent_rdf_flow.creator:
-      rdf_flow.creator = parent_rdf_flow.creator
-  elif parent_hunt_id:  # A flow is a root-level hunt-induced flow.
-    rdf_flow.long_flow_id = "%s/%s" % (client_id, rdf_flow.flow_id)
-    rdf_flow.parent_hunt_id = parent_hunt_id
-  else:  # A flow is a root-level non-hunt flow.
-    rdf_flow.long_flow_id = "%s/%s" % (client_id, rdf_flow.flow_id)
-
   if output_plugins:
     rdf_flow.output_plugins_states = GetOutputPluginStates(
         output_plugins,
         rdf_flow.long_flow_id,
         token=access_control.ACLToken(username=rdf_flow.creator))
 
-  if network_bytes_limit is not None:
-    rdf_flow.network_bytes_limit = network_bytes_limit
-  if cpu_limit is not None:
-    rdf_flow.cpu_limit = cpu_limit
-
   logging.info(u"Scheduling %s(%s) on %s (%s)", rdf_flow.long_flow_id,
                rdf_flow.flow_class_name, client_id, start_at or "now")
 
-  rdf_flow.current_state = "Start"
-
   flow_obj = flow_cls(rdf_flow)
   if start_at is None:
 
@@ -512,6 +542,99 @@ def StartFlow(client_id=None,
   return rdf_flow.flow_id
 
 
+# Number of flows scheduled by StartFlows with a single set of writes.
+_START_FLOWS_BATCH_SIZE = 1000
+
+
+def StartFlows(client_ids,
+               flow_cls,
+               start_at,
+               creator=None,
+               cpu_limit=None,
+               flow_args=None,
+               network_bytes_limit=None,
+               parent_hunt_id=None):
+  """Schedules the same top-level flow on multiple clients.
+
+  Unlike StartFlow, the Start state of the flows is not run inline but is
+  scheduled to be run by a worker. This allows writing the flow objects and
+  their initial requests with a few bulk writes instead of several writes per
+  client.
+
+  Args:
+    client_ids: IDs of the clients the flow should run on.
+    flow_cls: Class of the flow that should be started.
+    start_at: Time at which the Start state of the flows should be run.
+    creator: Username that requested the flows.
+    cpu_limit: CPU limit in seconds for every flow.
+    flow_args: An arg protocol buffer which is an instance of the required
+      flow's args_type class attribute.
+    network_bytes_limit: Limit on the network traffic every flow can generate.
+    parent_hunt_id: String identifying the parent hunt of the flows (if any).
+
+  Returns:
+    A list of flow ids of the scheduled flows, in the order of `client_ids`.
+
+  Raises:
+    CanNotStartFlowWithExistingIdError: One of the flows already exists. No
+      flows of the batch the flow belongs to are scheduled in this case.
+    ValueError: Unknown or invalid parameters were provided.
+  """
+  _CheckFlowClass(flow_cls)
+
+  if flow_args is None:
+    flow_args = flow_cls.args_type()
+  flow_args.Validate()
+
+  flow_ids = []
+  for batch in collection.Batch(client_ids, _START_FLOWS_BATCH_SIZE):
+    rdf_flows = []
+    flow_requests = []
+    audit_events = []
+
+    for client_id in batch:
+      if not client_id:
+        raise ValueError("Client_id is needed to start a flow.")
+
+      rdf_flow = _CreateRDFFlow(
+          client_id,
+          flow_cls,
+          flow_args,
+          creator=creator,
+          cpu_limit=cpu_limit,
+          network_bytes_limit=network_bytes_limit,
+          parent_hunt_id=parent_hunt_id)
+
+      flow_obj = flow_cls(rdf_flow)
+      flow_obj.CallState("Start", start_time=start_at)
+      flow_obj.PersistState()
+
+      rdf_flows.append(flow_obj.rdf_flow)
+      flow_requests.extend(flow_obj.flow_requests)
+      audit_events.append(
+          rdf_events.AuditEvent(
+              user=creator,
+              action="RUN_FLOW",
+              flow_name=rdf_flow.flow_class_name,
+              urn=rdf_flow.long_flow_id,
+              client=client_id))
+
+    logging.info(u"Scheduling %s on %d clients (%s)", flow_cls.__name__,
+                 len(rdf_flows), start_at)
+
+    try:
+      data_store.REL_DB.WriteFlowObjects(rdf_flows, allow_update=False)
+    except db.DuplicatedFlowError as e:
+      raise CanNotStartFlowWithExistingIdError(e.client_id, e.flow_id)
+    data_store.REL_DB.WriteFlowRequests(flow_requests)
+
+    events.Events.PublishMultipleEvents({"Audit": audit_events})
+
+    flow_ids.extend(rdf_flow.flow_id for rdf_flow in rdf_flows)
+
+  return flow_ids
+
+
 class FlowBase(with_metaclass(registry.AFF4FlowRegistry, aff4.AFF4Volume)):
   """The base class for Flows and Hunts."""
 
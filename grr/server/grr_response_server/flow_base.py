@@ -25,6 +25,7 @@ from grr_response_server import data_store_utils
 from grr_response_server import fleetspeak_utils
 from grr_response_server import flow
 from grr_response_server import flow_responses
+from grr_response_server import hunt
 from grr_response_server import notification as notification_lib
 from grr_response_server.aff4_objects import users as aff4_users
 from grr_response_server.databases import db_compat
@@ -653,42 +654,64 @@ class FlowBase(with_metaclass(registry.FlowRegistry, object)):
     self.rdf_flow.response_count += 1
     return self.rdf_flow.response_count
 
-  def FlushQueuedMessages(self):
-    # TODO(amoser): This could be done in a single db call, might be worth
-    # optimizing.
+  def FlushQueuedMessages(self, release=False, flow_cache=None):
+    """Writes all the queued messages to the database.
 
-    if self.flow_requests:
-      data_store.REL_DB.WriteFlowRequests(self.flow_requests)
-      self.flow_requests = []
+    Args:
+      release: If True, the flow is also released (see
+        Database.ReleaseProcessedFlow) together with the queued messages.
+      flow_cache: The db.FlowCache the flow was leased with, if any.
 
-    if self.flow_responses:
-      data_store.REL_DB.WriteFlowResponses(self.flow_responses)
-      self.flow_responses = []
+    Returns:
+      False if the flow had to be released but could not be, True otherwise.
+    """
+    client_id = self.rdf_flow.client_id
 
+    fleetspeak_requests = []
+    client_action_requests = []
     if self.client_action_requests:
-      client_id = self.rdf_flow.client_id
       if fleetspeak_utils.IsFleetspeakEnabledClient(client_id):
-        for request in self.client_action_requests:
-          msg = rdf_flow_objects.GRRMessageFromClientActionRequest(request)
-          fleetspeak_utils.SendGrrMessageThroughFleetspeak(client_id, msg)
+        fleetspeak_requests = self.client_action_requests
       else:
-        data_store.REL_DB.WriteClientActionRequests(self.client_action_requests)
-
-      self.client_action_requests = []
+        client_action_requests = self.client_action_requests
+
+    # For top-level hunt-induced flows, results go to the hunt collection.
+    hunt_id = None
+    if self.rdf_flow.parent_hunt_id and not self.rdf_flow.parent_flow_id:
+      hunt_id = self.rdf_flow.parent_hunt_id
+
+    flow_results = self.replies_to_write
+    legacy_hunt_results = []
+    if hunt_id and db_compat.IsLegacyHunt(hunt_id):
+      flow_results, legacy_hunt_results = [], self.replies_to_write
+
+    # All the database updates go in a single call, so that a step of flow
+    # processing is persisted atomically.
+    released = data_store.REL_DB.FlushFlowUpdates(
+        flow_requests=self.flow_requests,
+        flow_responses=self.flow_responses,
+        client_action_requests=client_action_requests,
+        completed_requests=self.completed_requests,
+        flow_results=flow_results,
+        flow_to_release=self.rdf_flow if release else None,
+        flow_cache=flow_cache)
+
+    for request in fleetspeak_requests:
+      msg = rdf_flow_objects.GRRMessageFromClientActionRequest(request)
+      fleetspeak_utils.SendGrrMessageThroughFleetspeak(client_id, msg)
+
+    if legacy_hunt_results:
+      db_compat.WriteHuntResults(client_id, hunt_id, legacy_hunt_results)
+    elif hunt_id and flow_results:
+      hunt.StopHuntIfCPUOrNetworkLimitsExceeded(hunt_id)
 
-    if self.completed_requests:
-      data_store.REL_DB.DeleteFlowRequests(self.completed_requests)
-      self.completed_requests = []
+    self.flow_requests = []
+    self.flow_responses = []
+    self.client_action_requests = []
+    self.completed_requests = []
+    self.replies_to_write = []
 
-    if self.replies_to_write:
-      # For top-level hunt-induced flows, write results to the hunt collection.
-      if self.rdf_flow.parent_hunt_id and not self.rdf_flow.parent_flow_id:
-        db_compat.WriteHuntResults(self.rdf_flow.client_id,
-                                   self.rdf_flow.parent_hunt_id,
-                                   self.replies_to_write)
-      else:
-        data_store.REL_DB.WriteFlowResults(self.replies_to_write)
-      self.replies_to_write = []
+    return released
 
   def _ProcessRepliesWithHuntOutputPlugins(self, replies):
     if db_compat.IsLegacyHunt(self.rdf_flow.parent_hunt_id):
@@ -176,6 +176,38 @@ class FlowCreationTest(BasicFlowTest):
           parent_hunt_id=flow_id,
           client_id=self.client_id)
 
+  def testStartFlowsSchedulesFlowsOnAllClients(self):
+    client_ids = [self.client_id, self.SetupTestClientObject(1).client_id]
+    now = rdfvalue.RDFDatetime.Now()
+
+    flow_ids = flow.StartFlows(
+        client_ids, CallStateFlow, now, creator="test", parent_hunt_id="ABCDEF")
+    self.assertEqual(flow_ids, ["ABCDEF", "ABCDEF"])
+
+    for client_id in client_ids:
+      flow_obj = data_store.REL_DB.ReadFlowObject(client_id, "ABCDEF")
+      self.assertEqual(flow_obj.flow_state, "RUNNING")
+      self.assertEqual(flow_obj.creator, "test")
+      self.assertEqual(flow_obj.parent_hunt_id, "ABCDEF")
+
+      requests = data_store.REL_DB.ReadAllFlowRequestsAndResponses(
+          client_id, "ABCDEF")
+      self.assertLen(requests, 1)
+      self.assertEqual(requests[0][0].next_state, "Start")
+
+    processing_requests = data_store.REL_DB.ReadFlowProcessingRequests()
+    self.assertCountEqual([r.client_id for r in processing_requests],
+                          client_ids)
+
+  def testStartFlowsDoesNotAllowDuplicateIDs(self):
+    now = rdfvalue.RDFDatetime.Now()
+    flow.StartFlows([self.client_id], CallStateFlow, now,
+                    parent_hunt_id="ABCDEF")
+
+    with self.assertRaises(flow.CanNotStartFlowWithExistingIdError):
+      flow.StartFlows([self.client_id], CallStateFlow, now,
+                      parent_hunt_id="ABCDEF")
+
   def testPendingFlowTermination(self):
     client_mock = ClientMock()
 
@@ -4,6 +4,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import time
+
 from grr_response_core import config
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib.util import collection
@@ -130,9 +132,70 @@ class CleanInactiveClientsMixin(object):
   def CleanClients(self):
     if data_store.AFF4Enabled():
       self.CleanAff4Clients()
-    else:
-      # TODO(amoser): Support relational db here.
-      self.Log("Relational database not supported.")
+    if data_store.RelationalDBEnabled():
+      self.CleanRelationalClients()
+
+  def CleanRelationalClients(self):
+    """Cleans up old client data from the relational database."""
+
+    inactive_client_ttl = config.CONFIG["DataRetention.inactive_client_ttl"]
+    if not inactive_client_ttl:
+      self.Log("TTL not set - nothing to do...")
+      return
+
+    exception_label = config.CONFIG[
+        "DataRetention.inactive_client_ttl_exception_label"]
+    batch_size = config.CONFIG[
+        "DataRetention.inactive_client_deletion_batch_size"]
+    pause = config.CONFIG["DataRetention.inactive_client_deletion_pause"]
+
+    deadline = rdfvalue.RDFDatetime.Now() - inactive_client_ttl
+    deletion_count = 0
+
+    for last_pings in data_store.REL_DB.ReadClientLastPings(
+        max_last_ping=deadline):
+      for client_ids in collection.Batch(sorted(last_pings), batch_size):
+        client_ids = self._SkipRecentlyEnrolledClients(client_ids, last_pings,
+                                                       deadline)
+        if not client_ids:
+          continue
+
+        labels = data_store.REL_DB.MultiReadClientLabels(client_ids)
+        inactive_client_ids = [
+            client_id for client_id in client_ids if exception_label not in
+            [label.name for label in labels.get(client_id, [])]
+        ]
+        if not inactive_client_ids:
+          continue
+
+        data_store.REL_DB.DeleteClients(inactive_client_ids)
+        deletion_count += len(inactive_client_ids)
+        self.HeartBeat()
+        if pause:
+          time.sleep(pause.seconds)
+
+    self.Log("Deleted %d inactive clients." % deletion_count)
+
+  def _SkipRecentlyEnrolledClients(self, client_ids, last_pings, deadline):
+    """Drops clients that never pinged unless they were first seen long ago."""
+    never_pinged = [
+        client_id for client_id in client_ids if last_pings[client_id] is None
+    ]
+    if not never_pinged:
+      return client_ids
+
+    metadatas = data_store.REL_DB.MultiReadClientMetadata(never_pinged)
+    recently_enrolled = set()
+    for client_id in never_pinged:
+      metadata = metadatas.get(client_id)
+      if (metadata is None or metadata.first_seen is None or
+          metadata.first_seen >= deadline):
+        recently_enrolled.add(client_id)
+
+    return [
+        client_id for client_id in client_ids
+        if client_id not in recently_enrolled
+    ]
 
   def CleanAff4Clients(self):
     """Cleans up old client data from aff4."""
@@ -5,7 +5,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import re
-
+import time
 
 from absl import app
 from future.builtins import range
@@ -382,6 +382,8 @@ class CleanInactiveClientsFlowTest(flow_test_lib.FlowTestsBaseclass):
 class CleanInactiveClientsJobTest(db_test_lib.RelationalDBEnabledMixin,
                                   test_lib.GRRBaseTest):
 
+  NUM_CLIENT = 10
+
   def _RunCleanup(self):
     run = rdf_cronjobs.CronJobRun()
     job = rdf_cronjobs.CronJob()
@@ -391,10 +393,90 @@ class CleanInactiveClientsJobTest(db_test_lib.RelationalDBEnabledMixin,
   def _CheckLog(self, msg):
     self.assertIn(msg, self.cleaner_job.run_state.log_message)
 
-  def testDoesNothingWhenAFF4Disabled(self):
+  def setUp(self):
+    super(CleanInactiveClientsJobTest, self).setUp()
+    self.client_ids = []
+    for i in range(self.NUM_CLIENT):
+      client_id = "C.%016X" % i
+      data_store.REL_DB.WriteClientMetadata(
+          client_id,
+          fleetspeak_enabled=False,
+          last_ping=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(40 + 60 * i))
+      self.client_ids.append(client_id)
+
+    sleep_patcher = mock.patch.object(time, "sleep")
+    sleep_patcher.start()
+    self.addCleanup(sleep_patcher.stop)
+
+  def _RunCleanupWithoutAFF4(self):
     with mock.patch.object(data_store, "AFF4Enabled", return_value=False):
-      self._RunCleanup()
-      self._CheckLog("not supported")
+      with test_lib.FakeTime(40 + 60 * self.NUM_CLIENT):
+        self._RunCleanup()
+
+  def _RemainingClientIds(self):
+    return sorted(data_store.REL_DB.MultiReadClientMetadata(self.client_ids))
+
+  def testDoesNothingIfAgeLimitNotSetInConfig(self):
+    self._RunCleanupWithoutAFF4()
+    self.assertEqual(self._RemainingClientIds(), self.client_ids)
+    self._CheckLog("TTL not set")
+
+  def testDeletesInactiveClientsWithAgeOlderThanGivenAge(self):
+    with test_lib.ConfigOverrider({
+        "DataRetention.inactive_client_ttl": rdfvalue.Duration("310s"),
+        "DataRetention.inactive_client_deletion_batch_size": 2,
+    }):
+      self._RunCleanupWithoutAFF4()
+
+    self.assertEqual(self._RemainingClientIds(), self.client_ids[5:])
+    self._CheckLog("Deleted 5")
+
+  def testKeepsRecentlyEnrolledClientsThatNeverPinged(self):
+    data_store.REL_DB.WriteClientMetadata(
+        "C.1000000000000000",
+        fleetspeak_enabled=False,
+        first_seen=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(
+            30 + 60 * self.NUM_CLIENT))
+    data_store.REL_DB.WriteClientMetadata(
+        "C.1000000000000001",
+        fleetspeak_enabled=False,
+        first_seen=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(40))
+
+    with test_lib.ConfigOverrider(
+        {"DataRetention.inactive_client_ttl": rdfvalue.Duration("310s")}):
+      self._RunCleanupWithoutAFF4()
+
+    remaining = data_store.REL_DB.MultiReadClientMetadata(
+        self.client_ids + ["C.1000000000000000", "C.1000000000000001"])
+    self.assertEqual(
+        sorted(remaining), self.client_ids[5:] + ["C.1000000000000000"])
+    self._CheckLog("Deleted 6")
+
+  def testKeepsClientsWithRetainLabel(self):
+    exception_label_name = config.CONFIG[
+        "DataRetention.inactive_client_ttl_exception_label"]
+    for client_id in self.client_ids[:3]:
+      data_store.REL_DB.AddClientLabels(client_id, "GRR",
+                                        [exception_label_name])
+
+    with test_lib.ConfigOverrider(
+        {"DataRetention.inactive_client_ttl": rdfvalue.Duration("10s")}):
+      self._RunCleanupWithoutAFF4()
+
+    self.assertEqual(self._RemainingClientIds(), self.client_ids[:3])
+    self._CheckLog("Deleted 7")
+
+  def testHeartBeatsAfterEveryBatch(self):
+    with test_lib.ConfigOverrider({
+        "DataRetention.inactive_client_ttl": rdfvalue.Duration("10s"),
+        "DataRetention.inactive_client_deletion_batch_size": 3,
+    }):
+      with mock.patch.object(
+          data_retention.CleanInactiveClientsCronJob,
+          "HeartBeat") as heart_beat:
+        self._RunCleanupWithoutAFF4()
+
+    self.assertEqual(heart_beat.call_count, 4)
 
 
 def main(argv):
@@ -591,3 +591,21 @@ class PurgeClientStatsCronJob(cronjobs.SystemCronJobBase):
         total_deleted_count += deleted_count
         self.Log("Deleted %d ClientStats that expired before %s",
                  total_deleted_count, end)
+
+
+class PartitionMaintenanceCronJob(cronjobs.SystemCronJobBase):
+  """Creates partitions of time-partitioned tables ahead of time."""
+
+  frequency = rdfvalue.Duration("1d")
+  lifetime = rdfvalue.Duration("1h")
+
+  def Run(self):
+    if not data_store.RelationalDBEnabled():
+      self.Log("This cron job is only supported with the relational database.")
+      return
+
+    days_ahead = config.CONFIG["Mysql.partitions_ahead_days"]
+    until = rdfvalue.RDFDatetime.Now() + rdfvalue.Duration("%dd" % days_ahead)
+    created_count = data_store.REL_DB.CreateTablePartitions(until)
+    self.Log("Created %d partitions covering data until %s.", created_count,
+             until)
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 from absl import app
 from future.builtins import range
+import mock
 
 from grr_response_core import config
 from grr_response_core.lib import rdfvalue
@@ -285,6 +286,22 @@ class SystemCronJobTest(db_test_lib.RelationalDBEnabledMixin,
     job = rdf_cronjobs.CronJob()
     system.PurgeClientStatsCronJob(run, job).Run()
 
+  def testPartitionMaintenance(self):
+    run = rdf_cronjobs.CronJobRun()
+    job = rdf_cronjobs.CronJob()
+    cron = system.PartitionMaintenanceCronJob(run, job)
+
+    with test_lib.FakeTime(rdfvalue.RDFDatetime.FromSecondsSinceEpoch(0)):
+      with test_lib.ConfigOverrider({"Mysql.partitions_ahead_days": 3}):
+        with mock.patch.object(
+            data_store.REL_DB, "CreateTablePartitions",
+            return_value=2) as create_partitions:
+          cron.Run()
+
+    create_partitions.assert_called_once_with(
+        rdfvalue.RDFDatetime.FromSecondsSinceEpoch(3 * 24 * 60 * 60))
+    self.assertIn("Created 2 partitions", cron.run_state.log_message)
+
 
 def main(argv):
   # Run the full test suite
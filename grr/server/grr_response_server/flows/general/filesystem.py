@@ -9,7 +9,6 @@ import re
 import stat
 
 
-from future.builtins import map
 from future.utils import iteritems
 from future.utils import iterkeys
 
@@ -132,6 +131,37 @@ def WriteStatEntries(stat_entries, client_id, mutation_pool, token=None):
                                      _FilterOutPathInfoDuplicates(path_infos))
 
 
+# Clients starting with this version support the ListDirectoryBatched action.
+BATCHED_LIST_DIRECTORY_MIN_CLIENT_VERSION = 3302
+
+
+def _GetListDirectoryStub(client_version):
+  if client_version >= BATCHED_LIST_DIRECTORY_MIN_CLIENT_VERSION:
+    return server_stubs.ListDirectoryBatched
+  return server_stubs.ListDirectory
+
+
+def _StatEntryBatches(responses):
+  """Yields lists of stat entries from directory listing responses.
+
+  Args:
+    responses: Responses of either the `ListDirectory` or the
+      `ListDirectoryBatched` client action.
+
+  Yields:
+    Lists of `StatEntry` instances, one for each batch sent by the client.
+  """
+  stat_entries = []
+  for response in responses:
+    if isinstance(response, rdf_client_fs.StatEntryBatch):
+      yield list(response.entries)
+    else:
+      stat_entries.append(rdf_client_fs.StatEntry(response))
+
+  if stat_entries:
+    yield stat_entries
+
+
 class ListDirectoryArgs(rdf_structs.RDFProtoStruct):
   protobuf = flows_pb2.ListDirectoryArgs
   rdf_deps = [
@@ -165,7 +195,7 @@ class ListDirectoryMixin(object):
 
     # We use data to pass the path to the callback:
     self.CallClient(
-        server_stubs.ListDirectory,
+        _GetListDirectoryStub(self.client_version),
         pathspec=self.args.pathspec,
         next_state="List")
 
@@ -205,15 +235,15 @@ class ListDirectoryMixin(object):
         path_info = rdf_objects.PathInfo.FromStatEntry(self.state.stat)
         data_store.REL_DB.WritePathInfos(self.client_id, [path_info])
 
-      stat_entries = list(map(rdf_client_fs.StatEntry, responses))
-      WriteStatEntries(
-          stat_entries,
-          client_id=self.client_id,
-          mutation_pool=pool,
-          token=self.token)
+      for stat_entries in _StatEntryBatches(responses):
+        WriteStatEntries(
+            stat_entries,
+            client_id=self.client_id,
+            mutation_pool=pool,
+            token=self.token)
 
-      for stat_entry in stat_entries:
-        self.SendReply(stat_entry)  # Send Stats to parent flows.
+        for stat_entry in stat_entries:
+          self.SendReply(stat_entry)  # Send Stats to parent flows.
 
   def NotifyAboutEnd(self):
     """Sends a notification that this flow is done."""
@@ -267,19 +297,21 @@ class RecursiveListDirectoryMixin(object):
     self.state.file_count = 0
 
     self.CallClient(
-        server_stubs.ListDirectory,
+        _GetListDirectoryStub(self.client_version),
         pathspec=self.args.pathspec,
         next_state="ProcessDirectory")
 
   def ProcessDirectory(self, responses):
     """Recursively list the directory, and add to the timeline."""
     if responses.success:
-      response = responses.First()
+      stat_entries = []
+      for batch in _StatEntryBatches(responses):
+        stat_entries.extend(batch)
 
-      if response is None:
+      if not stat_entries:
         return
 
-      directory_pathspec = response.pathspec.Dirname()
+      directory_pathspec = stat_entries[0].pathspec.Dirname()
 
       urn = directory_pathspec.AFF4Path(self.client_urn)
 
@@ -296,12 +328,12 @@ class RecursiveListDirectoryMixin(object):
                    urn.RelativeName(self.state.first_directory))
           return
 
-      for stat_response in responses:
+      for stat_response in stat_entries:
         # Queue a list directory for each directory here, but do not follow
         # symlinks.
         if not stat_response.symlink and stat.S_ISDIR(stat_response.st_mode):
           self.CallClient(
-              server_stubs.ListDirectory,
+              _GetListDirectoryStub(self.client_version),
               pathspec=stat_response.pathspec,
               next_state="ProcessDirectory")
           self.state.dir_count += 1
@@ -310,21 +342,21 @@ class RecursiveListDirectoryMixin(object):
                      urn.RelativeName(self.state.first_directory),
                      self.state.file_count, self.state.dir_count)
 
-      self.state.file_count += len(responses)
+      self.state.file_count += len(stat_entries)
 
   def StoreDirectory(self, responses):
     """Stores all stat responses."""
     with data_store.DB.GetMutationPool() as pool:
 
-      stat_entries = list(map(rdf_client_fs.StatEntry, responses))
-      WriteStatEntries(
-          stat_entries,
-          client_id=self.client_id,
-          mutation_pool=pool,
-          token=self.token)
+      for stat_entries in _StatEntryBatches(responses):
+        WriteStatEntries(
+            stat_entries,
+            client_id=self.client_id,
+            mutation_pool=pool,
+            token=self.token)
 
-      for stat_entry in stat_entries:
-        self.SendReply(stat_entry)  # Send Stats to parent flows.
+        for stat_entry in stat_entries:
+          self.SendReply(stat_entry)  # Send Stats to parent flows.
 
   def NotifyAboutEnd(self):
     status_text = "Recursive Directory Listing complete %d nodes, %d dirs"
@@ -730,11 +762,55 @@ class GlobLogic(object):
                                            {})
 
     root_path = next(iterkeys(self.state.component_tree))
+
+    if self._CanExpandGlobsOnClient():
+      # The whole component tree is shipped to the client which expands it in
+      # a single round trip instead of one round trip per tree level.
+      request = rdf_client_action.ExpandGlobsRequest(
+          roots=self._BuildGlobComponentNodes(
+              self.state.component_tree[root_path]),
+          pathtype=self.state.pathtype,
+          process_non_regular_files=self.state.process_non_regular_files,
+          collect_ext_attrs=self.state.collect_ext_attrs)
+      if self.state.root_path:
+        request.root_path = self.state.root_path
+
+      self.CallClient(
+          server_stubs.ExpandGlobs,
+          request,
+          next_state="ProcessExpandedGlobs")
+      return
+
     self.CallStateInline(
         messages=[None],
         next_state="ProcessEntry",
         request_data=dict(component_path=[root_path]))
 
+  # Clients starting with this version can expand whole glob component trees.
+  EXPAND_GLOBS_MIN_CLIENT_VERSION = 3302
+
+  def _CanExpandGlobsOnClient(self):
+    return self.client_version >= self.EXPAND_GLOBS_MIN_CLIENT_VERSION
+
+  def _BuildGlobComponentNodes(self, node):
+    """Converts a component tree node into a list of GlobComponentNodes."""
+    result = []
+    for component_str, next_node in iteritems(node):
+      result.append(
+          rdf_client_action.GlobComponentNode(
+              component=rdf_paths.PathSpec.FromSerializedString(component_str),
+              children=self._BuildGlobComponentNodes(next_node)))
+    return result
+
+  def ProcessExpandedGlobs(self, responses):
+    """Reports all the matches found by the client side glob expansion."""
+    if not responses.success:
+      self.Log("Failed to expand globs on the client: %s", responses.status)
+      return
+
+    for response in responses:
+      self.GlobReportMatch(response)
+
   def GlobReportMatch(self, stat_response):
     """Called when we've found a matching a StatEntry."""
     # By default write the stat_response to the AFF4 VFS.
@@ -290,6 +290,61 @@ class TestFilesystem(flow_test_lib.FlowTestsBaseclass):
             pathspec=pb,
             token=self.token)
 
+  def testListDirectoryBatched(self):
+    """Test that ListDirectory works with batched client responses."""
+    client_mock = action_mocks.ListDirectoryClientMock()
+    pb = rdf_paths.PathSpec(
+        path=os.path.join(self.base_path, "a", "b"),
+        pathtype=rdf_paths.PathSpec.PathType.OS)
+
+    with mock.patch.object(filesystem,
+                           "BATCHED_LIST_DIRECTORY_MIN_CLIENT_VERSION", 0):
+      with test_lib.ConfigOverrider({"Client.list_directory_batch_size": 1}):
+        session_id = flow_test_lib.TestFlowHelper(
+            compatibility.GetName(filesystem.ListDirectory),
+            client_mock,
+            client_id=self.client_id,
+            pathspec=pb,
+            token=self.token)
+
+    self.assertEqual(client_mock.action_counts.get("ListDirectory", 0), 0)
+    self.assertEqual(client_mock.action_counts["ListDirectoryBatched"], 1)
+
+    results = flow_test_lib.GetFlowResults(self.client_id, session_id)
+    self.assertCountEqual([r.pathspec.Basename() for r in results], ["c", "d"])
+
+    if data_store.RelationalDBEnabled():
+      components = self.base_path.strip("/").split("/") + ["a", "b"]
+      children = data_store.REL_DB.ListChildPathInfos(
+          self.client_id.Basename(), rdf_objects.PathInfo.PathType.OS,
+          components)
+      self.assertCountEqual([c.components[-1] for c in children], ["c", "d"])
+
+  def testRecursiveListDirectoryBatched(self):
+    """Test that RecursiveListDirectory works with batched client responses."""
+    client_mock = action_mocks.ListDirectoryClientMock()
+    pb = rdf_paths.PathSpec(
+        path=os.path.join(self.base_path, "a"),
+        pathtype=rdf_paths.PathSpec.PathType.OS)
+
+    with mock.patch.object(filesystem,
+                           "BATCHED_LIST_DIRECTORY_MIN_CLIENT_VERSION", 0):
+      with test_lib.ConfigOverrider({"Client.list_directory_batch_size": 1}):
+        session_id = flow_test_lib.TestFlowHelper(
+            compatibility.GetName(filesystem.RecursiveListDirectory),
+            client_mock,
+            client_id=self.client_id,
+            pathspec=pb,
+            token=self.token)
+
+    self.assertEqual(client_mock.action_counts.get("ListDirectory", 0), 0)
+    # The "a", "b", "c" and "d" directories are listed.
+    self.assertEqual(client_mock.action_counts["ListDirectoryBatched"], 4)
+
+    results = flow_test_lib.GetFlowResults(self.client_id, session_id)
+    self.assertCountEqual([r.pathspec.Basename() for r in results],
+                          ["b", "c", "d", "helloc.txt", "hellod.txt"])
+
   def _ListTestChildPathInfos(self,
                               path_components,
                               path_type=rdf_objects.PathInfo.PathType.TSK):
@@ -1203,6 +1258,39 @@ class RelFlowsTestFilesystem(db_test_lib.RelationalDBEnabledMixin,
     pass
 
 
+class ClientSideGlobTestFilesystem(RelFlowsTestFilesystem):
+  """Runs the filesystem tests with globs expanded by the client."""
+
+  def setUp(self):
+    super(ClientSideGlobTestFilesystem, self).setUp()
+    version_patcher = mock.patch.object(
+        filesystem.GlobLogic, "EXPAND_GLOBS_MIN_CLIENT_VERSION", 0)
+    version_patcher.start()
+    self.addCleanup(version_patcher.stop)
+
+  def testGlobRoundtrips(self):
+    """Tests that the whole glob is expanded in a single client round trip."""
+    for pattern in [
+        "test_data/test_artifact.json",
+        "test_da*/test_{artifact,artifacts}.json",
+        "test_data/a/**/hello*.txt",
+        "test_data/a/**{.json,.txt}",
+    ]:
+      path = os.path.join(os.path.dirname(self.base_path), pattern)
+      client_mock = action_mocks.GlobClientMock()
+
+      flow_test_lib.TestFlowHelper(
+          compatibility.GetName(filesystem.Glob),
+          client_mock,
+          client_id=self.client_id,
+          paths=[path],
+          token=self.token)
+
+      self.assertEqual(client_mock.action_counts.get("ExpandGlobs", 0), 1)
+      self.assertEqual(client_mock.action_counts.get("Find", 0), 0)
+      self.assertEqual(client_mock.action_counts.get("GetFileStat", 0), 0)
+
+
 def main(argv):
   # Run the full test suite
   test_lib.main(argv)
@@ -26,8 +26,11 @@ class OsqueryFlowMixin(object):
         server_stubs.Osquery, request=self.args, next_state="Process")
 
   def Process(self, responses):
-    if not responses.success:
-      raise flow.FlowError(responses.status)
-
+    # The client streams the table in chunks as soon as they are ready, so the
+    # chunks that were received before a failure (e.g. a timeout) are still
+    # written out.
     for response in responses:
       self.SendReply(response)
+
+    if not responses.success:
+      raise flow.FlowError(responses.status)
@@ -4,9 +4,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
+
 from future.builtins import str
 from typing import Text
 
+from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.util import precondition
 from grr_response_core.stats import stats_collector_instance
@@ -54,38 +57,108 @@ class LegacyChecker(object):
 
 
 class RelDBChecker(object):
-  """Relational DB-based access checker implementation."""
+  """Relational DB-based access checker implementation.
+
+  The first access check of a user reads all the unexpired approvals of the
+  user of a given type at once. Checks of other subjects of the same type are
+  served from that snapshot: only the approvals of the checked subject are
+  validated (which may need client labels or grantor users to be read) and the
+  outcome is cached.
+
+  Cached approvals are dropped when approvals of the user change in this
+  process (see approval_checks.NotifyApprovalsChanged) and when they get
+  approval_cache_time seconds old. Approvals granted by other processes are
+  noticed right away, because subjects without a granted approval are always
+  read again. Changes made by other processes that revoke access, e.g. client
+  label changes requiring further approvers, take effect within
+  approval_cache_time seconds.
+  """
 
   def __init__(self):
     self.approval_cache_time = 60
     self.acl_cache = utils.AgeBasedCache(
         max_size=10000, max_age=self.approval_cache_time)
 
-  def _CheckAccess(self, username, subject_id, approval_type):
-    """Checks access to a given subject by a given user."""
-    precondition.AssertType(subject_id, Text)
+  def _GetApprovals(self, username, approval_type):
+    """Returns (possibly cached) approvals of a user.
+
+    Args:
+      username: A name of the requestor.
+      approval_type: An rdf_objects.ApprovalRequest.ApprovalType value.
+
+    Returns:
+      A tuple of two dictionaries. The first one maps subject ids to lists of
+      unexpired approvals that were not validated yet, the second one maps
+      subject ids to expiration times (as RDFDatetime) of validated approvals.
+    """
+    cache_key = (username, approval_type)
+    # Read before the approvals, so that changes happening while they are being
+    # read are noticed on the next check.
+    change_count = approval_checks.GetApprovalsChangeCount(username)
 
-    cache_key = (username, subject_id, approval_type)
     try:
-      self.acl_cache.Get(cache_key)
-      stats_collector_instance.Get().IncrementCounter(
-          "approval_searches", fields=["-", "cache"])
-      return True
+      cached_change_count, approvals, granted = self.acl_cache.Get(cache_key)
+      if cached_change_count == change_count:
+        return approvals, granted
     except KeyError:
-      stats_collector_instance.Get().IncrementCounter(
-          "approval_searches", fields=["-", "reldb"])
+      pass
 
-    approvals = data_store.REL_DB.ReadApprovalRequests(
-        username, approval_type, subject_id=subject_id, include_expired=False)
+    stats_collector_instance.Get().IncrementCounter(
+        "approval_searches", fields=["-", "reldb"])
+    approvals = collections.defaultdict(list)
+    for approval in data_store.REL_DB.ReadApprovalRequests(
+        username, approval_type, include_expired=False):
+      approvals[approval.subject_id].append(approval)
 
-    errors = []
+    approvals, granted = dict(approvals), {}
+    self.acl_cache.Put(cache_key, (change_count, approvals, granted))
+    return approvals, granted
+
+  def _CheckApprovals(self, approvals, granted, errors):
+    """Validates approvals of a subject until a granted one is found."""
     for approval in approvals:
       try:
         approval_checks.CheckApprovalRequest(approval)
-        self.acl_cache.Put(cache_key, True)
-        return
       except access_control.UnauthorizedAccess as e:
         errors.append(e)
+        continue
+
+      granted[approval.subject_id] = approval.expiration_time
+      return True
+
+    return False
+
+  def _CheckAccess(self, username, subject_id, approval_type):
+    """Checks access to a given subject by a given user."""
+    precondition.AssertType(subject_id, Text)
+
+    approvals, granted = self._GetApprovals(username, approval_type)
+    expiration_time = granted.get(subject_id)
+    if (expiration_time is not None and
+        expiration_time >= rdfvalue.RDFDatetime.Now()):
+      stats_collector_instance.Get().IncrementCounter(
+          "approval_searches", fields=["-", "cache"])
+      return
+
+    # Approvals of a subject are validated only once per snapshot.
+    if self._CheckApprovals(approvals.pop(subject_id, []), granted, []):
+      stats_collector_instance.Get().IncrementCounter(
+          "approval_searches", fields=["-", "cache"])
+      return
+
+    # The approval might have been granted by another process after the
+    # approvals were read. The subject's approvals are read also to report why
+    # none of them is granted.
+    stats_collector_instance.Get().IncrementCounter(
+        "approval_searches", fields=["-", "reldb"])
+    errors = []
+    if self._CheckApprovals(
+        data_store.REL_DB.ReadApprovalRequests(
+            username,
+            approval_type,
+            subject_id=subject_id,
+            include_expired=False), granted, errors):
+      return
 
     subject = approval_checks.BuildLegacySubject(subject_id, approval_type)
     if not errors:
@@ -6,13 +6,17 @@ from __future__ import unicode_literals
 
 
 from absl import app
+from future.builtins import range
 from future.utils import iterkeys
 import mock
 
+from grr_response_core.lib import rdfvalue
 from grr_response_server import access_control
+from grr_response_server import data_store
 
 from grr_response_server.gui import api_call_handler_base
 from grr_response_server.gui import api_call_router_with_approval_checks as api_router
+from grr_response_server.gui import approval_checks
 from grr_response_server.gui.api_plugins import client as api_client
 from grr_response_server.gui.api_plugins import cron as api_cron
 from grr_response_server.gui.api_plugins import flow as api_flow
@@ -22,6 +26,8 @@ from grr_response_server.gui.api_plugins import user as api_user
 
 from grr_response_server.gui.api_plugins import vfs as api_vfs
 
+from grr.test_lib import acl_test_lib
+from grr.test_lib import db_test_lib
 from grr.test_lib import hunt_test_lib
 from grr.test_lib import test_lib
 
@@ -368,6 +374,120 @@ class ApiCallRouterWithApprovalChecksTest(test_lib.GRRBaseTest,
       self.CheckMethodIsNotAccessChecked(getattr(self.router, method_name))
 
 
+class RelDBCheckerTest(db_test_lib.RelationalDBEnabledMixin,
+                       acl_test_lib.AclTestMixin, test_lib.GRRBaseTest):
+  """Tests for the relational DB-based access checker."""
+
+  def setUp(self):
+    super(RelDBCheckerTest, self).setUp()
+    self.client_ids = sorted(self.SetupTestClientObjects(3))
+    self.checker = api_router.RelDBChecker()
+
+  def _CountApprovalReads(self):
+    return mock.patch.object(
+        data_store.REL_DB,
+        "ReadApprovalRequests",
+        wraps=data_store.REL_DB.ReadApprovalRequests)
+
+  def testApprovalsOfAllClientsAreReadAtOnce(self):
+    for client_id in self.client_ids:
+      self.RequestAndGrantClientApproval(client_id)
+
+    with self._CountApprovalReads() as read_mock:
+      for _ in range(2):
+        for client_id in self.client_ids:
+          self.checker.CheckClientAccess(self.token.username, client_id)
+
+    self.assertEqual(read_mock.call_count, 1)
+
+  def testOnlyApprovalsOfCheckedSubjectAreValidated(self):
+    for client_id in self.client_ids:
+      self.RequestAndGrantClientApproval(client_id)
+
+    with mock.patch.object(
+        approval_checks,
+        "CheckApprovalRequest",
+        wraps=approval_checks.CheckApprovalRequest) as check_mock:
+      for _ in range(2):
+        self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+    self.assertEqual(check_mock.call_count, 1)
+    self.assertEqual(check_mock.call_args[0][0].subject_id, self.client_ids[0])
+
+  def testApprovalGrantedByAnotherProcessIsNoticed(self):
+    approval_id = self.RequestClientApproval(self.client_ids[0])
+    self.RequestAndGrantClientApproval(self.client_ids[1])
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[1])
+
+    # Another process doesn't bump the change count of this one.
+    with mock.patch.object(approval_checks, "NotifyApprovalsChanged"):
+      self.GrantClientApproval(self.client_ids[0], approval_id=approval_id)
+
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+  def testApprovalsAreReadAgainAfterCacheTime(self):
+    self.RequestAndGrantClientApproval(self.client_ids[0])
+    now = rdfvalue.RDFDatetime.Now()
+    with test_lib.FakeTime(now):
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+    cache_time = rdfvalue.Duration.FromSeconds(
+        self.checker.approval_cache_time)
+    with self._CountApprovalReads() as read_mock:
+      with test_lib.FakeTime(now + cache_time - rdfvalue.Duration("1s")):
+        self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+      self.assertEqual(read_mock.call_count, 0)
+
+      with test_lib.FakeTime(now + cache_time + rdfvalue.Duration("1s")):
+        self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+      self.assertEqual(read_mock.call_count, 1)
+
+  def testAccessWithoutApprovalIsDenied(self):
+    self.RequestAndGrantClientApproval(self.client_ids[0])
+    self.RequestClientApproval(self.client_ids[1])
+
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+    with self.assertRaises(access_control.UnauthorizedAccess):
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[1])
+    with self.assertRaises(access_control.UnauthorizedAccess):
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[2])
+
+  def testGrantedApprovalIsNoticedAfterAccessWasChecked(self):
+    approval_id = self.RequestClientApproval(self.client_ids[0])
+    with self.assertRaises(access_control.UnauthorizedAccess):
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+    self.GrantClientApproval(self.client_ids[0], approval_id=approval_id)
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+  def testApprovalsAreReadAgainWhenTheyChange(self):
+    self.RequestAndGrantClientApproval(self.client_ids[0])
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+    change_count = approval_checks.GetApprovalsChangeCount(self.token.username)
+    self.RequestAndGrantClientApproval(self.client_ids[1])
+    self.assertGreater(
+        approval_checks.GetApprovalsChangeCount(self.token.username),
+        change_count)
+
+    with self._CountApprovalReads() as read_mock:
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+      self.checker.CheckClientAccess(self.token.username, self.client_ids[1])
+
+    # All the approvals are read again at once, no subject is read on its own.
+    self.assertEqual(read_mock.call_count, 1)
+    self.assertIsNone(read_mock.call_args[1].get("subject_id"))
+
+  def testExpiredApprovalIsNotServedFromCache(self):
+    self.RequestAndGrantClientApproval(self.client_ids[0])
+    self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+    expired = rdfvalue.RDFDatetime.Now() + rdfvalue.Duration("5w")
+    with test_lib.FakeTime(expired):
+      with self.assertRaises(access_control.UnauthorizedAccess):
+        self.checker.CheckClientAccess(self.token.username, self.client_ids[0])
+
+
 def main(argv):
   test_lib.main(argv)
 
@@ -12,7 +12,9 @@ import time
 from absl import app
 from future.builtins import range
 
+from grr_api_client import api as grr_api
 from grr_api_client import errors as grr_api_errors
+from grr_api_client import flow as grr_api_flow
 from grr_api_client import utils as grr_api_utils
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
@@ -141,15 +143,7 @@ class ApiClientLibFlowTest(api_e2e_test_lib.ApiE2ETest):
           result_flow.data.urn, token=self.token)
       self.assertEqual(result_flow_obj.args, args)
 
-  def testListResultsForListProcessesFlow(self):
-    process = rdf_client.Process(
-        pid=2,
-        ppid=1,
-        cmdline=["cmd.exe"],
-        exe="c:\\windows\\cmd.exe",
-        ctime=1333718907167083,
-        RSS_size=42)
-
+  def _RunListProcessesFlow(self, process):
     client_urn = self.SetupClient(0)
     flow_urn = flow_test_lib.TestFlowHelper(
         compatibility.GetName(processes.ListProcesses),
@@ -161,12 +155,36 @@ class ApiClientLibFlowTest(api_e2e_test_lib.ApiE2ETest):
     else:
       flow_id = flow_urn
 
-    result_flow = self.api.Client(client_id=client_urn.Basename()).Flow(flow_id)
+    return client_urn.Basename(), flow_id
+
+  def testListResultsForListProcessesFlow(self):
+    process = rdf_client.Process(
+        pid=2,
+        ppid=1,
+        cmdline=["cmd.exe"],
+        exe="c:\\windows\\cmd.exe",
+        ctime=1333718907167083,
+        RSS_size=42)
+    client_id, flow_id = self._RunListProcessesFlow(process)
+
+    result_flow = self.api.Client(client_id=client_id).Flow(flow_id)
     results = list(result_flow.ListResults())
 
     self.assertLen(results, 1)
     self.assertEqual(process.AsPrimitiveProto(), results[0].payload)
 
+  def testListResultsForListProcessesFlowWithJsonWireFormat(self):
+    process = rdf_client.Process(
+        pid=2, ppid=1, cmdline=["cmd.exe"], exe="c:\\windows\\cmd.exe")
+    client_id, flow_id = self._RunListProcessesFlow(process)
+
+    api = grr_api.InitHttp(
+        api_endpoint=self.endpoint, protobuf_wire_format=False)
+    results = list(api.Client(client_id=client_id).Flow(flow_id).ListResults())
+
+    self.assertLen(results, 1)
+    self.assertEqual(process.AsPrimitiveProto(), results[0].payload)
+
   def testWaitUntilDoneReturnsWhenFlowCompletes(self):
     client_urn = self.SetupClient(0)
 
@@ -227,6 +245,94 @@ class ApiClientLibFlowTest(api_e2e_test_lib.ApiE2ETest):
       with utils.Stubber(grr_api_utils, "DEFAULT_POLL_TIMEOUT", 1):
         result_flow.WaitUntilDone()
 
+  def testCreateFlowsConcurrently(self):
+    client_ids = [urn.Basename() for urn in self.SetupClients(5)]
+
+    def CreateFlow(client_id):
+      return self.api.Client(client_id).CreateFlow(
+          name=processes.ListProcesses.__name__)
+
+    result_flows = grr_api_utils.MapConcurrently(
+        CreateFlow, client_ids, max_workers=3)
+
+    self.assertEqual([f.client_id for f in result_flows], client_ids)
+    for client_id, result_flow in zip(client_ids, result_flows):
+      flows = list(self.api.Client(client_id).ListFlows())
+      self.assertEqual([f.flow_id for f in flows], [result_flow.flow_id])
+
+  def testThreadsUseOwnSessionsSharingConnections(self):
+    client_ids = [urn.Basename() for urn in self.SetupClients(3)]
+    connector = self.api._context.connector
+
+    started = []
+    all_started = threading.Event()
+
+    def GetSession(client_id):
+      # Calls wait for each other, so that every one runs in its own thread.
+      started.append(client_id)
+      if len(started) == len(client_ids):
+        all_started.set()
+      all_started.wait(10)
+
+      self.api.Client(client_id).Get()
+      return connector._session
+
+    sessions = grr_api_utils.MapConcurrently(
+        GetSession, client_ids, max_workers=len(client_ids))
+
+    self.assertLen(set(map(id, sessions)), len(client_ids))
+    for session in sessions:
+      self.assertIs(session.get_adapter(self.endpoint), connector._adapter)
+
+  def testMapConcurrentlyRaisesFirstError(self):
+    client_ids = [urn.Basename() for urn in self.SetupClients(2)]
+
+    with self.assertRaisesRegexp(grr_api_errors.Error, client_ids[0]):
+      grr_api_utils.MapConcurrently(
+          lambda client_id: self.api.Client(client_id).Flow("12345678").Get(),
+          client_ids)
+
+  def testWaitUntilAllDoneReturnsWhenAllFlowsComplete(self):
+    client_urns = self.SetupClients(3)
+
+    result_flows = []
+    for client_urn in client_urns:
+      flow_id = flow_test_lib.StartFlow(
+          processes.ListProcesses, client_id=client_urn)
+      result_flows.append(
+          self.api.Client(client_id=client_urn.Basename()).Flow(flow_id))
+
+    def ProcessFlows():
+      time.sleep(1)
+      client_mock = action_mocks.ListProcessesMock([])
+      for client_urn in client_urns:
+        flow_test_lib.FinishAllFlowsOnClient(
+            client_urn, client_mock=client_mock)
+
+    t = threading.Thread(target=ProcessFlows)
+    t.start()
+    try:
+      fs = grr_api_flow.WaitUntilAllDone(result_flows)
+    finally:
+      t.join()
+
+    self.assertEqual([f.flow_id for f in fs],
+                     [f.flow_id for f in result_flows])
+    for f in fs:
+      self.assertEqual(f.data.state, f.data.TERMINATED)
+
+  def testWaitUntilAllDoneRaisesWhenItTimesOut(self):
+    client_urn = self.SetupClient(0)
+
+    flow_id = flow_test_lib.StartFlow(
+        processes.ListProcesses, client_id=client_urn)
+    result_flow = self.api.Client(
+        client_id=client_urn.Basename()).Flow(flow_id)
+
+    with self.assertRaises(grr_api_errors.PollTimeoutError):
+      with utils.Stubber(grr_api_utils, "DEFAULT_POLL_TIMEOUT", 1):
+        grr_api_flow.WaitUntilAllDone([result_flow])
+
 
 def main(argv):
   test_lib.main(argv)
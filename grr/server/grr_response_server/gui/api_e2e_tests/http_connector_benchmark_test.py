@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""This tests the performance of the API client's HTTP connector."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from absl import app
+import portpicker
+import pytest
+
+from grr_api_client import api as grr_api
+from grr_api_client.connectors import http_connector
+from grr_response_server.gui import api_e2e_test_lib
+from grr_response_server.gui import wsgiapp_testlib
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import test_lib
+
+
+@pytest.mark.large
+class HttpConnectorBenchmark(api_e2e_test_lib.ApiE2ETest,
+                             benchmark_test_lib.AverageMicroBenchmarks):
+  """Test performance of many small API calls made through the connector."""
+
+  REPEATS = 1000
+
+  def setUp(self):
+    super(HttpConnectorBenchmark, self).setUp()
+
+    # Unlike the default test server, this one keeps connections alive.
+    port = portpicker.pick_unused_port()
+    server = wsgiapp_testlib.ServerThread(
+        port, keep_alive=True, name="http_connector_benchmark_server")
+    server.StartAndWaitUntilServing()
+    self.addCleanup(server.Stop)
+
+    self.connector = http_connector.HttpConnector(
+        api_endpoint="http://localhost:%s" % port)
+    self.addCleanup(self.connector.Close)
+    self.api = grr_api.GrrApi(connector=self.connector)
+
+    self.client_id = self.SetupClient(0).Basename()
+
+  def testSmallCalls(self):
+    """How fast can small API calls be made one after another."""
+
+    def GetClient():
+      return self.api.Client(self.client_id).Get()
+
+    def GetClientWithNewConnection():
+      # Dropping kept-alive connections after every call makes the connector
+      # behave as if it did not reuse them.
+      result = GetClient()
+      self.connector.Close()
+      return result
+
+    self.assertEqual(GetClient().client_id, self.client_id)
+
+    self.TimeIt(GetClientWithNewConnection, "New connection per call")
+    self.TimeIt(GetClient, "Pooled connections")
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -825,9 +825,8 @@ class ApiGetFlowFilesArchiveHandler(api_call_handler_base.ApiCallHandler):
       flow_id = str(args.flow_id)
       flow_obj = data_store.REL_DB.ReadFlowObject(client_id, flow_id)
       flow_api_object = ApiFlow().InitFromFlowObject(flow_obj)
-      flow_results = data_store.REL_DB.ReadFlowResults(client_id, flow_id, 0,
-                                                       db.MAX_COUNT)
-      flow_results = [r.payload for r in flow_results]
+      results = data_store.REL_DB.IterateFlowResults(client_id, flow_id)
+      flow_results = (r.payload for r in results)
       return flow_api_object, flow_results
     else:
       flow_urn = args.flow_id.ResolveClientFlowURN(args.client_id, token=token)
@@ -1434,23 +1433,14 @@ class ApiGetExportedFlowResultsHandler(api_call_handler_base.ApiCallHandler):
 
     def FetchFn(type_name):
       """Fetches all flow results of a given type."""
-      offset = 0
-      while True:
-        results = data_store.REL_DB.ReadFlowResults(
-            client_id,
-            flow_id,
-            offset=offset,
-            count=self._RESULTS_PAGE_SIZE,
-            with_type=type_name)
-        if not results:
-          break
-
-        for r in results:
-          msg = r.AsLegacyGrrMessage()
-          msg.source = client_id
-          yield msg
-
-        offset += self._RESULTS_PAGE_SIZE
+      for r in data_store.REL_DB.IterateFlowResults(
+          client_id,
+          flow_id,
+          with_type=type_name,
+          batch_size=self._RESULTS_PAGE_SIZE):
+        msg = r.AsLegacyGrrMessage()
+        msg.source = client_id
+        yield msg
 
     content_generator = instant_output_plugin.ApplyPluginToTypedCollection(
         plugin, types, FetchFn)
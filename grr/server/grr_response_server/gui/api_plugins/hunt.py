@@ -1249,6 +1249,63 @@ class ApiGetHuntClientCompletionStatsResult(rdf_structs.RDFProtoStruct):
     return result
 
 
+class HuntSummaryCache(object):
+  """A cache of relational hunt summaries computed from all the hunt flows.
+
+  Computing a summary (e.g. client completion stats) means aggregating every
+  flow of the hunt, which is slow for hunts with many clients. Summaries are
+  cached together with hunt counters read right before computing them and are
+  reused for as long as the counters stay the same. Counters change whenever a
+  hunt flow gets scheduled, completes, sends results or reports resources
+  usage, i.e. whenever the hunt makes progress.
+
+  Hunts making progress are the ones people keep reloading, so a summary is
+  also reused without looking at the counters for recompute_interval seconds
+  after it was computed or found up to date.
+  """
+
+  def __init__(self, max_size=100, recompute_interval=10):
+    self._store = utils.FastStore(max_size=max_size)
+    self.recompute_interval = recompute_interval
+
+  def Get(self, hunt_id, summary_name, compute_fn):
+    """Returns a hunt summary, computing it only if the hunt made progress.
+
+    Args:
+      hunt_id: An id of the hunt.
+      summary_name: A name identifying the kind of the summary.
+      compute_fn: A function computing the summary given the hunt id.
+
+    Returns:
+      The summary as returned by compute_fn.
+    """
+    key = (hunt_id, summary_name)
+    now = rdfvalue.RDFDatetime.Now().AsSecondsSinceEpoch()
+    try:
+      checked_at, cached_counters, summary = self._store.Get(key)
+    except KeyError:
+      checked_at, cached_counters, summary = None, None, None
+
+    if checked_at is not None and now - checked_at < self.recompute_interval:
+      return summary
+
+    counters = data_store.REL_DB.ReadHuntCounters(hunt_id)
+    # Counters are read before the summary, so a summary computed while the
+    # hunt progresses is never reused with counters that are newer than it.
+    if checked_at is None or cached_counters != counters:
+      summary = compute_fn(hunt_id)
+
+    self._store.Put(key, (now, counters, summary))
+    return summary
+
+  def Flush(self):
+    """Removes all cached summaries."""
+    self._store.Flush()
+
+
+HUNT_SUMMARY_CACHE = HuntSummaryCache()
+
+
 class ApiGetHuntClientCompletionStatsHandler(
     api_call_handler_base.ApiCallHandler):
   """Calculates hunt's client completion stats."""
@@ -1287,23 +1344,9 @@ class ApiGetHuntClientCompletionStatsHandler(
     if target_size <= 0:
       target_size = 1000
 
-    states_and_timestamps = data_store.REL_DB.ReadHuntFlowsStatesAndTimestamps(
-        str(args.hunt_id))
-
-    started_clients = []
-    completed_clients = []
-
-    # TODO(user): keeping using RDFURNs only to share _SampleClients and
-    # _Resample code between legacy and relational implementations.
-    # Get rid of RDFURNs as soon as AFF4 is gone.
-    for i, sat in enumerate(states_and_timestamps):
-      started_clients.append(rdfvalue.RDFURN(str(i), age=sat.create_time))
-      if sat.flow_state != rdf_flow_objects.Flow.FlowState.RUNNING:
-        completed_clients.append(
-            rdfvalue.RDFURN(str(i), age=sat.last_update_time))
-
-    (start_stats, complete_stats) = self._SampleClients(started_clients,
-                                                        completed_clients)
+    (start_stats, complete_stats) = HUNT_SUMMARY_CACHE.Get(
+        str(args.hunt_id), "client_completion_stats",
+        self._ComputeClientCompletionStats)
 
     if len(start_stats) > target_size:
       # start_stats and complete_stats are equally big, so resample both
@@ -1313,11 +1356,12 @@ class ApiGetHuntClientCompletionStatsHandler(
     return ApiGetHuntClientCompletionStatsResult().InitFromDataPoints(
         start_stats, complete_stats)
 
-  def _SampleClients(self, started_clients, completed_clients):
-    # immediately return on empty client data
-    if not started_clients and not completed_clients:
-      return ([], [])
+  def _ComputeClientCompletionStats(self, hunt_id):
+    """Computes client completion data points of a relational hunt."""
+    histogram = data_store.REL_DB.ReadHuntFlowsCompletionHistogram(hunt_id)
+    return self._CountClientsOverTime(histogram.started, histogram.completed)
 
+  def _SampleClients(self, started_clients, completed_clients):
     cdict = {}
     for client in started_clients:
       cdict.setdefault(client, []).append(client.age)
@@ -1326,26 +1370,34 @@ class ApiGetHuntClientCompletionStatsHandler(
     for client in completed_clients:
       fdict.setdefault(client, []).append(client.age)
 
-    cl_age = [min(x).AsSecondsSinceEpoch() for x in itervalues(cdict)]
-    fi_age = [min(x).AsSecondsSinceEpoch() for x in itervalues(fdict)]
+    cl_hist = collections.Counter(
+        min(x).AsSecondsSinceEpoch() for x in itervalues(cdict))
+    fi_hist = collections.Counter(
+        min(x).AsSecondsSinceEpoch() for x in itervalues(fdict))
+
+    return self._CountClientsOverTime(cl_hist, fi_hist)
 
-    cl_hist = {}
-    fi_hist = {}
+  def _CountClientsOverTime(self, cl_hist, fi_hist):
+    """Counts clients started and completed up to every given time.
 
-    for age in cl_age:
-      cl_hist.setdefault(age, 0)
-      cl_hist[age] += 1
+    Args:
+      cl_hist: A dictionary mapping times to numbers of clients started then.
+      fi_hist: A dictionary mapping times to numbers of clients completed then.
 
-    for age in fi_age:
-      fi_hist.setdefault(age, 0)
-      fi_hist[age] += 1
+    Returns:
+      A tuple of lists of (time, number of clients) data points of started and
+      completed clients.
+    """
+    # immediately return on empty client data
+    if not cl_hist and not fi_hist:
+      return ([], [])
 
-    t0 = min(cl_age) - 1
+    t0 = min(cl_hist) - 1
     times = [t0]
     cl = [0]
     fi = [0]
 
-    all_times = set(cl_age) | set(fi_age)
+    all_times = set(cl_hist) | set(fi_hist)
     cl_count = 0
     fi_count = 0
 
@@ -1447,9 +1499,7 @@ class ApiGetHuntFilesArchiveHandler(api_call_handler_base.ApiCallHandler):
           "on %s" % (hunt_api_object.name, hunt_api_object.hunt_id,
                      hunt_api_object.description, hunt_api_object.creator,
                      hunt_api_object.created))
-      # TODO(user): write general-purpose batcher for such cases.
-      results = data_store.REL_DB.ReadHuntResults(
-          hunt_id, offset=0, count=db.MAX_COUNT)
+      results = data_store.REL_DB.IterateHuntResults(hunt_id)
       return results, description
 
   def Handle(self, args, token=None):
@@ -1678,8 +1728,11 @@ class ApiGetHuntStatsHandler(api_call_handler_base.ApiCallHandler):
 
   def _HandleRelational(self, args, token=None):
     del token  # Unused.
-    stats = data_store.REL_DB.ReadHuntClientResourcesStats(str(args.hunt_id))
-    return ApiGetHuntStatsResult(stats=stats)
+    stats = HUNT_SUMMARY_CACHE.Get(
+        str(args.hunt_id), "client_resources_stats",
+        data_store.REL_DB.ReadHuntClientResourcesStats)
+    # Cached stats are shared between requests, so they must not be modified.
+    return ApiGetHuntStatsResult(stats=stats.Copy())
 
   def Handle(self, args, token=None):
     if data_store.RelationalDBEnabled():
@@ -2217,23 +2270,11 @@ class ApiGetExportedHuntResultsHandler(api_call_handler_base.ApiCallHandler):
 
     def FetchFn(type_name):
       """Fetches all hunt results of a given type."""
-      offset = 0
-      while True:
-        results = data_store.REL_DB.ReadHuntResults(
-            hunt_id,
-            offset=offset,
-            count=self._RESULTS_PAGE_SIZE,
-            with_type=type_name)
-
-        if not results:
-          break
-
-        for r in results:
-          msg = r.AsLegacyGrrMessage()
-          msg.source_urn = source_urn
-          yield msg
-
-        offset += self._RESULTS_PAGE_SIZE
+      for r in data_store.REL_DB.IterateHuntResults(
+          hunt_id, with_type=type_name, batch_size=self._RESULTS_PAGE_SIZE):
+        msg = r.AsLegacyGrrMessage()
+        msg.source_urn = source_urn
+        yield msg
 
     content_generator = instant_output_plugin.ApplyPluginToTypedCollection(
         plugin, types, FetchFn)
@@ -12,6 +12,7 @@ import zipfile
 
 from absl import app
 from future.builtins import range
+import mock
 import yaml
 
 from grr_response_core.lib import rdfvalue
@@ -30,6 +31,7 @@ from grr_response_server.gui import api_test_lib
 from grr_response_server.gui.api_plugins import hunt as hunt_plugin
 from grr_response_server.hunts import implementation
 from grr_response_server.output_plugins import test_plugins
+from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import flow_runner as rdf_flow_runner
 from grr_response_server.rdfvalues import output_plugin as rdf_output_plugin
 from grr.test_lib import action_mocks
@@ -845,6 +847,119 @@ class ApiGetExportedHuntResultsHandlerTest(test_lib.GRRBaseTest,
     ])
 
 
+class ApiGetHuntClientCompletionStatsHandlerTest(
+    db_test_lib.RelationalDBEnabledMixin, api_test_lib.ApiCallHandlerTest,
+    hunt_test_lib.StandardHuntTestMixin):
+  """Test for ApiGetHuntClientCompletionStatsHandler."""
+
+  def setUp(self):
+    super(ApiGetHuntClientCompletionStatsHandlerTest, self).setUp()
+
+    hunt_plugin.HUNT_SUMMARY_CACHE.Flush()
+    self.handler = hunt_plugin.ApiGetHuntClientCompletionStatsHandler()
+
+    self.hunt_id = self.CreateHunt(description="the hunt")
+    self.args = hunt_plugin.ApiGetHuntClientCompletionStatsArgs(
+        hunt_id=self.hunt_id)
+
+    self.client_ids = []
+    for i, start_time in enumerate([10, 20]):
+      client_id = self.SetupTestClientObject(i).client_id
+      with test_lib.FakeTime(start_time):
+        data_store.REL_DB.WriteFlowObject(
+            rdf_flow_objects.Flow(
+                client_id=client_id,
+                flow_id=self.hunt_id,
+                parent_hunt_id=self.hunt_id,
+                create_time=rdfvalue.RDFDatetime.Now(),
+                flow_state=rdf_flow_objects.Flow.FlowState.RUNNING))
+      self.client_ids.append(client_id)
+
+  def _FinishFlow(self, client_id, finish_time):
+    with test_lib.FakeTime(finish_time):
+      data_store.REL_DB.UpdateFlow(
+          client_id,
+          self.hunt_id,
+          flow_state=rdf_flow_objects.Flow.FlowState.FINISHED)
+
+  def _GetDataPoints(self):
+    result = self.handler.Handle(self.args, token=self.token)
+    return ([(p.x_value, p.y_value) for p in result.start_points],
+            [(p.x_value, p.y_value) for p in result.complete_points])
+
+  def testCountsStartedAndCompletedClients(self):
+    self._FinishFlow(self.client_ids[0], 30)
+
+    start_points, complete_points = self._GetDataPoints()
+    self.assertEqual(start_points, [(9, 0), (10, 1), (20, 2), (30, 2)])
+    self.assertEqual(complete_points, [(9, 0), (10, 0), (20, 0), (30, 1)])
+
+  def testReadsHuntFlowsOnlyWhenHuntMakesProgress(self):
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadHuntFlowsCompletionHistogram",
+        wraps=data_store.REL_DB.ReadHuntFlowsCompletionHistogram) as read_mock:
+      with test_lib.FakeTime(100):
+        first_data_points = self._GetDataPoints()
+      with test_lib.FakeTime(200):
+        self.assertEqual(self._GetDataPoints(), first_data_points)
+      self.assertEqual(read_mock.call_count, 1)
+
+      self._FinishFlow(self.client_ids[1], 30)
+      with test_lib.FakeTime(300):
+        _, complete_points = self._GetDataPoints()
+      self.assertEqual(read_mock.call_count, 2)
+
+    self.assertEqual(complete_points, [(9, 0), (10, 0), (20, 0), (30, 1)])
+
+  def testReusesStatsOfProgressingHuntForRecomputeInterval(self):
+    with test_lib.FakeTime(100):
+      first_data_points = self._GetDataPoints()
+
+    self._FinishFlow(self.client_ids[1], 30)
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadHuntCounters",
+        wraps=data_store.REL_DB.ReadHuntCounters) as read_mock:
+      with test_lib.FakeTime(105):
+        self.assertEqual(self._GetDataPoints(), first_data_points)
+      self.assertEqual(read_mock.call_count, 0)
+
+    with test_lib.FakeTime(110):
+      _, complete_points = self._GetDataPoints()
+    self.assertEqual(complete_points, [(9, 0), (10, 0), (20, 0), (30, 1)])
+
+
+@db_test_lib.DualDBTest
+class ApiGetHuntStatsHandlerTest(api_test_lib.ApiCallHandlerTest,
+                                 hunt_test_lib.StandardHuntTestMixin):
+  """Test for ApiGetHuntStatsHandler."""
+
+  def setUp(self):
+    super(ApiGetHuntStatsHandlerTest, self).setUp()
+
+    hunt_plugin.HUNT_SUMMARY_CACHE.Flush()
+    self.handler = hunt_plugin.ApiGetHuntStatsHandler()
+
+    self.client_ids = self.SetupClients(2)
+    self.hunt_id = self.StartHunt().Basename()
+    self.args = hunt_plugin.ApiGetHuntStatsArgs(hunt_id=self.hunt_id)
+
+  def _GetStats(self, now):
+    # Relational hunt stats are recomputed at most every few seconds.
+    with test_lib.FakeTime(now):
+      return self.handler.Handle(self.args, token=self.token).stats
+
+  def testStatsReflectHuntProgress(self):
+    self.assertEqual(self._GetStats(100).user_cpu_stats.num, 0)
+
+    self.RunHunt(client_ids=[self.client_ids[0]], failrate=-1)
+    self.assertEqual(self._GetStats(200).user_cpu_stats.num, 1)
+
+    self.RunHunt(client_ids=[self.client_ids[1]], failrate=-1)
+    self.assertEqual(self._GetStats(300).user_cpu_stats.num, 2)
+
+
 def main(argv):
   test_lib.main(argv)
 
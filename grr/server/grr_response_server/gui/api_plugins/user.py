@@ -749,6 +749,7 @@ class ApiCreateApprovalHandlerBase(api_call_handler_base.ApiCallHandler):
         approval_id=request.approval_id,
         requestor_username=token.username,
         grantor_username=token.username)
+    approval_checks.NotifyApprovalsChanged(token.username)
 
     # Only return the object if database reads are enabled, since
     # initializing the approval also requires reading its subject.
@@ -994,6 +995,7 @@ class ApiGrantApprovalHandlerBase(api_call_handler_base.ApiCallHandler):
     try:
       data_store.REL_DB.GrantApproval(args.username, args.approval_id,
                                       token.username)
+      approval_checks.NotifyApprovalsChanged(args.username)
 
       approval_obj = data_store.REL_DB.ReadApprovalRequest(
           args.username, args.approval_id)
@@ -4,17 +4,20 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import heapq
 import itertools
 import logging
 import os
 import re
 import stat
+import tempfile
 import zipfile
 
 
 from future.builtins import filter
 from future.builtins import range
 from future.builtins import str
+from future.moves import pickle
 from future.utils import iteritems
 from future.utils import iterkeys
 
@@ -25,6 +28,7 @@ from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
 from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_core.lib.util import collection
 from grr_response_core.lib.util import compatibility
 from grr_response_core.lib.util import context
 from grr_response_core.lib.util.compat import csv
@@ -48,6 +52,13 @@ from grr_response_server.rdfvalues import objects as rdf_objects
 # Files can only be accessed if their first path component is from this list.
 ROOT_FILES_WHITELIST = ["fs", "registry", "temp"]
 
+# Number of files for which the history is read at a time when building the
+# timeline.
+TIMELINE_HISTORY_BATCH_SIZE = 1000
+
+# Maximum number of timeline paths sorted in memory, see _ExternalSort.
+TIMELINE_PATHS_SORT_BUFFER_SIZE = 100000
+
 
 def ValidateVfsPath(path):
   """Validates a VFS path."""
@@ -1249,31 +1260,47 @@ def _GetTimelineStatEntriesRelDB(api_client_id, file_path, with_history=True):
   except db.UnknownPathError:
     return
 
-  path_infos = []
-  for path_info in itertools.chain(
+  path_infos = itertools.chain(
       [root_path_info],
-      data_store.REL_DB.ListDescendentPathInfos(client_id, path_type,
-                                                components),
-  ):
-    # TODO(user): this is to keep the compatibility with current
-    # AFF4 implementation. Check if this check is needed.
-    if path_info.directory:
-      continue
-
-    categorized_path = rdf_objects.ToCategorizedPath(path_info.path_type,
-                                                     path_info.components)
+      data_store.REL_DB.IterateDescendentPathInfos(client_id, path_type,
+                                                   components),
+  )
+  # TODO(user): this is to keep the compatibility with current
+  # AFF4 implementation. Check if this check is needed.
+  path_infos = (
+      path_info for path_info in path_infos if not path_info.directory)
+
+  # Descendent path infos are read in no particular order, so the paths are
+  # sorted by their components. Components are encoded explicitly, as pickle
+  # doesn't preserve string types on Python 2.
+  encoded_components = (
+      tuple(component.encode("utf-8") for component in path_info.components)
+      for path_info in path_infos)
+  sorted_components = (
+      tuple(component.decode("utf-8") for component in components)
+      for components in _ExternalSort(encoded_components,
+                                      TIMELINE_PATHS_SORT_BUFFER_SIZE))
+
+  # Path infos are read for a batch of paths at a time, so that only path
+  # infos (and histories) of a single batch are held in memory.
+  for components_list in collection.Batch(sorted_components,
+                                          TIMELINE_HISTORY_BATCH_SIZE):
     if with_history:
-      path_infos.append(path_info)
+      hist_path_infos = data_store.REL_DB.ReadPathInfosHistories(
+          client_id, path_type, components_list)
     else:
-      yield categorized_path, path_info.stat_entry, path_info.hash_entry
+      path_infos = data_store.REL_DB.ReadPathInfos(client_id, path_type,
+                                                   components_list)
+      hist_path_infos = {
+          components: [path_info] if path_info is not None else []
+          for components, path_info in iteritems(path_infos)
+      }
 
-  if with_history:
-    hist_path_infos = data_store.REL_DB.ReadPathInfosHistories(
-        client_id, path_type, [tuple(pi.components) for pi in path_infos])
-    for path_info in itertools.chain(*hist_path_infos.itervalues()):
-      categorized_path = rdf_objects.ToCategorizedPath(path_info.path_type,
-                                                       path_info.components)
-      yield categorized_path, path_info.stat_entry, path_info.hash_entry
+    for components in components_list:
+      for path_info in hist_path_infos[components]:
+        categorized_path = rdf_objects.ToCategorizedPath(
+            path_info.path_type, path_info.components)
+        yield categorized_path, path_info.stat_entry, path_info.hash_entry
 
 
 def _GetTimelineStatEntries(client_id, file_path, with_history=True):
@@ -1288,11 +1315,18 @@ def _GetTimelineStatEntries(client_id, file_path, with_history=True):
     yield v
 
 
-def _GetTimelineItems(client_id, file_path):
-  """Gets timeline items for a given client id and path."""
+def _GetTimelineEvents(client_id, file_path):
+  """Gets timeline events for a given client id and path.
 
-  items = []
+  Args:
+    client_id: An id of the client.
+    file_path: A VFS path of the timeline root.
 
+  Yields:
+    (timestamp, action, file path) tuples in no particular order, one for each
+    MAC time of every version of every file. Timestamps are in microseconds
+    since epoch, actions are ApiVfsTimelineItem.FileActionType values.
+  """
   for file_path, stat_entry, _ in _GetTimelineStatEntries(
       client_id, file_path, with_history=True):
 
@@ -1307,20 +1341,110 @@ def _GetTimelineItems(client_id, file_path):
       if timestamp is None:
         continue
 
-      item = ApiVfsTimelineItem()
-      item.timestamp = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(timestamp)
+      timestamp = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(timestamp)
 
-      # Remove aff4:/<client_id> to have a more concise path to the
-      # subject.
-      item.file_path = file_path
       if c == "m":
-        item.action = ApiVfsTimelineItem.FileActionType.MODIFICATION
+        action = ApiVfsTimelineItem.FileActionType.MODIFICATION
       elif c == "a":
-        item.action = ApiVfsTimelineItem.FileActionType.ACCESS
+        action = ApiVfsTimelineItem.FileActionType.ACCESS
       elif c == "c":
-        item.action = ApiVfsTimelineItem.FileActionType.METADATA_CHANGED
+        action = ApiVfsTimelineItem.FileActionType.METADATA_CHANGED
+
+      yield timestamp.AsMicrosecondsSinceEpoch(), action, file_path
 
-      items.append(item)
+
+def _WriteSortedRun(items):
+  """Sorts items and writes them to a temporary file."""
+  items.sort()
+
+  run = tempfile.TemporaryFile()
+  for item in items:
+    pickle.dump(item, run, pickle.HIGHEST_PROTOCOL)
+  run.seek(0)
+  return run
+
+
+def _ReadSortedRun(run):
+  """Reads items written by _WriteSortedRun."""
+  while True:
+    try:
+      yield pickle.load(run)
+    except EOFError:
+      return
+
+
+def _ExternalSort(items, buffer_size):
+  """Sorts items in bounded memory.
+
+  At most buffer_size items are sorted in memory at a time. If there are more
+  items, sorted runs of them are spilled to temporary files and merged.
+
+  Args:
+    items: An iterable of items to sort. Items are pickled when spilled, so
+      they should be plain primitives (numbers, byte strings and tuples of
+      them) that are cheap to pickle and keep their types when unpickled.
+    buffer_size: A maximum number of items to hold in memory.
+
+  Yields:
+    Items in ascending order.
+  """
+  runs = []
+  buffered = []
+  try:
+    for item in items:
+      buffered.append(item)
+      if len(buffered) >= buffer_size:
+        runs.append(_WriteSortedRun(buffered))
+        buffered = []
+
+    buffered.sort()
+    for item in heapq.merge(buffered, *[_ReadSortedRun(r) for r in runs]):
+      yield item
+  finally:
+    for run in runs:
+      run.close()
+
+
+def _SortTimelineEvents(events, buffer_size):
+  """Sorts timeline events from the newest to the oldest in bounded memory.
+
+  See _ExternalSort for details.
+
+  Args:
+    events: An iterable of (timestamp, action, file path) tuples.
+    buffer_size: A maximum number of events to hold in memory.
+
+  Yields:
+    (timestamp, action, file path) tuples sorted by timestamp in descending
+    order. Events with equal timestamps are yielded in their original order.
+  """
+  # Negated timestamps put the newest events first and unique indices keep
+  # the original order of events with equal timestamps. Actions are stored as
+  # integers and paths are encoded explicitly, as pickle doesn't preserve
+  # string types on Python 2.
+  keys = ((-timestamp, index, int(action), file_path.encode("utf-8"))
+          for index, (timestamp, action, file_path) in enumerate(events))
+
+  action_type = ApiVfsTimelineItem.FileActionType
+  for negated_timestamp, _, action, file_path in _ExternalSort(
+      keys, buffer_size):
+    yield (-negated_timestamp, action_type.FromInt(action),
+           file_path.decode("utf-8"))
+
+
+def _GetTimelineItems(client_id, file_path):
+  """Gets timeline items for a given client id and path."""
+
+  items = []
+
+  for timestamp, action, file_path in _GetTimelineEvents(client_id, file_path):
+    item = ApiVfsTimelineItem()
+    item.timestamp = rdfvalue.RDFDatetime(timestamp)
+    # Remove aff4:/<client_id> to have a more concise path to the
+    # subject.
+    item.file_path = file_path
+    item.action = action
+    items.append(item)
 
   return sorted(items, key=lambda x: x.timestamp, reverse=True)
 
@@ -1371,31 +1495,36 @@ class ApiGetVfsTimelineAsCsvHandler(api_call_handler_base.ApiCallHandler):
 
   args_type = ApiGetVfsTimelineAsCsvArgs
   CHUNK_SIZE = 1000
+  # Maximum number of timeline events sorted in memory, see
+  # _SortTimelineEvents.
+  SORT_BUFFER_SIZE = 100000
 
-  def _GenerateDefaultExport(self, items):
+  def _GenerateDefaultExport(self, events):
     writer = csv.Writer()
 
     # Write header. Since we do not stick to a specific timeline format, we
     # can export a format suited for TimeSketch import.
     writer.WriteRow([u"Timestamp", u"Datetime", u"Message", u"Timestamp_desc"])
 
-    for start in range(0, len(items), self.CHUNK_SIZE):
-      for item in items[start:start + self.CHUNK_SIZE]:
+    for chunk in collection.Batch(events, self.CHUNK_SIZE):
+      for timestamp, action, file_path in chunk:
         writer.WriteRow([
-            str(item.timestamp.AsMicrosecondsSinceEpoch()),
-            str(item.timestamp),
-            item.file_path,
-            str(item.action),
+            str(timestamp),
+            str(rdfvalue.RDFDatetime(timestamp)),
+            file_path,
+            str(action),
         ])
 
       yield writer.Content().encode("utf-8")
       writer = csv.Writer()
 
   def _HandleDefaultFormat(self, args):
-    items = _GetTimelineItems(args.client_id, args.file_path)
+    events = _SortTimelineEvents(
+        _GetTimelineEvents(args.client_id, args.file_path),
+        self.SORT_BUFFER_SIZE)
     return api_call_handler_base.ApiBinaryStream(
         "%s_%s_timeline" % (args.client_id, os.path.basename(args.file_path)),
-        content_generator=self._GenerateDefaultExport(items))
+        content_generator=self._GenerateDefaultExport(events))
 
   def _GenerateBodyExport(self, file_infos):
     for path, st, hash_v in file_infos:
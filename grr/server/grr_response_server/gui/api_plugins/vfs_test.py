@@ -854,6 +854,47 @@ class ApiGetVfsTimelineAsCsvHandlerTest(api_test_lib.ApiCallHandlerTest,
 
         self.assertEqual(next_chunk, expected_csv.encode("utf-8"))
 
+  def testTimelineIsSortedWhenItDoesNotFitInSortBuffer(self):
+    args = vfs_plugin.ApiGetVfsTimelineAsCsvArgs(
+        client_id=self.client_id, file_path=self.folder_path)
+    content = b"".join(
+        self.handler.Handle(args, token=self.token).GenerateContent())
+
+    self.handler.SORT_BUFFER_SIZE = 2
+    spilled_content = b"".join(
+        self.handler.Handle(args, token=self.token).GenerateContent())
+
+    self.assertEqual(spilled_content, content)
+
+    rows = content.decode("utf-8").splitlines()
+    self.assertLen(rows, 6)
+    timestamps = [int(row.split(",")[0]) for row in rows[1:]]
+    self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+  def testSpilledTimelineKeepsOrderOfEventsWithEqualTimestamps(self):
+    for name in [u"c.txt", u"b.txt", u"中.txt"]:
+      stat_entry = rdf_client_fs.StatEntry(st_mtime=42, st_atime=42)
+      stat_entry.pathspec.path = (self.folder_path + u"/" +
+                                  name)[len(self.category_path):]
+      stat_entry.pathspec.pathtype = rdf_paths.PathSpec.PathType.OS
+      self.SetupFileMetadata(
+          self.client_id,
+          self.folder_path + u"/" + name,
+          stat_entry=stat_entry,
+          hash_entry=None)
+
+    args = vfs_plugin.ApiGetVfsTimelineAsCsvArgs(
+        client_id=self.client_id, file_path=self.folder_path)
+    content = b"".join(
+        self.handler.Handle(args, token=self.token).GenerateContent())
+
+    self.handler.SORT_BUFFER_SIZE = 3
+    spilled_content = b"".join(
+        self.handler.Handle(args, token=self.token).GenerateContent())
+
+    self.assertEqual(spilled_content, content)
+    self.assertIn(u"中.txt".encode("utf-8"), spilled_content)
+
   def testEmptyTimelineIsReturnedOnNonexistantPath(self):
     args = vfs_plugin.ApiGetVfsTimelineAsCsvArgs(
         client_id=self.client_id, file_path="fs/os/non-existent/file/path")
@@ -896,6 +937,38 @@ class ApiGetVfsTimelineAsCsvHandlerTest(api_test_lib.ApiCallHandlerTest,
     expected_csv = u"71757578|fs/os/foo/bar|0|----------|0|0|1337|0|0|0|0\n"
     self.assertEqual(content, expected_csv.encode("utf-8"))
 
+  @mock.patch.object(vfs_plugin, "TIMELINE_PATHS_SORT_BUFFER_SIZE", 2)
+  def testTimelineInBodyFormatIsSortedByPathComponents(self):
+    client_urn = self.SetupClient(1)
+    # Sorted by components, "a b" comes after "a/b", unlike in string order.
+    for path in [u"a b", u"a/b", u"中", u"a/a"]:
+      stat_entry = rdf_client_fs.StatEntry(st_size=1)
+      stat_entry.pathspec.path = u"foo/" + path
+      stat_entry.pathspec.pathtype = rdf_paths.PathSpec.PathType.OS
+      self.SetupFileMetadata(
+          client_urn,
+          u"fs/os/foo/" + path,
+          stat_entry=stat_entry,
+          hash_entry=None)
+
+    args = vfs_plugin.ApiGetVfsTimelineAsCsvArgs(
+        client_id=client_urn,
+        file_path=u"fs/os/foo",
+        format=vfs_plugin.ApiGetVfsTimelineAsCsvArgs.Format.BODY)
+    result = self.handler.Handle(args, token=self.token)
+
+    rows = b"".join(result.GenerateContent()).decode("utf-8").splitlines()
+    paths = [row.split(u"|")[1] for row in rows]
+    self.assertCountEqual(paths, [
+        u"fs/os/foo/a/a", u"fs/os/foo/a/b", u"fs/os/foo/a b", u"fs/os/foo/中"
+    ])
+    # AFF4 lists files in no particular order.
+    if data_store.RelationalDBEnabled():
+      self.assertEqual(paths, [
+          u"fs/os/foo/a/a", u"fs/os/foo/a/b", u"fs/os/foo/a b",
+          u"fs/os/foo/中"
+      ])
+
   def testTimelineEntriesWithHashOnlyAreIgnoredOnBodyExport(self):
     client_urn = self.SetupClient(1)
     hash_entry = rdf_crypto.Hash(sha256=b"quux")
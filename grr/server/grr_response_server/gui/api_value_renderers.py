@@ -85,7 +85,58 @@ class ApiValueRenderer(with_metaclass(registry.MetaclassRegistry, object)):
   value_class = object
 
   _type_list_cache = {}
+  # Maps value classes to classes of renderers rendering them.
   _renderers_cache = {}
+  # Maps limit_lists values to dictionaries mapping value classes to render
+  # functions, see _GetRenderFunctions.
+  _render_functions_cache = {}
+
+  @classmethod
+  def _GetRendererClass(cls, value_cls):
+    """Returns the most specific renderer class for a given value class."""
+    try:
+      return cls._renderers_cache[value_cls]
+    except KeyError:
+      pass
+
+    candidates = []
+    for candidate in itervalues(ApiValueRenderer.classes):
+      if candidate.value_class:
+        candidate_class = candidate.value_class
+      else:
+        continue
+
+      if issubclass(value_cls, candidate_class):
+        candidates.append((candidate, candidate_class))
+
+    if not candidates:
+      raise RuntimeError("No renderer found for value %s." % value_cls.__name__)
+
+    candidates = sorted(
+        candidates, key=lambda candidate: len(candidate[1].mro()))
+    renderer_cls = candidates[-1][0]
+    cls._renderers_cache[value_cls] = renderer_cls
+
+    return renderer_cls
+
+  @classmethod
+  def _GetRenderFunctions(cls, limit_lists):
+    """Returns a dispatch table of render functions for given rendering args.
+
+    Renderers hold no state besides their rendering args, so a single renderer
+    instance per value class is shared by all the renderings.
+
+    Args:
+      limit_lists: Rendering args, see __init__.
+
+    Returns:
+      A dictionary mapping value classes to RenderValue methods of renderers
+      rendering them. The dictionary is filled as new value classes are seen.
+    """
+    try:
+      return cls._render_functions_cache[limit_lists]
+    except KeyError:
+      return cls._render_functions_cache.setdefault(limit_lists, {})
 
   @classmethod
   def GetRendererForValueOrClass(cls, value, limit_lists=-1):
@@ -96,44 +147,34 @@ class ApiValueRenderer(with_metaclass(registry.MetaclassRegistry, object)):
     else:
       value_cls = value.__class__
 
-    cache_key = "%s_%d" % (value_cls.__name__, limit_lists)
+    renderer_cls = cls._GetRendererClass(value_cls)
+    return renderer_cls(limit_lists=limit_lists)
+
+  @classmethod
+  def GetRenderFunction(cls, value_cls, limit_lists=-1):
+    """Returns a function rendering values of a given class."""
+    render_functions = cls._GetRenderFunctions(limit_lists)
     try:
-      renderer_cls = cls._renderers_cache[cache_key]
+      return render_functions[value_cls]
     except KeyError:
-      candidates = []
-      for candidate in itervalues(ApiValueRenderer.classes):
-        if candidate.value_class:
-          candidate_class = candidate.value_class
-        else:
-          continue
-
-        if inspect.isclass(value):
-          if issubclass(value_cls, candidate_class):
-            candidates.append((candidate, candidate_class))
-        else:
-          if isinstance(value, candidate_class):
-            candidates.append((candidate, candidate_class))
-
-      if not candidates:
-        raise RuntimeError(
-            "No renderer found for value %s." % value.__class__.__name__)
-
-      candidates = sorted(
-          candidates, key=lambda candidate: len(candidate[1].mro()))
-      renderer_cls = candidates[-1][0]
-      cls._renderers_cache[cache_key] = renderer_cls
-
-    return renderer_cls(limit_lists=limit_lists)
+      renderer_cls = cls._GetRendererClass(value_cls)
+      render_fn = renderer_cls(limit_lists=limit_lists).RenderValue
+      return render_functions.setdefault(value_cls, render_fn)
 
   def __init__(self, limit_lists=-1):
     super(ApiValueRenderer, self).__init__()
 
     self.limit_lists = limit_lists
+    self._render_functions = self._GetRenderFunctions(limit_lists)
 
   def _PassThrough(self, value):
-    renderer = ApiValueRenderer.GetRendererForValueOrClass(
-        value, limit_lists=self.limit_lists)
-    return renderer.RenderValue(value)
+    try:
+      render_fn = self._render_functions[value.__class__]
+    except KeyError:
+      render_fn = ApiValueRenderer.GetRenderFunction(
+          value.__class__, limit_lists=self.limit_lists)
+
+    return render_fn(value)
 
   def _IncludeTypeInfo(self, result, original_value):
     return dict(type=original_value.__class__.__name__, value=result)
@@ -441,10 +482,24 @@ class ApiRDFProtoStructRenderer(ApiValueRenderer):
   value_processors = []
   descriptor_processors = []
 
+  # Maps struct classes to tuples of their field names.
+  _field_names_cache = {}
+
+  @classmethod
+  def _GetFieldNames(cls, value_cls):
+    try:
+      return cls._field_names_cache[value_cls]
+    except KeyError:
+      field_names = tuple(desc.name for desc in value_cls.type_infos)
+      return cls._field_names_cache.setdefault(value_cls, field_names)
+
   def RenderValue(self, value):
-    result = value.AsDict()
-    for k, v in iteritems(result):
-      result[k] = self._PassThrough(v)
+    # Equivalent to rendering every item of value.AsDict(), without building
+    # the intermediate dictionary.
+    result = {}
+    for name in self._GetFieldNames(value.__class__):
+      if value.HasField(name):
+        result[name] = self._PassThrough(value.Get(name))
 
     for processor in self.value_processors:
       result = processor(self, result, value)
@@ -573,9 +628,9 @@ def RenderValue(value, limit_lists=-1):
   if value is None:
     return None
 
-  renderer = ApiValueRenderer.GetRendererForValueOrClass(
-      value, limit_lists=limit_lists)
-  return renderer.RenderValue(value)
+  render_fn = ApiValueRenderer.GetRenderFunction(
+      value.__class__, limit_lists=limit_lists)
+  return render_fn(value)
 
 
 def BuildTypeDescriptor(value_cls):
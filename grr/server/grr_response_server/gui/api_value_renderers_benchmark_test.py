@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""This tests the performance of rendering values in the legacy API format."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from absl import app
+from future.builtins import range
+import pytest
+
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
+from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
+from grr_response_core.lib.rdfvalues import file_finder as rdf_file_finder
+from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr_response_server.gui import api_value_renderers
+from grr_response_server.gui.api_plugins import flow as api_flow
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import test_lib
+
+
+def _StatEntry(i):
+  return rdf_client_fs.StatEntry(
+      pathspec=rdf_paths.PathSpec(
+          path="/home/<user>/file%d" % i, pathtype="OS"),
+      st_mode=0o100644,
+      st_size=i,
+      st_mtime=1000 + i)
+
+
+def _FileFinderResult(i):
+  return rdf_file_finder.FileFinderResult(
+      stat_entry=_StatEntry(i),
+      matches=[rdf_client.BufferReference(offset=i, length=3, data=b"foo")],
+      hash_entry=rdf_crypto.Hash(sha256=b"\x00" * 32, num_bytes=i))
+
+
+@pytest.mark.large
+class ApiValueRenderersBenchmark(benchmark_test_lib.AverageMicroBenchmarks):
+  """Test performance of rendering flow results in the legacy format."""
+
+  REPEATS = 10
+  RESULTS_COUNT = 1000
+
+  def _BuildResults(self, payload_fn):
+    items = []
+    for i in range(self.RESULTS_COUNT):
+      payload = payload_fn(i)
+      item = api_flow.ApiFlowResult(payload_type=payload.__class__.__name__)
+      item.payload = payload
+      item.timestamp = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(i)
+      items.append(item)
+
+    return api_flow.ApiListFlowResultsResult(
+        items=items, total_count=self.RESULTS_COUNT)
+
+  def _TimeRendering(self, payload_fn, name):
+    result = self._BuildResults(payload_fn)
+
+    rendered = api_value_renderers.RenderValue(result)
+    self.assertLen(rendered["value"]["items"], self.RESULTS_COUNT)
+
+    self.TimeIt(lambda: api_value_renderers.RenderValue(result),
+                "%s (%d results)" % (name, self.RESULTS_COUNT))
+
+  def testRenderFlowResults(self):
+    """How fast can a page of flow results be rendered."""
+    self._TimeRendering(_StatEntry, "StatEntry")
+    self._TimeRendering(_FileFinderResult, "FileFinderResult")
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
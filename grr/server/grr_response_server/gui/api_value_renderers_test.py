@@ -131,6 +131,40 @@ class ApiGrrMessageRendererTest(test_lib.GRRBaseTest):
     self.assertEqual(data, model_data)
 
 
+class ApiValueRendererDispatchTest(test_lib.GRRBaseTest):
+  """Test for choosing renderers of values."""
+
+  def testRenderersAreChosenByClassNotByClassName(self):
+    int_cls = type(str("Sample"), (int,), {})
+    list_cls = type(str("Sample"), (list,), {})
+
+    data = api_value_renderers.RenderValue(int_cls(42))
+    self.assertEqual(data["value"], 42)
+
+    data = api_value_renderers.RenderValue(list_cls([42]))
+    self.assertLen(data, 1)
+    self.assertEqual(data[0]["value"], 42)
+
+  def testRenderersOfDifferentListLimitsAreNotShared(self):
+    sample = ApiRDFProtoStructRendererSample(index=0, values=["foo", "bar"])
+
+    data = api_value_renderers.RenderValue(sample, limit_lists=0)
+    self.assertEqual(data["value"]["values"], "<lists are omitted>")
+
+    data = api_value_renderers.RenderValue(sample, limit_lists=-1)
+    self.assertLen(data["value"]["values"], 2)
+
+  def testRenderFunctionIsReused(self):
+    render_fn = api_value_renderers.ApiValueRenderer.GetRenderFunction(
+        ApiRDFProtoStructRendererSample)
+
+    self.assertIs(
+        api_value_renderers.ApiValueRenderer.GetRenderFunction(
+            ApiRDFProtoStructRendererSample), render_fn)
+    self.assertIsInstance(render_fn.__self__,
+                          api_value_renderers.ApiRDFProtoStructRenderer)
+
+
 def main(argv):
   test_lib.main(argv)
 
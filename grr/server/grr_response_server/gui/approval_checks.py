@@ -4,6 +4,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
+import threading
+
 from grr_response_core import config
 from grr_response_core.lib import rdfvalue
 from grr_response_server import access_control
@@ -12,6 +15,24 @@ from grr_response_server.authorization import client_approval_auth
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
+# Number of approval changes per requestor seen by this process. Access
+# checkers caching granted approvals use it to notice changes.
+_approval_changes = collections.Counter()
+_approval_changes_lock = threading.Lock()
+
+
+def NotifyApprovalsChanged(username):
+  """Notifies access checkers that approvals of a given user changed."""
+  with _approval_changes_lock:
+    _approval_changes[username] += 1
+
+
+def GetApprovalsChangeCount(username):
+  """Returns the number of approval changes of a given user seen so far."""
+  with _approval_changes_lock:
+    return _approval_changes[username]
+
+
 def BuildLegacySubject(subject_id, approval_type):
   """Builds a legacy AFF4 urn string for a given subject and approval type."""
   at = rdf_objects.ApprovalRequest.ApprovalType
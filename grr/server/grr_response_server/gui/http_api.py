@@ -4,10 +4,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import hashlib
 import itertools
 import logging
 import time
 import traceback
+import zlib
 
 
 from future.builtins import str
@@ -15,6 +17,7 @@ from future.moves.urllib import parse as urlparse
 from future.utils import iteritems
 from typing import Text
 from werkzeug import exceptions as werkzeug_exceptions
+from werkzeug import http as werkzeug_http
 from werkzeug import routing
 from werkzeug import wrappers as werkzeug_wrappers
 
@@ -25,6 +28,7 @@ from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
 from grr_response_core.lib.util import precondition
+from grr_response_core.lib.util import random
 from grr_response_core.lib.util.compat import json
 from grr_response_core.stats import stats_collector_instance
 from grr_response_server import access_control
@@ -217,6 +221,74 @@ class JSONEncoderWithRDFPrimitivesSupport(json.Encoder):
     return super(JSONEncoderWithRDFPrimitivesSupport, self).default(obj)
 
 
+# XSSI protection prefix of all JSON responses.
+_XSSI_PREFIX = ")]}'\n"
+
+
+def _DumpJson(rendered_data):
+  """Dumps a JSON-compatible structure into a JSON text with escaped tags."""
+  # To avoid IE content sniffing problems, escape the tags. Otherwise somebody
+  # may send a link with malicious payload that will be opened in IE (which
+  # does content sniffing and doesn't respect Content-Disposition header) and
+  # IE will treat the document as html and executre arbitrary JS that was
+  # passed with the payload.
+  str_data = json.Dump(
+      rendered_data, encoder=JSONEncoderWithRDFPrimitivesSupport)
+  return str_data.replace("<", r"\u003c").replace(">", r"\u003e")
+
+
+def RenderJsonResponseBody(rendered_data):
+  """Renders a JSON-compatible structure as a body of an API response.
+
+  Args:
+    rendered_data: A JSON-compatible Python structure (possibly containing
+      RDF primitives) to render.
+
+  Returns:
+    A JSON text prefixed with an XSSI protection string.
+  """
+  return _XSSI_PREFIX + _DumpJson(rendered_data)
+
+
+def GenerateJsonResponseBody(rendered_data, items_placeholder, items):
+  """Generates a body of an API response with a list rendered item by item.
+
+  The output is equivalent to the output of RenderJsonResponseBody for the
+  same structure with the placeholder replaced by a list of the items, but
+  only a single rendered item is kept in memory at a time.
+
+  Args:
+    rendered_data: A JSON-compatible Python structure containing
+      `items_placeholder` as one of its values.
+    items_placeholder: A unique string marking the place of the list.
+    items: An iterable of JSON-compatible Python structures to render as
+      elements of the list.
+
+  Yields:
+    UTF-8 encoded chunks of a JSON text prefixed with an XSSI protection
+    string.
+  """
+  head, tail = _DumpJson(rendered_data).split(
+      _DumpJson(items_placeholder), 1)
+
+  # Items are indented one level deeper than the line holding the list.
+  line = head[head.rfind("\n") + 1:]
+  list_indent = line[:len(line) - len(line.lstrip(" "))]
+  item_separator = "\n" + list_indent + "  "
+
+  yield (_XSSI_PREFIX + head + "[").encode("utf-8")
+
+  has_items = False
+  for item in items:
+    prefix = item_separator if not has_items else "," + item_separator
+    has_items = True
+    yield (prefix + _DumpJson(item).replace("\n", item_separator)).encode(
+        "utf-8")
+
+  closing = "\n" + list_indent + "]" if has_items else "]"
+  yield (closing + tail).encode("utf-8")
+
+
 class JsonMode(object):
   """Enum class for various JSON encoding modes."""
   PROTO3_JSON_MODE = 0
@@ -241,6 +313,36 @@ def GetRequestFormatMode(request, method_metadata):
   return JsonMode.GRR_JSON_MODE
 
 
+# Content type of responses with results serialized as binary protos. Clients
+# have to list it in the Accept header to get such a response instead of JSON.
+PROTOBUF_CONTENT_TYPE = "application/x-protobuf"
+
+
+def IsProtobufResponseRequested(request):
+  """Checks if a given request accepts binary protobuf responses."""
+  accept = request.headers.get("Accept", "")
+  mime_types = [value.split(";")[0].strip() for value in accept.split(",")]
+  return PROTOBUF_CONTENT_TYPE in mime_types
+
+
+def AcceptsGzipEncoding(request):
+  """Checks if a given request accepts gzip-compressed responses."""
+  accept_encoding = werkzeug_http.parse_accept_header(
+      request.headers.get("Accept-Encoding", ""))
+  return accept_encoding.quality("gzip") > 0
+
+
+def _GzipChunks(chunks):
+  """Compresses given byte chunks into a stream of gzip-formatted chunks."""
+  # wbits=31 makes zlib write the gzip header and trailer.
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+  for chunk in chunks:
+    compressed_chunk = compressor.compress(chunk)
+    if compressed_chunk:
+      yield compressed_chunk
+  yield compressor.flush()
+
+
 class HttpRequestHandler(object):
   """Handles HTTP requests."""
 
@@ -281,8 +383,10 @@ class HttpRequestHandler(object):
       return dict(status="OK")
 
     if format_mode == JsonMode.PROTO3_JSON_MODE:
-      json_data = json_format.MessageToJson(result.AsPrimitiveProto())
-      return json.Parse(json_data.decode("utf-8"))
+      # The proto is converted straight to a Python structure that is dumped
+      # only once in _BuildResponse. Going through json_format.MessageToJson
+      # would serialize the whole result to text and parse it back first.
+      return json_format.MessageToDict(result.AsPrimitiveProto())
     elif format_mode == JsonMode.GRR_ROOT_TYPES_STRIPPED_JSON_MODE:
       result_dict = {}
       for field, value in result.ListSetFields():
@@ -302,6 +406,62 @@ class HttpRequestHandler(object):
     else:
       raise ValueError("Invalid format_mode: %s" % format_mode)
 
+  def _FormatItemAsJson(self, item, format_mode=None):
+    """Formats an item of a list result the way _FormatResultAsJson would."""
+    if format_mode == JsonMode.PROTO3_JSON_MODE:
+      return json_format.MessageToDict(item.AsPrimitiveProto())
+
+    rendered_data = api_value_renderers.RenderValue(item)
+    if format_mode == JsonMode.GRR_TYPE_STRIPPED_JSON_MODE:
+      return api_value_renderers.StripTypeInfo(rendered_data)
+    return rendered_data
+
+  def _StreamFormattedResultAsJson(self, result, format_mode=None):
+    """Generates a JSON body of a list result item by item.
+
+    Args:
+      result: An RDFProtoStruct with a repeated "items" field of structs.
+        The items are taken out of the result.
+      format_mode: JSON format mode to use.
+
+    Returns:
+      A generator of UTF-8 encoded chunks of the response body.
+    """
+    items = list(result.items)
+    result.items = None
+
+    # The "items" field goes first, as it is the first field of list results.
+    items_placeholder = "streamed-items-%016x" % random.UInt64()
+    fields = {"items": items_placeholder}
+
+    rendered_data = self._FormatResultAsJson(result, format_mode=format_mode)
+    if format_mode == JsonMode.GRR_JSON_MODE:
+      fields.update(rendered_data["value"])
+      rendered_data["value"] = fields
+    else:
+      fields.update(rendered_data)
+      rendered_data = fields
+
+    rendered_items = (
+        self._FormatItemAsJson(item, format_mode=format_mode) for item in items)
+    return GenerateJsonResponseBody(rendered_data, items_placeholder,
+                                    rendered_items)
+
+  @staticmethod
+  def IsStreamableResult(result):
+    """Checks if the result is a list that can be rendered item by item."""
+    if not isinstance(result, rdf_structs.RDFProtoStruct):
+      return False
+
+    type_info = result.type_infos.get("items")
+    if not (isinstance(type_info, rdf_structs.ProtoList) and
+            isinstance(type_info.delegate, rdf_structs.ProtoEmbedded)):
+      return False
+
+    # Empty repeated fields are not rendered at all. Small lists are rendered
+    # as a whole, so that their responses can be cached and compressed.
+    return len(result.items) > config.CONFIG["API.ListStreamingThreshold"]
+
   @staticmethod
   def CallApiHandler(handler, args, token=None):
     """Handles API call to a given handler with given args and token."""
@@ -332,16 +492,7 @@ class HttpRequestHandler(object):
                      no_audit_log=False):
     """Builds HTTPResponse object from rendered data and HTTP status."""
 
-    # To avoid IE content sniffing problems, escape the tags. Otherwise somebody
-    # may send a link with malicious payload that will be opened in IE (which
-    # does content sniffing and doesn't respect Content-Disposition header) and
-    # IE will treat the document as html and executre arbitrary JS that was
-    # passed with the payload.
-    str_data = json.Dump(
-        rendered_data, encoder=JSONEncoderWithRDFPrimitivesSupport)
-    # XSSI protection and tags escaping
-    rendered_data = ")]}'\n" + str_data.replace("<", r"\u003c").replace(
-        ">", r"\u003e")
+    rendered_data = RenderJsonResponseBody(rendered_data)
 
     response = werkzeug_wrappers.Response(
         rendered_data,
@@ -366,7 +517,35 @@ class HttpRequestHandler(object):
 
     return response
 
-  def _BuildStreamingResponse(self, binary_stream, method_name=None):
+  def _BuildProtobufResponse(self,
+                             result,
+                             method_name=None,
+                             token=None,
+                             no_audit_log=False):
+    """Builds HTTPResponse object with the result serialized as binary proto."""
+    if result is None:
+      serialized_result = b""
+    else:
+      serialized_result = result.AsPrimitiveProto().SerializeToString()
+
+    response = werkzeug_wrappers.Response(
+        serialized_result, status=200, content_type=PROTOBUF_CONTENT_TYPE)
+    response.headers["Content-Disposition"] = "attachment; filename=response.pb"
+    response.headers["X-Content-Type-Options"] = "nosniff"
+
+    if token and token.reason:
+      response.headers["X-GRR-Reason"] = utils.SmartStr(token.reason)
+    if method_name:
+      response.headers["X-API-Method"] = method_name
+    if no_audit_log:
+      response.headers["X-No-Log"] = "True"
+
+    return response
+
+  def _BuildStreamingResponse(self,
+                              binary_stream,
+                              method_name=None,
+                              content_type="binary/octet-stream"):
     """Builds HTTPResponse object for streaming."""
     precondition.AssertType(method_name, Text)
 
@@ -375,15 +554,13 @@ class HttpRequestHandler(object):
     # is much higher.
     content = binary_stream.GenerateContent()
     try:
-      peek = content.next()
+      peek = next(content)
       stream = itertools.chain([peek], content)
     except StopIteration:
       stream = []
 
     response = werkzeug_wrappers.Response(
-        response=stream,
-        content_type="binary/octet-stream",
-        direct_passthrough=True)
+        response=stream, content_type=content_type, direct_passthrough=True)
     response.headers["Content-Disposition"] = ((
         "attachment; filename=%s" % binary_stream.filename).encode("utf-8"))
     if method_name:
@@ -394,6 +571,82 @@ class HttpRequestHandler(object):
 
     return response
 
+  def _BuildStreamingJsonResponse(self,
+                                  result,
+                                  format_mode=None,
+                                  method_name=None,
+                                  token=None,
+                                  no_audit_log=False,
+                                  gzip_encoding=False):
+    """Builds HTTPResponse object streaming a list result as JSON."""
+    content = self._StreamFormattedResultAsJson(result, format_mode=format_mode)
+    if gzip_encoding:
+      content = _GzipChunks(content)
+
+    binary_stream = api_call_handler_base.ApiBinaryStream(
+        "response.json", content_generator=content)
+    response = self._BuildStreamingResponse(
+        binary_stream,
+        method_name=method_name,
+        content_type="application/json; charset=utf-8")
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    if gzip_encoding:
+      response.headers["Content-Encoding"] = "gzip"
+      response.headers["Vary"] = "Accept-Encoding"
+
+    if token and token.reason:
+      response.headers["X-GRR-Reason"] = utils.SmartStr(token.reason)
+    if no_audit_log:
+      response.headers["X-No-Log"] = "True"
+
+    return response
+
+  def _ApplyHttpCaching(self, request, response):
+    """Adds a strong ETag to the response and compresses it if possible.
+
+    Args:
+      request: The HTTP request the response is for.
+      response: A successful non-streamed response to a GET request.
+
+    Returns:
+      The response, or a 304 Not Modified response if the request's
+      If-None-Match header matches the ETag.
+    """
+    body = response.get_data()
+    body_digest = hashlib.sha256(body).hexdigest()
+
+    gzip_encoding = (
+        AcceptsGzipEncoding(request) and
+        len(body) >= config.CONFIG["API.ResponseCompressionThreshold"])
+    # Strong ETags have to differ between content encodings.
+    etag = body_digest + "-gzip" if gzip_encoding else body_digest
+
+    response.headers["ETag"] = werkzeug_http.quote_etag(etag)
+    # Browsers may keep the response, but have to revalidate it every time.
+    response.headers["Cache-Control"] = "private, no-cache"
+    if gzip_encoding:
+      response.headers["Vary"] = "Accept-Encoding"
+
+    if_none_match = werkzeug_http.parse_etags(
+        request.headers.get("If-None-Match"))
+    if (if_none_match.contains_weak(body_digest) or
+        if_none_match.contains_weak(body_digest + "-gzip")):
+      stats_collector_instance.Get().IncrementCounter(
+          "api_response_cache_lookups", fields=["hit"])
+      # Werkzeug strips the entity headers of 304 responses when sending them.
+      response.status_code = 304
+      response.set_data(b"")
+      return response
+
+    stats_collector_instance.Get().IncrementCounter(
+        "api_response_cache_lookups", fields=["miss"])
+
+    if gzip_encoding:
+      response.set_data(b"".join(_GzipChunks([body])))
+      response.headers["Content-Encoding"] = "gzip"
+
+    return response
+
   def HandleRequest(self, request):
     """Handles given HTTP request."""
     impersonated_username = config.CONFIG["AdminUI.debug_impersonate_user"]
@@ -521,15 +774,36 @@ class HttpRequestHandler(object):
       else:
         format_mode = GetRequestFormatMode(request, method_metadata)
         result = self.CallApiHandler(handler, args, token=token)
-        rendered_data = self._FormatResultAsJson(
-            result, format_mode=format_mode)
-
-        return self._BuildResponse(
-            200,
-            rendered_data,
-            method_name=method_metadata.name,
-            no_audit_log=method_metadata.no_audit_log_required,
-            token=token)
+        if IsProtobufResponseRequested(request):
+          response = self._BuildProtobufResponse(
+              result,
+              method_name=method_metadata.name,
+              no_audit_log=method_metadata.no_audit_log_required,
+              token=token)
+        elif self.IsStreamableResult(result):
+          # Big lists are rendered item by item instead of building the whole
+          # JSON document in memory. Such responses can't have an ETag, as it
+          # would have to be sent before the body is known.
+          return self._BuildStreamingJsonResponse(
+              result,
+              format_mode=format_mode,
+              method_name=method_metadata.name,
+              no_audit_log=method_metadata.no_audit_log_required,
+              token=token,
+              gzip_encoding=AcceptsGzipEncoding(request))
+        else:
+          rendered_data = self._FormatResultAsJson(
+              result, format_mode=format_mode)
+          response = self._BuildResponse(
+              200,
+              rendered_data,
+              method_name=method_metadata.name,
+              no_audit_log=method_metadata.no_audit_log_required,
+              token=token)
+
+        if request.method == "GET":
+          response = self._ApplyHttpCaching(request, response)
+        return response
     except access_control.UnauthorizedAccess as e:
       error_message = str(e)
       logging.warning("Access denied for %s (HTTP %s %s): %s",
@@ -586,7 +860,7 @@ def RenderHttpResponse(request):
   total_time = time.time() - start_time
 
   method_name = response.headers.get("X-API-Method", "unknown")
-  if response.status_code == 200:
+  if response.status_code in (200, 304):
     status = "SUCCESS"
   elif response.status_code == 403:
     status = "FORBIDDEN"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""This tests the performance of results rendering in the HTTP API."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from absl import app
+from future.builtins import range
+import pytest
+
+from google.protobuf import json_format
+
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
+from grr_response_core.lib.rdfvalues import paths as rdf_paths
+from grr_response_core.lib.util import compatibility
+from grr_response_core.lib.util.compat import json
+from grr_response_proto.api import flow_pb2
+from grr_response_server.gui import http_api
+from grr_response_server.gui.api_plugins import flow as api_flow
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import test_lib
+
+
+def _RenderWithRoundTrip(result):
+  """Renders the result the way the API did before single-pass rendering."""
+  json_data = json_format.MessageToJson(result.AsPrimitiveProto())
+  if isinstance(json_data, bytes):
+    json_data = json_data.decode("utf-8")
+  return http_api.RenderJsonResponseBody(json.Parse(json_data))
+
+
+@pytest.mark.large
+class HttpApiProto3JsonBenchmark(benchmark_test_lib.AverageMicroBenchmarks):
+  """Test performance of rendering API results in the proto3 JSON mode."""
+
+  REPEATS = 10
+  RESULTS_COUNT = 1000
+
+  def setUp(self):
+    super(HttpApiProto3JsonBenchmark, self).setUp()
+
+    items = []
+    for i in range(self.RESULTS_COUNT):
+      item = api_flow.ApiFlowResult(payload_type="StatEntry")
+      item.payload = rdf_client_fs.StatEntry(
+          pathspec=rdf_paths.PathSpec(
+              path="/home/<user>/file%d" % i, pathtype="OS"),
+          st_size=i,
+          st_mtime=1000 + i)
+      item.timestamp = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(i)
+      items.append(item)
+
+    self.result = api_flow.ApiListFlowResultsResult(
+        items=items, total_count=self.RESULTS_COUNT)
+    self.request_handler = http_api.HttpRequestHandler()
+
+  def _RenderSinglePass(self):
+    rendered_data = self.request_handler._FormatResultAsJson(
+        self.result, format_mode=http_api.JsonMode.PROTO3_JSON_MODE)
+    return http_api.RenderJsonResponseBody(rendered_data)
+
+  def testRenderFlowResults(self):
+    """How fast can a page of flow results be rendered."""
+    single_pass = self._RenderSinglePass()
+    round_trip = _RenderWithRoundTrip(self.result)
+
+    if compatibility.PY2:
+      # Python 2 dictionaries do not preserve the insertion order, so the
+      # order of keys can differ between both ways of rendering.
+      self.assertEqual(json.Parse(single_pass[5:]), json.Parse(round_trip[5:]))
+    else:
+      self.assertEqual(single_pass, round_trip)
+
+    self.TimeIt(lambda: _RenderWithRoundTrip(self.result),
+                "Round trip (%d results)" % self.RESULTS_COUNT)
+    self.TimeIt(self._RenderSinglePass,
+                "Single pass (%d results)" % self.RESULTS_COUNT)
+
+  def _SendAsJson(self):
+    body = self._RenderSinglePass()
+    result = flow_pb2.ApiListFlowResultsResult()
+    json_format.Parse(body[5:], result, ignore_unknown_fields=True)
+    return result
+
+  def _SendAsProtobuf(self):
+    body = self.result.AsPrimitiveProto().SerializeToString()
+    result = flow_pb2.ApiListFlowResultsResult()
+    result.ParseFromString(body)
+    return result
+
+  def testFlowResultsWireFormats(self):
+    """How fast can a page of flow results be passed to the API client."""
+    # Both wire formats have to deliver the same result to the API client.
+    self.assertEqual(self._SendAsJson(), self._SendAsProtobuf())
+
+    json_size = len(self._RenderSinglePass().encode("utf-8"))
+    protobuf_size = len(self.result.AsPrimitiveProto().SerializeToString())
+
+    self.TimeIt(self._SendAsJson, "JSON (%d bytes)" % json_size)
+    self.TimeIt(self._SendAsProtobuf, "Protobuf (%d bytes)" % protobuf_size)
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
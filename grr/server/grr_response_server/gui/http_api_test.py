@@ -6,6 +6,9 @@ from __future__ import division
 from __future__ import unicode_literals
 
 
+import hashlib
+import zlib
+
 from absl import app
 from future.moves.urllib import parse as urlparse
 import mock
@@ -25,6 +28,8 @@ from grr_response_server.gui import api_call_handler_base
 from grr_response_server.gui import api_call_router
 from grr_response_server.gui import api_test_lib
 from grr_response_server.gui import http_api
+from grr_response_server.gui.api_plugins import client as api_client
+from grr_response_server.rdfvalues import objects as rdf_objects
 from grr.test_lib import stats_test_lib
 from grr.test_lib import test_lib
 
@@ -54,6 +59,17 @@ class SampleStreamingHandler(api_call_handler_base.ApiCallHandler):
         "test.ext", content_generator=self._Generate(), content_length=1337)
 
 
+class SampleListHandler(api_call_handler_base.ApiCallHandler):
+
+  result_type = api_client.ApiListClientsLabelsResult
+
+  def Handle(self, unused_args, token=None):
+    return api_client.ApiListClientsLabelsResult(items=[
+        rdf_objects.ClientLabel(name="foo", owner="GRR"),
+        rdf_objects.ClientLabel(name="<bar>", owner="test"),
+    ])
+
+
 class SampleDeleteHandlerArgs(rdf_structs.RDFProtoStruct):
   protobuf = tests_pb2.SampleDeleteHandlerArgs
 
@@ -108,6 +124,11 @@ class TestHttpApiRouter(api_call_router.ApiCallRouter):
   def SampleStreamingGet(self, args, token=None):
     return SampleStreamingHandler()
 
+  @api_call_router.Http("GET", "/test_sample_list")
+  @api_call_router.ResultType(api_client.ApiListClientsLabelsResult)
+  def SampleList(self, args, token=None):
+    return SampleListHandler()
+
   @api_call_router.Http("DELETE", "/test_resource/<resource_id>")
   @api_call_router.ArgsType(SampleDeleteHandlerArgs)
   @api_call_router.ResultType(SampleDeleteHandlerResult)
@@ -214,7 +235,10 @@ class HttpRequestHandlerTest(test_lib.GRRBaseTest,
     return http_api.RenderHttpResponse(request)
 
   def _GetResponseContent(self, response):
-    content = response.get_data(as_text=True)
+    if response.is_streamed:
+      content = b"".join(response.iter_encoded()).decode("utf-8")
+    else:
+      content = response.get_data(as_text=True)
     if content.startswith(")]}'\n"):
       content = content[5:]
 
@@ -257,6 +281,241 @@ class HttpRequestHandlerTest(test_lib.GRRBaseTest,
         })
     self.assertEqual(response.status_code, 200)
 
+  def testRendersResultInProto3JsonMode(self):
+    result = SampleGetHandlerResult(method="GET", path="<path>", foo="区最")
+    rendered_data = self.request_handler._FormatResultAsJson(
+        result, format_mode=http_api.JsonMode.PROTO3_JSON_MODE)
+    body = http_api.RenderJsonResponseBody(rendered_data)
+
+    self.assertTrue(body.startswith(")]}'\n"))
+    self.assertEqual(
+        json.Parse(body[5:]), {
+            "method": "GET",
+            "path": "<path>",
+            "foo": "区最"
+        })
+
+  def testStreamsListResultsItemByItem(self):
+    with test_lib.ConfigOverrider({"API.ListStreamingThreshold": 1}):
+      response = self._RenderResponse(
+          self._CreateRequest("GET", "/test_sample_list"))
+
+    self.assertEqual(response.status_code, 200)
+    self.assertTrue(response.is_streamed)
+    self.assertEqual(response.headers["Content-Type"],
+                     "application/json; charset=utf-8")
+    self.assertEqual(
+        self._GetResponseContent(response), {
+            "items": [{
+                "type": "ClientLabel",
+                "value": {
+                    "name": {
+                        "type": "unicode",
+                        "value": "foo"
+                    },
+                    "owner": {
+                        "type": "unicode",
+                        "value": "GRR"
+                    },
+                },
+            }, {
+                "type": "ClientLabel",
+                "value": {
+                    "name": {
+                        "type": "unicode",
+                        "value": "<bar>"
+                    },
+                    "owner": {
+                        "type": "unicode",
+                        "value": "test"
+                    },
+                },
+            }],
+        })
+
+  def testStreamedListResultsHaveStrippedTypeInfoIfRequested(self):
+    with test_lib.ConfigOverrider({"API.ListStreamingThreshold": 1}):
+      response = self._RenderResponse(
+          self._CreateRequest(
+              "GET",
+              "/test_sample_list",
+              query_parameters={"strip_type_info": "1"}))
+
+    self.assertEqual(
+        self._GetResponseContent(response), {
+            "items": [{
+                "name": "foo",
+                "owner": "GRR"
+            }, {
+                "name": "<bar>",
+                "owner": "test"
+            }]
+        })
+
+  def testStreamedListResultIsSameAsRenderedOneInAllModes(self):
+    for format_mode in [
+        http_api.JsonMode.PROTO3_JSON_MODE, http_api.JsonMode.GRR_JSON_MODE,
+        http_api.JsonMode.GRR_ROOT_TYPES_STRIPPED_JSON_MODE,
+        http_api.JsonMode.GRR_TYPE_STRIPPED_JSON_MODE
+    ]:
+      result = SampleListHandler().Handle(None)
+      rendered_data = self.request_handler._FormatResultAsJson(
+          result, format_mode=format_mode)
+
+      body = b"".join(
+          self.request_handler._StreamFormattedResultAsJson(
+              result, format_mode=format_mode))
+      self.assertEqual(json.Parse(body.decode("utf-8")[5:]), rendered_data)
+
+  def testStreamedJsonResponseBodyIsSameAsRenderedOne(self):
+    items = [{"foo": [1, 2], "bar": {}}, "<blah>", []]
+    for count in range(len(items) + 1):
+      body = "".join(
+          chunk.decode("utf-8")
+          for chunk in http_api.GenerateJsonResponseBody(
+              {"a": {"b": "placeholder", "c": 42}}, "placeholder",
+              iter(items[:count])))
+
+      self.assertEqual(
+          body,
+          http_api.RenderJsonResponseBody({"a": {"b": items[:count], "c": 42}}))
+
+  def testDoesNotStreamListResultsBelowThreshold(self):
+    with test_lib.ConfigOverrider({"API.ListStreamingThreshold": 2}):
+      response = self._RenderResponse(
+          self._CreateRequest("GET", "/test_sample_list"))
+
+    self.assertFalse(response.is_streamed)
+    self.assertLen(self._GetResponseContent(response)["items"], 2)
+
+  def testStreamedListResultsAreGzippedIfAccepted(self):
+    request = self._CreateRequest("GET", "/test_sample_list")
+    request.headers["Accept-Encoding"] = "gzip, deflate"
+    with test_lib.ConfigOverrider({"API.ListStreamingThreshold": 1}):
+      response = self._RenderResponse(request)
+
+    self.assertTrue(response.is_streamed)
+    self.assertEqual(response.headers["Content-Encoding"], "gzip")
+    self.assertNotIn("ETag", response.headers)
+
+    body = zlib.decompress(b"".join(response.iter_encoded()), 31)
+    self.assertLen(json.Parse(body.decode("utf-8")[5:])["items"], 2)
+
+  def testGetResponsesHaveStrongETag(self):
+    response = self._RenderResponse(
+        self._CreateRequest("GET", "/test_sample/some/path"))
+
+    self.assertEqual(response.status_code, 200)
+    etag, is_weak = response.get_etag()
+    self.assertFalse(is_weak)
+    self.assertEqual(etag, hashlib.sha256(response.get_data()).hexdigest())
+    self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+
+  def testETagDoesNotDependOnRequestTime(self):
+    first = self._RenderResponse(
+        self._CreateRequest("GET", "/test_sample/some/path"))
+    second = self._RenderResponse(
+        self._CreateRequest("GET", "/test_sample/some/path"))
+
+    self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+
+  def testRespondsWithNotModifiedIfETagMatches(self):
+    response = self._RenderResponse(
+        self._CreateRequest("GET", "/test_sample/some/path"))
+    request = self._CreateRequest("GET", "/test_sample/some/path")
+    request.headers["If-None-Match"] = response.headers["ETag"]
+
+    with self.assertStatsCounterDelta(
+        1, "api_response_cache_lookups", fields=["hit"]):
+      response = self._RenderResponse(request)
+
+    self.assertEqual(response.status_code, 304)
+    self.assertEqual(response.get_data(), b"")
+
+  def testRespondsWithFullResultIfETagDoesNotMatch(self):
+    request = self._CreateRequest("GET", "/test_sample/some/path")
+    request.headers["If-None-Match"] = "\"foo\""
+
+    with self.assertStatsCounterDelta(
+        1, "api_response_cache_lookups", fields=["miss"]):
+      response = self._RenderResponse(request)
+
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(
+        self._GetResponseContent(response), {
+            "method": "GET",
+            "path": "some/path",
+            "foo": ""
+        })
+
+  def testNonGetResponsesHaveNoETag(self):
+    response = self._RenderResponse(
+        self._CreateRequest("DELETE", "/test_resource/R:123456"))
+
+    self.assertEqual(response.status_code, 200)
+    self.assertNotIn("ETag", response.headers)
+
+  def testGzipsResponsesAboveThresholdIfAccepted(self):
+    request = self._CreateRequest("GET", "/test_sample/some/path")
+    request.headers["Accept-Encoding"] = "gzip"
+    with test_lib.ConfigOverrider({"API.ResponseCompressionThreshold": 0}):
+      response = self._RenderResponse(request)
+
+    self.assertEqual(response.headers["Content-Encoding"], "gzip")
+    self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+    # Compressed and uncompressed representations have different ETags.
+    self.assertTrue(response.get_etag()[0].endswith("-gzip"))
+
+    body = zlib.decompress(response.get_data(), 31).decode("utf-8")
+    self.assertEqual(
+        json.Parse(body[5:]), {
+            "method": "GET",
+            "path": "some/path",
+            "foo": ""
+        })
+
+  def testDoesNotGzipResponsesBelowThreshold(self):
+    request = self._CreateRequest("GET", "/test_sample/some/path")
+    request.headers["Accept-Encoding"] = "gzip"
+    response = self._RenderResponse(request)
+
+    self.assertNotIn("Content-Encoding", response.headers)
+
+  def testRendersResultAsProtobufIfAccepted(self):
+    request = self._CreateRequest("GET", "/test_sample/some/path")
+    request.headers["Accept"] = "application/x-protobuf, */*;q=0.1"
+    response = self._RenderResponse(request)
+
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.headers["Content-Type"],
+                     http_api.PROTOBUF_CONTENT_TYPE)
+
+    result = tests_pb2.SampleGetHandlerResult()
+    result.ParseFromString(response.get_data())
+    self.assertEqual(
+        result,
+        tests_pb2.SampleGetHandlerResult(
+            method="GET", path="some/path", foo=""))
+
+  def testRendersListResultAsProtobufIfAccepted(self):
+    request = self._CreateRequest("GET", "/test_sample_list")
+    request.headers["Accept"] = http_api.PROTOBUF_CONTENT_TYPE
+    response = self._RenderResponse(request)
+
+    self.assertFalse(response.is_streamed)
+    result = api_client.ApiListClientsLabelsResult.FromSerializedString(
+        response.get_data())
+    self.assertEqual(result, SampleListHandler().Handle(None))
+
+  def testRendersErrorsAsJsonIfProtobufIsAccepted(self):
+    request = self._CreateRequest("GET", "/failure/not-found")
+    request.headers["Accept"] = http_api.PROTOBUF_CONTENT_TYPE
+    response = self._RenderResponse(request)
+
+    self.assertEqual(response.status_code, 404)
+    self.assertEqual(response.headers["Content-Type"],
+                     "application/json; charset=utf-8")
+
   def testHeadRequestHasStubAsABodyOnSuccess(self):
     response = self._RenderResponse(
         self._CreateRequest("HEAD", "/test_sample/some/path"))
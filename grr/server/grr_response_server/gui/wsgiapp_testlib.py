@@ -15,16 +15,30 @@ from grr_response_core.lib import utils
 from grr_response_server.gui import wsgiapp
 
 
+class _KeepAliveRequestHandler(serving.WSGIRequestHandler):
+  """A request handler that keeps connections alive between requests."""
+
+  # Werkzeug closes connections after responses without Content-Length on its
+  # own, so HTTP/1.1 is safe to use here.
+  protocol_version = "HTTP/1.1"
+  # Headers and body of a response are written separately. With Nagle's
+  # algorithm enabled, the body would wait for the client to acknowledge the
+  # headers, which adds a delayed ACK timeout to every call on a kept-alive
+  # connection.
+  disable_nagle_algorithm = True
+
+
 class ServerThread(threading.Thread):
   """A class to run the wsgi server in another thread."""
 
   daemon = True
 
-  def __init__(self, port, **kwargs):
+  def __init__(self, port, keep_alive=False, **kwargs):
     super(ServerThread, self).__init__(**kwargs)
     self.ready_to_serve = threading.Event()
     self.done_serving = threading.Event()
     self.port = port
+    self.keep_alive = keep_alive
 
   def StartAndWaitUntilServing(self):
     self.start()
@@ -60,6 +74,7 @@ class ServerThread(threading.Thread):
         ip,
         self.port,
         wsgiapp.AdminUIApp().WSGIHandler(),
+        request_handler=_KeepAliveRequestHandler if self.keep_alive else None,
         ssl_context=ssl_context)
 
     # We want to notify other threads that we are now ready to serve right
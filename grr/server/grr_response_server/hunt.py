@@ -270,19 +270,17 @@ def _ScheduleVariableHunt(hunt_obj):
     flow_args = flow_group.flow_args if flow_group.HasField(
         "flow_args") else None
 
-    for client_id in flow_group.client_ids:
-      flow.StartFlow(
-          client_id=client_id,
-          creator=hunt_obj.creator,
-          cpu_limit=hunt_obj.per_client_cpu_limit,
-          network_bytes_limit=hunt_obj.per_client_network_bytes_limit,
-          flow_cls=flow_cls,
-          flow_args=flow_args,
-          # Setting start_at explicitly ensures that flow.StartFlow won't
-          # process flow's Start state right away. Only the flow request
-          # will be scheduled.
-          start_at=now,
-          parent_hunt_id=hunt_obj.hunt_id)
+    # Flows are only scheduled (their Start state is processed by workers), so
+    # they can be written for all the clients of the group in bulk.
+    flow.StartFlows(
+        list(flow_group.client_ids),
+        flow_cls,
+        now,
+        creator=hunt_obj.creator,
+        cpu_limit=hunt_obj.per_client_cpu_limit,
+        flow_args=flow_args,
+        network_bytes_limit=hunt_obj.per_client_network_bytes_limit,
+        parent_hunt_id=hunt_obj.hunt_id)
 
 
 def StartHunt(hunt_id):
@@ -375,10 +373,23 @@ def _GetNumClients(hunt_id):
   return data_store.REL_DB.CountHuntFlows(hunt_id)
 
 
+# The foreman starts hunt flows on many clients in quick succession. Reading the
+# hunt object once per this period, instead of once per client, means that a
+# hunt state change may take up to this long to be noticed, which is fine given
+# the race between foreman rules removal and client scheduling below.
+@cache.WithLimitedCallFrequency(_TIME_BETWEEN_PAUSE_CHECKS)
+def _GetHuntObject(hunt_id):
+  return data_store.REL_DB.ReadHuntObject(hunt_id)
+
+
 def StartHuntFlowOnClient(client_id, hunt_id):
   """Starts a flow corresponding to a given hunt on a given client."""
 
-  hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+  hunt_obj = _GetHuntObject(hunt_id)
+  if hunt_obj.expired:
+    # The hunt may have already been completed since the cached object was
+    # read.
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
   hunt_obj = CompleteHuntIfExpirationTimeReached(hunt_obj)
   # There may be a little race between foreman rules being removed and
   # foreman scheduling a client on an (already) paused hunt. Making sure
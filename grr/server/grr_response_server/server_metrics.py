@@ -48,6 +48,29 @@ def GetMetadata():
           bins=[0.05 * 1.2**x for x in range(30)]),  # 50ms to ~10 secs
       stats_utils.CreateCounterMetadata(
           "db_request_errors", fields=[("call", str), ("type", str)]),
+      stats_utils.CreateCounterMetadata(
+          "mysql_transactions", fields=[("pool", str)]),
+      stats_utils.CreateCounterMetadata(
+          "mysql_replica_fallbacks", fields=[("reason", str)]),
+      stats_utils.CreateGaugeMetadata(
+          "mysql_replica_lag", int, fields=[("replica", str)],
+          units="SECONDS"),
+      stats_utils.CreateGaugeMetadata(
+          "mysql_replica_healthy", int, fields=[("replica", str)]),
+      stats_utils.CreateEventMetadata(
+          "mysql_pool_wait_time",
+          fields=[("pool", str)],
+          bins=[0.001 * 2**x for x in range(15)]),  # 1ms to ~16 secs
+      stats_utils.CreateGaugeMetadata(
+          "mysql_pool_connections",
+          int,
+          fields=[("pool", str), ("state", str)]),
+      stats_utils.CreateCounterMetadata(
+          "mysql_pool_evictions", fields=[("pool", str), ("reason", str)]),
+      stats_utils.CreateEventMetadata(
+          "mysql_query_latency",
+          fields=[("pool", str), ("query", str)],
+          bins=[0.001 * 1.5**x for x in range(25)]),  # 1ms to ~17 secs
 
       # Threadpool metrics.
       stats_utils.CreateGaugeMetadata(
@@ -118,6 +141,8 @@ def GetMetadata():
       stats_utils.CreateEventMetadata(
           "api_access_probe_latency",
           fields=[("method_name", str), ("protocol", str), ("status", str)]),
+      stats_utils.CreateCounterMetadata(
+          "api_response_cache_lookups", fields=[("result", str)]),
 
       # Client-related metrics.
       stats_utils.CreateCounterMetadata("grr_client_crashes"),
@@ -240,6 +240,13 @@ class ListDirectory(ClientActionStub):
   out_rdfvalues = [rdf_client_fs.StatEntry]
 
 
+class ListDirectoryBatched(ClientActionStub):
+  """Lists all the files in a directory sending stat entries in batches."""
+
+  in_rdfvalue = rdf_client_action.ListDirRequest
+  out_rdfvalues = [rdf_client_fs.StatEntryBatch]
+
+
 # DEPRECATED.
 #
 # This action was replaced by newer `GetFileStat` action. This stub is left for
@@ -337,6 +344,13 @@ class Find(ClientActionStub):
   out_rdfvalues = [rdf_client_fs.FindSpec, rdf_client_fs.StatEntry]
 
 
+class ExpandGlobs(ClientActionStub):
+  """Expands a tree of glob components on the client."""
+
+  in_rdfvalue = rdf_client_action.ExpandGlobsRequest
+  out_rdfvalues = [rdf_client_fs.StatEntry]
+
+
 class Grep(ClientActionStub):
   """Search a file for a pattern."""
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""This tests the performance of flow processing in the worker."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import time
+
+from absl import app
+from future.builtins import range
+import pytest
+
+from grr_response_core.lib import rdfvalue
+from grr_response_server import data_store
+from grr_response_server import flow
+from grr_response_server import flow_base
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import db_test_lib
+from grr.test_lib import flow_test_lib
+from grr.test_lib import test_lib
+
+
+class MultiStepFlow(flow_base.FlowBase):
+  """A flow that calls its own state a number of times."""
+
+  STEPS = 20
+  REPLIES_PER_STEP = 0
+
+  def Start(self):
+    self.state.step = 0
+    self.CallState(next_state="Step")
+
+  def Step(self, responses):
+    for i in range(self.REPLIES_PER_STEP):
+      self.SendReply(rdfvalue.RDFInteger(i))
+
+    self.state.step += 1
+    if self.state.step < self.STEPS:
+      self.CallState(next_state="Step")
+
+
+class MultiStepFlowWithReplies(MultiStepFlow):
+  REPLIES_PER_STEP = 10
+
+
+@pytest.mark.large
+class WorkerBenchmark(db_test_lib.RelationalDBEnabledMixin,
+                      benchmark_test_lib.AverageMicroBenchmarks):
+  """Test performance of flow processing in the worker."""
+
+  REPEATS = 10
+
+  def setUp(self):
+    super(WorkerBenchmark, self).setUp()
+    self.client_id = self.SetupTestClientObject(0).client_id
+
+  def _RunFlows(self, flow_cls, name):
+    """Runs flows to completion and records the flow steps per second."""
+    with flow_test_lib.TestWorker(token=True) as worker:
+      start = time.time()
+      for _ in range(self.REPEATS):
+        flow_id = flow.StartFlow(flow_cls=flow_cls, client_id=self.client_id)
+        flow_test_lib.RunFlow(self.client_id, flow_id, worker=worker)
+      time_taken = time.time() - start
+
+    steps = self.REPEATS * flow_cls.STEPS
+    self.AddResult("%s (%.1f steps/s)" % (name, steps / time_taken),
+                   time_taken / steps, steps)
+
+  def testFlowSteps(self):
+    """How many flow steps per second can the worker process."""
+    self._RunFlows(MultiStepFlow, "Flow steps")
+    self._RunFlows(MultiStepFlowWithReplies, "Flow steps with 10 replies")
+
+    flow_objs = data_store.REL_DB.ReadAllFlowObjects(client_id=self.client_id)
+    self.assertLen(flow_objs, 2 * self.REPEATS)
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -87,6 +87,14 @@ class GRRWorker(object):
     # until the timeout.
     self.queued_flows = utils.TimeBasedCache(max_size=10, max_age=60)
 
+    # Flows processed by this worker are kept in memory, so that they don't
+    # have to be read and parsed again in their next processing step.
+    flow_cache_size = config.CONFIG["Worker.flow_cache_size"]
+    if flow_cache_size:
+      self.flow_cache = db.FlowCache(max_size=flow_cache_size)
+    else:
+      self.flow_cache = None
+
     if token is None:
       raise RuntimeError("A valid ACLToken is required.")
 
@@ -389,9 +397,8 @@ class GRRWorker(object):
           "Lease expired for flow %s on %s (%s)." %
           (rdf_flow.flow_id, rdf_flow.client_id, rdf_flow.processing_deadline))
 
-    flow_obj.FlushQueuedMessages()
-
-    return data_store.REL_DB.ReleaseProcessedFlow(rdf_flow)
+    return flow_obj.FlushQueuedMessages(
+        release=True, flow_cache=self.flow_cache)
 
   def ProcessFlow(self, flow_processing_request):
     """The callback for the flow processing queue."""
@@ -403,7 +410,10 @@ class GRRWorker(object):
 
     try:
       rdf_flow = data_store.REL_DB.LeaseFlowForProcessing(
-          client_id, flow_id, processing_time=rdfvalue.Duration("6h"))
+          client_id,
+          flow_id,
+          processing_time=rdfvalue.Duration("6h"),
+          flow_cache=self.flow_cache)
     except db.ParentHuntIsNotRunningError:
       flow_base.TerminateFlow(client_id, flow_id, "Parent hunt stopped.")
       return
@@ -201,7 +201,8 @@ class FileFinderClientMock(ActionMock):
   def __init__(self, *args, **kwargs):
     super(FileFinderClientMock,
           self).__init__(file_fingerprint.FingerprintFile, searching.Find,
-                         searching.Grep, standard.HashBuffer, standard.HashFile,
+                         searching.ExpandGlobs, searching.Grep,
+                         standard.HashBuffer, standard.HashFile,
                          standard.GetFileStat, standard.TransferBuffer, *args,
                          **kwargs)
 
@@ -265,15 +266,16 @@ class ListDirectoryClientMock(ActionMock):
 
   def __init__(self, *args, **kwargs):
     super(ListDirectoryClientMock,
-          self).__init__(standard.ListDirectory, standard.GetFileStat, *args,
-                         **kwargs)
+          self).__init__(standard.ListDirectory, standard.ListDirectoryBatched,
+                         standard.GetFileStat, *args, **kwargs)
 
 
 class GlobClientMock(ActionMock):
 
   def __init__(self, *args, **kwargs):
-    super(GlobClientMock, self).__init__(searching.Find, standard.GetFileStat,
-                                         *args, **kwargs)
+    super(GlobClientMock,
+          self).__init__(searching.Find, searching.ExpandGlobs,
+                         standard.GetFileStat, *args, **kwargs)
 
 
 class GrepClientMock(ActionMock):
@@ -329,6 +331,7 @@ class InterrogatedClient(ActionMock):
                          file_fingerprint.FingerprintFile, searching.Find,
                          standard.GetMemorySize, standard.HashBuffer,
                          standard.HashFile, standard.ListDirectory,
+                         standard.ListDirectoryBatched,
                          standard.GetFileStat, standard.TransferBuffer, *args,
                          **kwargs)
 